@@ -0,0 +1,153 @@
+# aio_http.py – 비동기 HTTP 계층 (공유 이벤트 루프 · httpx.AsyncClient · http_client와 같은 재시도 정책)
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+import http_client
+from http_client import (
+    RETRY_STATUSES, THROTTLE_STATUSES, CircuitOpenError,
+    _backoff, _breaker, _cfg_float, _cfg_int, _metric, _retry_hint, is_idempotent, may_retry_status,
+)
+
+# 선택 의존성: httpx 없으면 동기 http_client를 스레드에서 실행
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+# ─────────────────────────────────────────────────────────
+# 공유 이벤트 루프 (백그라운드 스레드 1개)
+# ─────────────────────────────────────────────────────────
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """동기 코드(Streamlit 페이지/Functions)가 코루틴을 넘길 프로세스 공용 루프"""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            t = threading.Thread(target=loop.run_forever, name="aio-loop", daemon=True)
+            t.start()
+            _LOOP = loop
+        return _LOOP
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """공용 루프에서 코루틴을 실행하고 결과를 기다림 (어느 스레드에서든 호출 가능)"""
+    fut = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    return fut.result(timeout)
+
+
+# ─────────────────────────────────────────────────────────
+# httpx 클라이언트 (루프별 1개 — 호출자가 자기 루프에서 await 해도 안전)
+# ─────────────────────────────────────────────────────────
+_CLIENTS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _client():
+    loop = asyncio.get_running_loop()
+    c = _CLIENTS.get(loop)
+    if c is None:
+        limits = httpx.Limits(
+            max_connections=_cfg_int("HTTP_POOL_MAXSIZE", 32) * 2,
+            max_keepalive_connections=_cfg_int("HTTP_POOL_MAXSIZE", 32),
+        )
+        c = httpx.AsyncClient(limits=limits, timeout=60.0)
+        _CLIENTS[loop] = c
+    return c
+
+
+def raise_for_status(r, prefix: str = ""):
+    """httpx/requests 응답 공통: 4xx/5xx면 requests.HTTPError (기존 except 절과 호환)"""
+    if r.status_code >= 400:
+        raise requests.HTTPError(f"{prefix}{r.status_code}: {r.text[:800]}", response=r)
+
+
+def _as_requests_error(e: "httpx.TransportError") -> Exception:
+    """기존 except 절과 호환되도록 requests 예외로 변환 (연결 전 실패/타임아웃/그 외 전송 오류)"""
+    if isinstance(e, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return requests.ConnectTimeout(str(e))
+    if isinstance(e, httpx.TimeoutException):
+        return requests.ReadTimeout(str(e))
+    return requests.ConnectionError(str(e))
+
+
+async def arequest(method: str, url: str, retries: Optional[int] = None, idempotent: Optional[bool] = None,
+                   **kwargs):
+    """
+    http_client.request의 비동기 버전. 재시도/Retry-After/서킷/메트릭과 비멱등 요청 규칙을 공유.
+    kwargs는 requests 스타일(headers/json/data/timeout)을 그대로 받는다.
+    """
+    if httpx is None:
+        return await asyncio.to_thread(http_client.request, method, url, retries=retries,
+                                       idempotent=idempotent, **kwargs)
+
+    host = urlsplit(url).netloc
+    retries = _cfg_int("HTTP_MAX_RETRIES", 5) if retries is None else retries
+    max_hint = _cfg_float("HTTP_MAX_RETRY_AFTER_SEC", 120.0)
+    br = _breaker(host)
+    idempotent = is_idempotent(method, idempotent)
+    data = kwargs.pop("data", None)
+    if data is not None:
+        kwargs["content"] = data
+
+    attempt = 0
+    while True:
+        if not br.allow():
+            _metric(host, circuit_open=1)
+            raise CircuitOpenError(f"circuit open for {host} (잠시 후 다시 시도하세요)")
+        _metric(host, requests=1)
+        try:
+            r = await _client().request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            _metric(host, errors=1)
+            br.failure()
+            # 연결 단계 실패만 요청이 안 나간 것이 확실 → 비멱등 요청은 그 경우에만 재시도
+            unsent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+            if attempt >= retries or (not unsent and not idempotent):
+                raise _as_requests_error(e) from e
+            await asyncio.sleep(_backoff(attempt))
+            attempt += 1
+            _metric(host, retries=1)
+            continue
+        except asyncio.CancelledError:
+            br.abandon()
+            raise
+        except BaseException:
+            _metric(host, errors=1)
+            br.failure()
+            raise
+
+        if r.status_code not in RETRY_STATUSES:
+            br.success()
+            return r
+
+        if r.status_code == 429:
+            br.success()
+        else:
+            _metric(host, errors=1)
+            br.failure()
+        hint = _retry_hint(r)
+        if attempt >= retries or not may_retry_status(r.status_code, hint is not None, idempotent):
+            return r
+
+        delay = min(hint, max_hint) if hint is not None else _backoff(attempt)
+        if r.status_code in THROTTLE_STATUSES:
+            _metric(host, throttled=1, throttled_sec=delay)
+        await asyncio.sleep(delay)
+        attempt += 1
+        _metric(host, retries=1)
+
+
+async def aget(url: str, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url: str, **kwargs):
+    return await arequest("POST", url, **kwargs)
@@ -1,6 +1,7 @@
 # app.py – Streamlit main (Sidebar Navigation + Dashboard)
 import streamlit as st
 import pandas as pd
+import time
 from datetime import datetime
 
 from config import CONFIG
@@ -9,8 +10,8 @@ from auth import ensure_login
 from auth_code import ensure_login_auth_code
 from graph import list_onedrive_root, list_onedrive_children, download_onedrive_file, upload_onedrive_file
 from docintel import extract_text_naive, extract_text_docintel
-from openai_client import run_audit_with_azure_openai, refine_document_with_azure_openai
-from pii import scan_pii
+from openai_client import run_audit_with_azure_openai_stream, refine_document_with_azure_openai_stream
+from pii import scan_pii, get_pii_metrics
 from teams import send_teams_message
 from purview import show_purview_guidance, apply_label_stub
 from dashboard import get_metrics, get_recent_docs, get_activity_log, get_timeseries
@@ -18,7 +19,7 @@ from storage_logs import query_recent, ensure_table, log_activity
 from storage_blob import upload_blob, download_blob, delete_blob, list_blobs_detailed
 from search import (
     show_search_guidance, create_index_if_missing, upsert_documents, vector_search,
-    get_document_by_id, vector_search_by_text, get_recent_documents
+    get_document_by_id, vector_search_by_text, get_recent_documents, rebuild_local_vector_index
 )
 from compare import generate_merge_report
 from login_page import render_login_page, is_logged_in  
@@ -29,9 +30,12 @@ from ops_alerts import (
     alert_to_owner_for_document, bulk_alert_stale_docs_to_owners
 )
 from owners_registry import ensure_owners_table
+from http_client import get_http_metrics
 # app.py – render_ops() 내 탭 추가/핸들러
 from reports import build_consolidated_markdown, save_consolidated_report_to_blob
-from merge_rag import generate_merged_markdown, save_merged, merged_filename
+from merge_rag import generate_merged_markdown_stream, save_merged, merged_filename
+from local_vectors import get_local_vector_index
+from dedup import find_duplicates, save_result as save_duplicates, load_last_result as load_duplicates
 
 try:
     ensure_owners_table()
@@ -114,6 +118,20 @@ with st.sidebar:
 #     st.caption("Move fast. Keep docs clean.")
 
 
+def stream_text(chunks, keep: bool = False) -> str:
+    """
+    토큰 스트림을 받는 즉시 화면에 그리고 전체 텍스트를 반환.
+    keep=False면 완료 후 임시 표시를 지움 (최종본은 호출부가 session_state로 다시 렌더).
+    """
+    box = st.empty()
+    with box.container():
+        text = st.write_stream(chunks)
+    if not isinstance(text, str):
+        text = "".join(str(t) for t in text)
+    if not keep:
+        box.empty()
+    return text
+
 def render_dashboard():
     st.title("📊 대시보드 · Profile & Settings")
     col1, col2 = st.columns([2,1])
@@ -137,6 +155,8 @@ def render_dashboard():
     m3.metric("PII 감지", metrics["pii_hits"])
     m4.metric("유사/중복 감지", metrics["dup_found"])
 
+    render_dedup_panel()
+
     # ✅ 실데이터 타임시리즈
     import altair as alt
     ts = get_timeseries(st.session_state, days=12)
@@ -179,6 +199,64 @@ def render_dashboard():
         config_status(CONFIG)
         st.markdown('</div>', unsafe_allow_html=True)
 
+        st.subheader("HTTP 재시도/스로틀")
+        http_metrics = get_http_metrics()
+        if http_metrics:
+            st.dataframe(pd.DataFrame([{"host": h, **m} for h, m in http_metrics.items()]),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.caption("아직 기록된 호출이 없습니다.")
+
+        st.subheader("PII 스캔")
+        pm = get_pii_metrics()
+        if pm["docs"]:
+            st.dataframe(pd.DataFrame([{
+                "문서": pm["docs"], "문자": pm["chars"], "탐지": pm["hits"], "검증 탈락": pm["rejected"],
+                "시간 초과": pm["truncated"], "누적 초": pm["seconds"],
+                "문서당 ms": round(pm["seconds"] * 1000 / pm["docs"], 1),
+            }]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("아직 스캔한 문서가 없습니다.")
+
+def render_dedup_panel():
+    """코퍼스 전체 중복 탐지 실행 + 클러스터 표시 (병합 가이드로 넘기기)"""
+    with st.expander("🧬 중복 문서 탐지 (전체 코퍼스)", expanded=bool(st.session_state.get("_dup_clusters"))):
+        d1, d2, d3 = st.columns([2, 2, 1])
+        cos_t = d1.slider("임베딩 유사도 기준 (cosine)", 0.80, 1.00, float(CONFIG.get("DEDUP_COSINE_THRESHOLD", 0.95)), 0.01)
+        jac_t = d2.slider("본문 유사도 기준 (MinHash Jaccard)", 0.50, 1.00, float(CONFIG.get("DEDUP_JACCARD_THRESHOLD", 0.85)), 0.05)
+        use_text = d3.checkbox("본문 비교 포함", value=True)
+        if st.button("중복 탐지 실행"):
+            status = st.empty()
+            try:
+                with st.spinner("중복 탐지 중… (임베딩 블록 비교 → 본문 서명 비교)"):
+                    result = find_duplicates(cos_t, jac_t, use_text=use_text, progress=status.caption)
+                save_duplicates(result)
+                st.session_state["_dup_found"] = result["duplicates"]
+                st.session_state["_dup_clusters"] = result["clusters"]
+                log_activity(st.session_state.get("graph_user_mail","default"), "Dedup", "INFO",
+                             f"중복 탐지 · 문서 {result['docs']} · 클러스터 {len(result['clusters'])} · {result['elapsed_sec']}초"
+                             f" · 벡터 {result['vectors_from']}")
+                st.rerun()
+            except Exception as e:
+                st.error(f"중복 탐지 실패: {e}")
+
+        clusters = st.session_state.get("_dup_clusters")
+        if clusters is None:
+            last = load_duplicates()
+            clusters = last["clusters"] if last else []
+        if not clusters:
+            st.caption("아직 찾은 중복 클러스터가 없습니다.")
+            return
+        st.caption(f"클러스터 {len(clusters)}개 (큰 순서 · 상위 30개 표시)")
+        for n, c in enumerate(clusters[:30]):
+            names = ", ".join((m.get("name") or m.get("originalId") or "-") for m in c["members"][:3])
+            with st.container(border=True):
+                st.markdown(f"**{len(c['members'])}건** · {' / '.join(c['reasons'])} · 최고 {c['score']} — {names}")
+                st.dataframe(pd.DataFrame(c["members"]), use_container_width=True, hide_index=True)
+                if st.button("병합 가이드에서 보기", key=f"_dup_merge_{n}"):
+                    st.session_state["sim_items"] = c["members"]
+                    go("🗂️ 유사 검색 / 병합 가이드")
+
 def render_storage():
     st.title("🔐 로그인 & 저장소")
 
@@ -260,7 +338,7 @@ def render_storage():
     uploaded = st.file_uploader("문서 업로드", type=["pdf","docx","txt","md","pptx","xlsx"])
     if uploaded:
         try:
-            upload_blob(uploaded.name, uploaded.getvalue(), content_type=uploaded.type)
+            upload_blob(uploaded.name, uploaded, content_type=uploaded.type, length=uploaded.size)
             st.success(f"✅ 업로드 완료: {uploaded.name}")
             try:
                 log_activity("default", "Blob", "INFO", f"업로드 완료: {uploaded.name}")
@@ -341,8 +419,7 @@ def render_audit():
                 st.warning("본문을 입력하거나 저장소에서 파일을 가져오세요.")
             else:
                 try:
-                    with st.spinner("Azure OpenAI 분석 중…"):
-                        report = run_audit_with_azure_openai(text, doc_type)
+                    report = stream_text(run_audit_with_azure_openai_stream(text, doc_type))
                     st.session_state["audit_report"] = report
                     st.success("분석 완료")
                     try:
@@ -407,12 +484,11 @@ def render_audit():
                 st.warning("현재 문서 또는 감사 리포트가 없습니다.")
             else:
                 try:
-                    with st.spinner("재작성 중…"):
-                        refined = refine_document_with_azure_openai(
-                            original_text=current_text,
-                            audit_report=audit_md,
-                            tone=tone, length=length, output_format=out_fmt
-                        )
+                    refined = stream_text(refine_document_with_azure_openai_stream(
+                        original_text=current_text,
+                        audit_report=audit_md,
+                        tone=tone, length=length, output_format=out_fmt
+                    ))
                     st.session_state["refined_text"] = refined
                     st.success("재작성 완료")
                     log_activity("default", "OpenAI", "INFO", "문서 재작성 완료")
@@ -622,12 +698,33 @@ def render_curation():
 
     q = st.text_area("기준 문서(질의로 사용)", value=doc.get("text","")[:2000], height=160)
     k = st.slider("상위 유사 문서 수", 3, 20, 8)
+    local = get_local_vector_index()
+    lc1, lc2 = st.columns([3, 1])
+    with lc1:
+        use_local = st.toggle(
+            "로컬 벡터 인덱스 우선 (빠름 · 원본은 Cognitive Search, 재구축 전이면 자동 대체)",
+            value=bool(local and local.ready()), disabled=local is None,
+        )
+        if local is not None:
+            ls = local.stats()
+            st.caption(f"로컬 인덱스 · {ls['vectors']}개 벡터 · {ls['mode']}" + (f" (nlist {ls['nlist']})" if ls["nlist"] else "")
+                       + ("" if ls["synced"] else " · 미동기 (재구축 필요)"))
+    with lc2:
+        if local is not None and st.button("로컬 인덱스 재구축"):
+            with st.spinner("Cognitive Search에서 벡터를 가져오는 중…"):
+                try:
+                    n = rebuild_local_vector_index()
+                    st.success(f"{n}개 벡터 반영")
+                except Exception as e:
+                    st.error(f"재구축 실패: {e}")
     if st.button("🔎 유사 문서 찾기 (벡터 검색)"):
+        t0 = time.perf_counter()
         with st.spinner("검색 중..."):
-            res = vector_search(q, k=k)
+            res = vector_search(q, k=k, aggregate_parents=True, use_local=use_local)
         items = res.get("value", [])
         st.session_state["sim_items"] = items
-        st.success(f"{len(items)}건 찾음")
+        where = "로컬 인덱스" if res.get("@local") else "Cognitive Search"
+        st.success(f"{len(items)}건 찾음 · {where} · {(time.perf_counter() - t0) * 1000:.0f}ms")
 
     items = st.session_state.get("sim_items", [])
     if items:
@@ -672,6 +769,7 @@ def render_curation():
         doc_title = st.text_input("병합 문서 제목", value=(current.get("name") if current else "Merged Document"))
         k = st.slider("참고 문서 개수 (Top-k)", 3, 10, 5)
         use_vector = st.checkbox("벡터 검색 사용", value=True)
+        use_passages = st.checkbox("관련 단락만 참고 (문서 전문 대신 상위 청크)", value=False, disabled=not use_vector)
 
     with rag_col2:
         target = st.radio("저장 위치", ["local", "blob", "onedrive"], horizontal=True)
@@ -682,11 +780,12 @@ def render_curation():
             st.warning("기준 문서(현재 문서)가 없습니다. 파일 허브에서 문서를 선택/불러오세요.")
         else:
             try:
-                with st.spinner("유사 문서 수집 및 병합 생성 중…"):
-                    merged_md, used = generate_merged_markdown(doc_title, base_text, k=k, use_vector=use_vector)
+                with st.spinner("유사 문서 수집 중…"):
+                    chunks, used = generate_merged_markdown_stream(doc_title, base_text, k=k, use_vector=use_vector,
+                                                                   passages=use_vector and use_passages)
+                merged_md = stream_text(chunks, keep=True)  # 생성되는 대로 미리보기
 
                 st.success("병합 문서 생성 완료")
-                st.code(merged_md[:1200])  # 미리보기
 
                 res = save_merged(merged_md, fname, target=target)
                 if res.get("ok"):
@@ -1,5 +1,6 @@
 # auth_code.py
-import time, requests, msal, streamlit as st
+import time, msal, streamlit as st
+import http_client
 from config import CONFIG
 
 GRAPH_ME = "https://graph.microsoft.com/v1.0/me"
@@ -13,7 +14,7 @@ def _client():
 
 def _save_profile_from_graph(access_token: str):
     """/me 호출해서 세션에 이름/메일 저장. mail이 비면 userPrincipalName으로 대체."""
-    r = requests.get(GRAPH_ME, headers={"Authorization": f"Bearer {access_token}"}, timeout=15)
+    r = http_client.get(GRAPH_ME, headers={"Authorization": f"Bearer {access_token}"}, timeout=15)
     r.raise_for_status()
     me = r.json()
     display = me.get("displayName") or me.get("givenName") or me.get("userPrincipalName") or "User"
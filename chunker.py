@@ -0,0 +1,162 @@
+# chunker.py – 토큰 기준 청크 분할 (헤딩/페이지 경계 우선 · 오버랩)
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import CONFIG
+
+# 선택 의존성: tiktoken 없으면 근사치 토크나이저 사용
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENC = None
+
+# 근사 토큰: 영문 단어/숫자 묶음, 한글은 음절 단위, 그 외 기호 1개
+_APPROX_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[가-힣]|\S")
+
+# 섹션 경계: 마크다운 헤딩, 추출기가 넣는 [Slide n]/[Sheet] 표식, 폼피드(페이지)
+_SECTION_RE = re.compile(r"^(#{1,6}\s+\S.*|\[Slide \d+\]|\[Sheet\] .*|\[Page \d+\])\s*$")
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENC is not None:
+        return len(_ENC.encode(text, disallowed_special=()))
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+def _split_sections(text: str) -> List[str]:
+    """헤딩/슬라이드/시트/페이지 경계에서 섹션 분리"""
+    sections, cur = [], []
+    for page in text.split("\f"):
+        for line in page.split("\n"):
+            if _SECTION_RE.match(line) and any(l.strip() for l in cur):
+                sections.append("\n".join(cur).strip())
+                cur = []
+            cur.append(line)
+        if any(l.strip() for l in cur):
+            sections.append("\n".join(cur).strip())
+        cur = []
+    return [s for s in sections if s]
+
+
+def _split_at_breaks(text: str, breaks: Iterable[int]) -> List[str]:
+    """추출기가 준 섹션 시작 오프셋(sectionBreaks)에서 먼저 나누고, 각 조각은 다시 헤딩 경계로 분리"""
+    bounds = [0] + sorted(b for b in breaks if 0 < b < len(text)) + [len(text)]
+    out = []
+    for start, end in zip(bounds, bounds[1:]):
+        out.extend(_split_sections(text[start:end]))
+    return out
+
+
+def _split_units(section: str, max_tokens: int) -> List[Tuple[str, str]]:
+    """
+    섹션을 문단 → 문장 → 고정 길이 순으로 쪼개 max_tokens 이하 단위 목록으로.
+    각 단위는 (앞 구분자, 텍스트) — 문단 사이는 빈 줄, 같은 문단의 문장 사이는 공백.
+    """
+    units = []
+    for para in re.split(r"\n\s*\n", section):
+        para = para.strip()
+        if not para:
+            continue
+        if count_tokens(para) <= max_tokens:
+            units.append(("\n\n", para))
+            continue
+        sep = "\n\n"
+        for sent in re.split(r"(?<=[.!?。])\s+|\n", para):
+            sent = sent.strip()
+            if not sent:
+                continue
+            if count_tokens(sent) <= max_tokens:
+                units.append((sep, sent))
+            else:
+                # 문장 하나가 너무 길면 글자 수로 강제 절단 (한글 기준 1글자 ≈ 1토큰)
+                step = max(1, max_tokens)
+                units.extend((sep if i == 0 else "", sent[i:i + step]) for i in range(0, len(sent), step))
+            sep = " "
+    return units
+
+
+def _join(units: List[Tuple[str, str]]) -> str:
+    return "".join(sep + text for sep, text in units).strip()
+
+
+def chunk_sections(sections: Iterable[str], max_tokens: Optional[int] = None,
+                   overlap_tokens: Optional[int] = None) -> List[str]:
+    """
+    섹션(페이지/헤딩 단위 텍스트) 목록 → 청크 목록.
+    한 섹션 안에서는 단위를 이어 붙이다 max_tokens를 넘기면 끊고,
+    직전 청크 끝의 overlap_tokens 만큼을 다음 청크 앞에 붙인다.
+    작은 섹션끼리는 max_tokens 안에서 합친다.
+    """
+    max_tokens = int(max_tokens or CONFIG.get("CHUNK_MAX_TOKENS", 800))
+    overlap_tokens = int(overlap_tokens if overlap_tokens is not None else CONFIG.get("CHUNK_OVERLAP_TOKENS", 100))
+
+    chunks: List[str] = []
+    cur: List[Tuple[str, str]] = []
+    cur_tok = 0
+
+    def _flush():
+        nonlocal cur, cur_tok
+        if cur:
+            chunks.append(_join(cur))
+        # 오버랩: 끝에서부터 overlap_tokens 만큼의 단위를 다음 청크에 유지
+        keep, tok = [], 0
+        for u in reversed(cur):
+            t = count_tokens(u[1])
+            if tok + t > overlap_tokens:
+                break
+            keep.insert(0, u)
+            tok += t
+        cur, cur_tok = keep, tok
+
+    for section in sections:
+        sec_tok = count_tokens(section)
+        # 섹션 경계: 합쳐도 넘치면 새 청크에서 시작 (헤딩이 청크 머리에 오도록 오버랩 없이)
+        if cur and cur_tok + sec_tok > max_tokens:
+            _flush()
+            cur, cur_tok = [], 0
+        for unit in _split_units(section, max_tokens):
+            t = count_tokens(unit[1])
+            if cur and cur_tok + t > max_tokens:
+                _flush()
+            cur.append(unit)
+            cur_tok += t
+    if cur:
+        chunks.append(_join(cur))
+    return [c for c in chunks if c]
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> List[str]:
+    return chunk_sections(_split_sections(text or ""), max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def build_chunk_records(doc: Dict, max_tokens: Optional[int] = None,
+                        overlap_tokens: Optional[int] = None) -> List[Dict]:
+    """
+    부모 문서 → 청크 레코드 목록. 한 청크에 다 들어가면 빈 목록(부모만 색인).
+    청크 id = '{원본ID}#chunk-{n}' (업서트 시 안전키 변환), originalId는 부모 원본ID 유지.
+    doc에 추출기가 준 sections(페이지/슬라이드/시트 행 묶음)가 있으면 본문을 다시 나누지 않고 그대로 사용,
+    sectionBreaks(본문 내 섹션 시작 오프셋)만 있으면 그 위치에서 먼저 나눔.
+    """
+    max_tokens = int(max_tokens or CONFIG.get("CHUNK_MAX_TOKENS", 800))
+    content = doc.get("content") or ""
+    if count_tokens(content) <= max_tokens:
+        return []
+    parent_id = doc.get("originalId") or doc.get("id")
+    sections = doc.get("sections")
+    if not sections:
+        breaks = doc.get("sectionBreaks")
+        sections = _split_at_breaks(content, breaks) if breaks else _split_sections(content)
+    out = []
+    for i, chunk in enumerate(chunk_sections(sections, max_tokens=max_tokens, overlap_tokens=overlap_tokens)):
+        rec = {k: v for k, v in doc.items() if k not in ("id", "content", "contentVector", "sections", "sectionBreaks")}
+        rec.update({
+            "id": f"{parent_id}#chunk-{i}",
+            "originalId": parent_id,
+            "chunkIndex": i,
+            "content": chunk,
+        })
+        out.append(rec)
+    return out
@@ -18,7 +18,7 @@ def get_metrics(session_state) -> Dict:
     - docs_loaded: Search 인덱스 문서 수
     - audits_done: 최근 로그에서 OpenAI 감사 이벤트 수(없으면 0)
     - pii_hits: 세션/로그 기반 값(없으면 0)
-    - dup_found: 벡터 검색/중복탐지 결과가 없다면 0
+    - dup_found: 중복 탐지(dedup.find_duplicates)로 찾은 중복 문서 수 (클러스터당 대표 1건 제외), 없으면 0
     """
     docs_loaded = 0
     try:
@@ -39,7 +39,15 @@ def get_metrics(session_state) -> Dict:
         audits_done = sum(1 for x in logs if str(x.get("source","")).lower() in ("openai","audit") or "감사" in str(x.get("message","")))
 
     pii_hits = session_state.get("_pii_hits", 0)  # 별도 저장 시 반영
-    dup_found = session_state.get("_dup_found", 0)
+    dup_found = session_state.get("_dup_found")
+    if dup_found is None:
+        # 세션에서 아직 실행 안 했으면 마지막 중복 탐지 결과(로컬 저장본)
+        try:
+            from dedup import load_last_result
+            last = load_last_result()
+            dup_found = last["duplicates"] if last else 0
+        except Exception:
+            dup_found = 0
 
     return {
         "docs_loaded": docs_loaded,
@@ -115,7 +123,7 @@ def find_stale_docs(days=90, top=50):
     lastModified(ISO string) 기준으로 오래된 문서 상위 N개 리스팅 (문자열 비교 한계 있음)
     운영에선 lastModified를 Edm.DateTimeOffset로 설계 권장.
     """
-    import requests
+    import http_client
     ep, idx = _ep(), _idx()
     url = f"{ep}/indexes('{idx}')/docs/search?api-version=2023-11-01"
     body = {
@@ -125,7 +133,7 @@ def find_stale_docs(days=90, top=50):
         "queryType": "simple",
         "orderby": "lastModified asc"  # 오래된 순
     }
-    r = requests.post(url, headers=_hdr(), json=body, timeout=30)
+    r = http_client.post(url, headers=_hdr(), json=body, timeout=30, idempotent=True)
     r.raise_for_status()
     return r.json().get("value", [])
 
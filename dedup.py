@@ -0,0 +1,281 @@
+# dedup.py – 코퍼스 전체 근사 중복 탐지 (임베딩 블록 행렬곱 · 본문 MinHash LSH · union-find 클러스터)
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import CONFIG
+from utils import local_state_path
+from local_vectors import get_local_vector_index
+from search import iter_index_records, iter_indexed_vectors
+
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+# MinHash: h(x) = (a·x + b) mod p, x = crc32(shingle) < 2^32, a < 2^31 → uint64 범위 안에서 계산
+_PRIME = 4294967311
+_NUM_PERM = 64
+_BANDS = 16            # LSH 밴드 수 (밴드당 4행) → Jaccard ≈ 0.7 이상이면 후보로 잡힘
+_BUCKET_PAIRWISE_MAX = 200   # 이보다 큰 버킷은 첫 항목과만 비교 (클러스터는 union-find로 이어짐)
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 1 << 31, size=_NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, size=_NUM_PERM, dtype=np.uint64)
+
+
+# ----------------------------
+# union-find
+# ----------------------------
+class UnionFind:
+    def __init__(self, n: int = 0):
+        self.parent = list(range(n))
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+# ----------------------------
+# 임베딩: 블록 행렬곱 all-pairs cosine
+# ----------------------------
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (m / norms).astype(np.float32, copy=False)
+
+
+def embedding_pairs(mat: np.ndarray, threshold: float, block: int = 2048,
+                    max_per_row: Optional[int] = None) -> Iterator[Tuple[int, int, float]]:
+    """
+    정규화 행렬의 i<j 쌍 중 cosine ≥ threshold 인 것 (상삼각 블록만 계산 · 블록당 block² 메모리).
+    행마다 점수 상위 max_per_row개만 (DEDUP_MAX_PAIRS_PER_DOC, 기본 20) → 기준값을 낮춰도 쌍 수는 O(n·m).
+    클러스터는 union-find로 이어지므로 상위 m개만으로도 연결은 유지됨.
+    """
+    m = int(max_per_row or CONFIG.get("DEDUP_MAX_PAIRS_PER_DOC", 20))
+    n = mat.shape[0]
+    for i0 in range(0, n, block):
+        a = mat[i0:i0 + block]
+        best_s = np.full((a.shape[0], m), -np.inf, dtype=np.float32)
+        best_j = np.full((a.shape[0], m), -1, dtype=np.int64)
+        for j0 in range(i0, n, block):
+            sims = a @ mat[j0:j0 + block].T
+            if i0 == j0:
+                sims = np.triu(sims, k=1)   # 대각/하삼각 제외
+            rows = np.flatnonzero((sims >= threshold).any(axis=1))
+            if not rows.size:
+                continue
+            # 기준을 넘는 행만 지금까지의 상위 m개와 합쳐 다시 상위 m개로
+            cand_s = np.concatenate([best_s[rows], sims[rows]], axis=1)
+            cand_j = np.concatenate([best_j[rows], np.broadcast_to(
+                np.arange(j0, j0 + sims.shape[1]), (rows.size, sims.shape[1]))], axis=1)
+            top = np.argpartition(-cand_s, m - 1, axis=1)[:, :m]
+            best_s[rows] = np.take_along_axis(cand_s, top, axis=1)
+            best_j[rows] = np.take_along_axis(cand_j, top, axis=1)
+        ii, kk = np.nonzero(best_s >= threshold)
+        for i, kx in zip(ii.tolist(), kk.tolist()):
+            yield i0 + i, int(best_j[i, kx]), float(best_s[i, kx])
+
+
+def _load_embeddings(progress: Optional[Callable[[str], None]] = None) -> Tuple[List[Dict], np.ndarray, str]:
+    """
+    로컬 벡터 인덱스가 전체 재구축된(synced) 상태면 그대로, 아니면 Cognitive Search에서
+    부모 문서 contentVector를 keyset 페이지로 수집 (업서트 미러만 있는 부분 인덱스는 쓰지 않음).
+    반환: (메타, 정규화 행렬, "local" | "search")
+    """
+    local = get_local_vector_index()
+    if local is not None and local.ready():
+        metas, mat = local.export(parents_only=True)
+        if len(metas):
+            return metas, mat, "local"
+    metas, rows = [], []
+    for page in iter_indexed_vectors(parents_only=True):
+        for v in page:
+            vec = v.pop("contentVector", None)
+            if vec:
+                metas.append(v)
+                rows.append(np.asarray(vec, dtype=np.float32))
+        if progress:
+            progress(f"임베딩 수집 {len(metas)}건")
+    if not rows:
+        return [], np.empty((0, 0), dtype=np.float32), "search"
+    return metas, _normalize(np.vstack(rows)), "search"
+
+
+# ----------------------------
+# 본문: 정확 일치 해시 + MinHash LSH
+# ----------------------------
+def _normalize_text(text: str) -> str:
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip().lower()
+
+
+def exact_key(text: str) -> str:
+    return hashlib.sha1(_normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def minhash_signature(text: str, k: int = 5, max_shingles: int = 20000) -> Optional[np.ndarray]:
+    """단어 k-shingle MinHash (shingle이 너무 많으면 crc 하위 max_shingles개만 → 문서 간 일관된 표본)"""
+    words = _WORD_RE.findall(_normalize_text(text))
+    if not words:
+        return None
+    k = min(k, len(words))
+    shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    if hashes.size > max_shingles:
+        hashes = np.partition(hashes, max_shingles - 1)[:max_shingles]
+    return ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def minhash_pairs(sigs: Dict[int, np.ndarray], threshold: float) -> Iterator[Tuple[int, int, float]]:
+    """LSH 밴딩으로 후보를 고른 뒤 서명 일치율(추정 Jaccard) ≥ threshold 인 쌍"""
+    rows = _NUM_PERM // _BANDS
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    for idx, sig in sigs.items():
+        for b in range(_BANDS):
+            buckets[(b, sig[b * rows:(b + 1) * rows].tobytes())].append(idx)
+    seen = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        star = len(members) > _BUCKET_PAIRWISE_MAX
+        for x in range(1 if star else len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = sorted((members[x], members[y]))
+                if (i, j) in seen:
+                    continue
+                seen.add((i, j))
+                jac = float(np.mean(sigs[i] == sigs[j]))
+                if jac >= threshold:
+                    yield i, j, jac
+
+
+# ----------------------------
+# 전체 실행
+# ----------------------------
+def find_duplicates(cosine_threshold: Optional[float] = None, jaccard_threshold: Optional[float] = None,
+                    use_text: bool = True, progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    부모 문서 단위 중복 클러스터.
+    - semantic : 임베딩 cosine ≥ cosine_threshold (DEDUP_COSINE_THRESHOLD, 기본 0.95)
+    - exact    : 정규화 본문 해시 동일
+    - near     : MinHash 추정 Jaccard ≥ jaccard_threshold (DEDUP_JACCARD_THRESHOLD, 기본 0.85)
+    반환: {"clusters": [{members, reasons, score}], "docs", "pairs", "duplicates", "elapsed_sec", "vectors_from"}
+    """
+    cos_t = float(cosine_threshold or CONFIG.get("DEDUP_COSINE_THRESHOLD", 0.95))
+    jac_t = float(jaccard_threshold or CONFIG.get("DEDUP_JACCARD_THRESHOLD", 0.85))
+    t0 = time.perf_counter()
+
+    metas, mat, vec_source = _load_embeddings(progress)
+    pos = {m.get("originalId") or m["id"]: i for i, m in enumerate(metas)}
+    uf = UnionFind(len(metas))
+    edges: Dict[Tuple[int, int], Dict] = {}
+
+    def _edge(i: int, j: int, reason: str, score: float):
+        uf.union(i, j)
+        e = edges.setdefault((min(i, j), max(i, j)), {"reasons": set(), "score": 0.0})
+        e["reasons"].add(reason)
+        e["score"] = max(e["score"], score)
+
+    if len(metas) > 1:
+        if progress:
+            progress(f"임베딩 유사도 계산 ({len(metas)}건)")
+        for i, j, s in embedding_pairs(mat, cos_t):
+            _edge(i, j, "semantic", s)
+    del mat
+
+    if use_text:
+        sigs: Dict[int, np.ndarray] = {}
+        exact: Dict[str, int] = {}
+        scanned = 0
+        for page in iter_index_records(("originalId", "name", "lastModified", "content"), parents_only=True):
+            for d in page:
+                key = d.get("originalId") or d["id"]
+                i = pos.get(key)
+                if i is None:   # 임베딩이 없는 문서도 본문 비교에는 포함
+                    i = uf.add()
+                    pos[key] = i
+                    metas.append({f: d.get(f) for f in ("id", "originalId", "name", "lastModified")})
+                text = d.get("content") or ""
+                if not text.strip():
+                    continue
+                h = exact_key(text)
+                if h in exact:
+                    _edge(exact[h], i, "exact", 1.0)
+                    continue    # 같은 본문은 대표 1건만 MinHash 비교
+                exact[h] = i
+                sig = minhash_signature(text)
+                if sig is not None:
+                    sigs[i] = sig
+            scanned += len(page)
+            if progress:
+                progress(f"본문 서명 {scanned}건")
+        for i, j, s in minhash_pairs(sigs, jac_t):
+            _edge(i, j, "near", s)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(metas)):
+        groups[uf.find(i)].append(i)
+    best: Dict[int, float] = defaultdict(float)
+    reasons: Dict[int, set] = defaultdict(set)
+    for (i, j), e in edges.items():
+        root = uf.find(i)
+        reasons[root] |= e["reasons"]
+        best[i] = max(best[i], e["score"])
+        best[j] = max(best[j], e["score"])
+    clusters = []
+    for root, members in groups.items():
+        if len(members) < 2:
+            continue
+        clusters.append({
+            "members": [{**{f: metas[i].get(f) for f in ("id", "originalId", "name", "lastModified")},
+                         "@search.score": round(best[i], 4)} for i in members],
+            "reasons": sorted(reasons[root]),
+            "score": round(max(best[i] for i in members), 4),
+        })
+    clusters.sort(key=lambda c: (-len(c["members"]), -c["score"]))
+    return {
+        "clusters": clusters,
+        "docs": len(metas),
+        "pairs": len(edges),
+        "duplicates": sum(len(c["members"]) - 1 for c in clusters),
+        "elapsed_sec": round(time.perf_counter() - t0, 2),
+        "thresholds": {"cosine": cos_t, "jaccard": jac_t},
+        "vectors_from": vec_source,
+    }
+
+
+def _result_path() -> str:
+    return local_state_path("dedup_result.json")
+
+
+def save_result(result: Dict):
+    tmp = f"{_result_path()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**result, "created": time.time()}, f, ensure_ascii=False)
+    os.replace(tmp, _result_path())
+
+
+def load_last_result() -> Optional[Dict]:
+    try:
+        with open(_result_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
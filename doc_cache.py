@@ -0,0 +1,153 @@
+# doc_cache.py – 원본 바이트/추출 텍스트 2단 캐시 (메모리 LRU + 디스크 · 용량 기준 제거)
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import CONFIG
+from utils import local_state_path
+
+
+def doc_cache_key(kind: str, source: str, item_id: str, version: str, mode: str = "") -> str:
+    """
+    kind: raw | text, version: ETag/cTag/lastModified (원본이 바뀌면 키가 달라져 자동 무효화)
+    mode: 추출기 (naive | docintel) — raw는 빈 값
+    """
+    return "|".join([kind, source or "", item_id or "", version or "", mode or ""])
+
+
+class DocCache:
+    """
+    1단: 프로세스 메모리 LRU (mem_bytes 한도)
+    2단: 로컬 디렉터리 파일 (disk_bytes 한도, 오래 안 쓴 파일부터 삭제)
+    디스크 적중 시 메모리로 다시 올림.
+    """
+
+    def __init__(self, directory: Optional[str] = None, mem_bytes: int = 128 << 20, disk_bytes: int = 1 << 30):
+        self.dir = directory or local_state_path("doc_cache")
+        os.makedirs(self.dir, exist_ok=True)
+        self.mem_bytes = mem_bytes
+        self.disk_bytes = disk_bytes
+        self.hits = {"mem": 0, "disk": 0}
+        self.misses = 0
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._mem_size = 0
+        self._lock = threading.Lock()
+        self._disk_size = sum(
+            e.stat().st_size for e in os.scandir(self.dir) if e.is_file() and not e.name.endswith(".tmp")
+        )
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.dir, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _mem_put_locked(self, key: str, data: bytes):
+        if len(data) > self.mem_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_size -= len(old)
+        self._mem[key] = data
+        self._mem_size += len(data)
+        while self._mem_size > self.mem_bytes:
+            _, v = self._mem.popitem(last=False)
+            self._mem_size -= len(v)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.hits["mem"] += 1
+                return data
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU 기준 시각 갱신
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits["disk"] += 1
+            self._mem_put_locked(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        if data is None:
+            return
+        data = bytes(data)
+        with self._lock:
+            self._mem_put_locked(key, data)
+        if len(data) > self.disk_bytes:
+            return
+        path = self._file(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            prev = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_size += len(data) - prev
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk_locked()
+
+    def _evict_disk_locked(self):
+        """mtime(=마지막 사용) 오래된 파일부터 한도의 90%까지 삭제"""
+        entries = sorted(
+            (e for e in os.scandir(self.dir) if e.is_file() and not e.name.endswith(".tmp")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        target = int(self.disk_bytes * 0.9)
+        size = sum(e.stat().st_size for e in entries)
+        for e in entries:
+            if size <= target:
+                break
+            try:
+                n = e.stat().st_size
+                os.remove(e.path)
+                size -= n
+            except OSError:
+                pass
+        self._disk_size = size
+
+    def get_text(self, key: str) -> Optional[str]:
+        data = self.get(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def put_text(self, key: str, text: str):
+        self.put(key, (text or "").encode("utf-8"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mem_hits": self.hits["mem"], "disk_hits": self.hits["disk"], "misses": self.misses,
+                "mem_mb": round(self._mem_size / (1 << 20), 1), "disk_mb": round(self._disk_size / (1 << 20), 1),
+            }
+
+
+_CACHE: Optional[DocCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_doc_cache() -> Optional[DocCache]:
+    """DOC_CACHE_ENABLED가 false면 None"""
+    global _CACHE
+    if str(CONFIG.get("DOC_CACHE_ENABLED", "true")).lower() in ("0", "false", "no"):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = DocCache(
+                directory=CONFIG.get("DOC_CACHE_DIR") or None,
+                mem_bytes=int(float(CONFIG.get("DOC_CACHE_MEM_MB", 128)) * (1 << 20)),
+                disk_bytes=int(float(CONFIG.get("DOC_CACHE_DISK_MB", 1024)) * (1 << 20)),
+            )
+        return _CACHE
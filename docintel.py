@@ -1,11 +1,15 @@
 # docintel.py — Robust Azure Document Intelligence client (analyze + polling + fallback)
 import time
 import json
+import asyncio
+import threading
 import requests
+import http_client
+import aio_http
+from http_client import _retry_hint
 import streamlit as st
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from config import CONFIG
-import io, os, mimetypes
 
 _HEADERS_BIN = {
     "Ocp-Apim-Subscription-Key": CONFIG["AI_DOC_INTEL_KEY"],
@@ -22,42 +26,90 @@ def _endpoint() -> str:
         ep = "https://" + ep
     return ep
 
-def _poll_operation_result(op_location: str, api_version: str, timeout_sec: int = 60, interval: float = 1.2) -> dict:
-    deadline = time.time() + timeout_sec
+def _operation_status(data: dict) -> Optional[dict]:
+    """폴링 응답 → 완료면 결과, 진행 중이면 None, 실패면 예외"""
+    status = data.get("status") or data.get("status", "").lower()
+    if status in ("succeeded", "Succeeded"):
+        return data
+    if status in ("failed", "Failed"):
+        raise RuntimeError(f"DocIntel analyze failed: {json.dumps(data, ensure_ascii=False)[:800]}")
+    return None
+
+def _poll_settings(timeout_sec: Optional[float], interval: Optional[float]):
+    """(deadline, 시작 간격, 최대 간격) — 대용량 스캔 PDF는 수 분이 걸려 기본 제한을 넉넉히"""
+    timeout_sec = float(timeout_sec or CONFIG.get("DOCINTEL_TIMEOUT_SEC", 600))
+    interval = float(interval or CONFIG.get("DOCINTEL_POLL_MIN_SEC", 1.0))
+    max_interval = float(CONFIG.get("DOCINTEL_POLL_MAX_SEC", 10.0))
+    return time.time() + timeout_sec, interval, max(interval, max_interval)
+
+def _next_poll(r, interval: float, max_interval: float, deadline: float):
+    """
+    다음 폴링까지 대기 시간과 다음 간격.
+    서비스가 준 Retry-After를 우선하고, 없으면 1.5배씩 늘려 오래 걸리는 작업의 GET 수를 줄인다.
+    """
+    hint = _retry_hint(r)
+    delay = max(interval, hint) if hint is not None else interval
+    delay = max(0.0, min(delay, deadline - time.time()))
+    return delay, min(max_interval, interval * 1.5)
+
+def _poll_operation_result(op_location: str, api_version: str, timeout_sec: float = None, interval: float = None) -> dict:
+    deadline, interval, max_interval = _poll_settings(timeout_sec, interval)
     headers = {"Ocp-Apim-Subscription-Key": CONFIG["AI_DOC_INTEL_KEY"]}
     while time.time() < deadline:
-        r = requests.get(op_location, headers=headers, timeout=30)
+        r = http_client.get(op_location, headers=headers, timeout=30)
         r.raise_for_status()
-        data = r.json()
-        status = data.get("status") or data.get("status", "").lower()
-        if status in ("succeeded", "Succeeded"):
-            return data
-        if status in ("failed", "Failed"):
-            raise RuntimeError(f"DocIntel analyze failed: {json.dumps(data, ensure_ascii=False)[:800]}")
-        time.sleep(interval)
+        done = _operation_status(r.json())
+        if done is not None:
+            return done
+        delay, interval = _next_poll(r, interval, max_interval, deadline)
+        time.sleep(delay)
     raise TimeoutError("DocIntel analyze polling timeout")
 
-def _analyze_bytes(content: bytes, mime_type: str, model: str, api_version: str) -> dict:
+async def _apoll_operation_result(op_location: str, api_version: str, timeout_sec: float = None, interval: float = None) -> dict:
+    deadline, interval, max_interval = _poll_settings(timeout_sec, interval)
+    headers = {"Ocp-Apim-Subscription-Key": CONFIG["AI_DOC_INTEL_KEY"]}
+    while time.time() < deadline:
+        r = await aio_http.aget(op_location, headers=headers, timeout=30)
+        aio_http.raise_for_status(r, "DocIntel poll ")
+        done = _operation_status(r.json())
+        if done is not None:
+            return done
+        delay, interval = _next_poll(r, interval, max_interval, deadline)
+        await asyncio.sleep(delay)
+    raise TimeoutError("DocIntel analyze polling timeout")
+
+def _analyze_request(mime_type: str, model: str, api_version: str):
     url = f"{_endpoint()}/documentintelligence/documentModels/{model}:analyze?_overload=analyzeDocument&api-version={api_version}"
     headers = dict(_HEADERS_BIN)
     headers["Content-Type"] = mime_type or "application/octet-stream"
+    return url, headers
 
-    # 시작(비동기) → 202 + operation-location
-    r = requests.post(url, headers=headers, data=content, timeout=60)
+def _operation_location(r) -> str:
     if r.status_code == 404:
         # 모델/버전/경로 불일치일 확률 큼 — 상위에서 폴백 기회 제공
         raise requests.HTTPError("404 Not Found", response=r)
-    r.raise_for_status()
-
+    aio_http.raise_for_status(r, "DocIntel analyze ")
     op_loc = r.headers.get("operation-location") or r.headers.get("Operation-Location")
     if not op_loc:
         # 최신 버전은 반드시 LRO를 반환
         raise RuntimeError(f"operation-location header missing: {r.text[:500]}")
+    return op_loc
 
+def _analyze_bytes(content: bytes, mime_type: str, model: str, api_version: str) -> dict:
+    url, headers = _analyze_request(mime_type, model, api_version)
+    # 시작(비동기) → 202 + operation-location
+    r = http_client.post(url, headers=headers, data=content, timeout=60)
+    op_loc = _operation_location(r)
     # 폴링
     result = _poll_operation_result(op_loc, api_version=api_version)
     return result
 
+async def _aanalyze_bytes(content: bytes, mime_type: str, model: str, api_version: str) -> dict:
+    url, headers = _analyze_request(mime_type, model, api_version)
+    r = await aio_http.apost(url, headers=headers, data=content, timeout=60)
+    op_loc = _operation_location(r)
+    return await _apoll_operation_result(op_loc, api_version=api_version)
+
 def _extract_text_from_result(result: dict) -> str:
     # 2024-07-31 / 2023-07-31 공통 구조: analyzeResult → content / pages/lines/words 등
     ar = result.get("analyzeResult") or {}
@@ -77,207 +129,118 @@ def _extract_text_from_result(result: dict) -> str:
                 out_lines.append(txt)
     return "\n".join(out_lines).strip()
 
+# ─────────────────────────────────────────────────────────
+# 엔드포인트별 (api_version, model) 가용성 캐시
+#  - 성공한 조합은 TTL 동안 맨 앞에서 바로 시도
+#  - 404 난 조합은 TTL 동안 건너뜀 (큰 문서를 404 확인용으로 다시 올리지 않도록)
+# ─────────────────────────────────────────────────────────
+_CAPS: Dict[str, Dict] = {}
+_CAPS_LOCK = threading.Lock()
+
+def _caps_ttl() -> float:
+    return float(CONFIG.get("DOCINTEL_CAPABILITY_TTL_SEC", 3600))
+
+def _remember_capability(ver: str, model: str, ok: bool):
+    combo = (ver, model)
+    with _CAPS_LOCK:
+        cap = _CAPS.setdefault(_endpoint(), {"ok": None, "ok_at": 0.0, "bad": {}})
+        if ok:
+            cap["ok"], cap["ok_at"] = combo, time.time()
+            cap["bad"].pop(combo, None)
+        else:
+            cap["bad"][combo] = time.time()
+            if cap["ok"] == combo:
+                cap["ok"] = None
+
+def get_docintel_capabilities() -> Dict[str, Dict]:
+    """엔드포인트별 {ok, bad} 스냅샷 (운영 화면/디버그용)"""
+    with _CAPS_LOCK:
+        return {ep: {"ok": c["ok"], "bad": sorted(c["bad"])} for ep, c in _CAPS.items()}
+
+def _docintel_attempts() -> List[Tuple[str, str]]:
+    """(api_version, model) 시도 순서 — 가용성 캐시 반영"""
+    preferred_model = (CONFIG.get("AI_DOC_INTEL_MODEL") or "prebuilt-read").strip() or "prebuilt-read"
+    api_versions = ["2024-11-30"]
+    models = [preferred_model, "prebuilt-read", "prebuilt-layout"]
+    attempts = list(dict.fromkeys((ver, model) for ver in api_versions for model in models))
+
+    ttl, now = _caps_ttl(), time.time()
+    with _CAPS_LOCK:
+        cap = _CAPS.get(_endpoint())
+        if not cap:
+            return attempts
+        ok = cap["ok"] if now - cap["ok_at"] < ttl else None
+        bad = {c for c, ts in cap["bad"].items() if now - ts < ttl}
+    usable = [a for a in attempts if a not in bad]
+    if ok in usable:
+        usable.remove(ok)
+        usable.insert(0, ok)
+    # 전부 404로 기록돼 있으면 캐시를 무시하고 다시 확인
+    return usable or attempts
+
 def extract_text_docintel(content: bytes, mime_type: Optional[str] = None) -> str:
     """
     Azure Document Intelligence로 텍스트 추출 (비동기 폴링 + 다중 모델/버전 폴백)
     - 기본: 2024-11-30 + prebuilt-read
-    - 폴백: 2024-11-30 + prebuilt-layout → prebuilt-read → prebuilt-layout
+    - 폴백: 2024-11-30 + prebuilt-layout → prebuilt-read → prebuilt-layout (404일 때만)
     """
-    preferred_model = (CONFIG.get("AI_DOC_INTEL_MODEL") or "prebuilt-read").strip() or "prebuilt-read"
-    api_versions = ["2024-11-30"]
-    models = [preferred_model, "prebuilt-read", "prebuilt-layout"]
-
     last_err = None
-    for ver in api_versions:
-        for model in models:
-            try:
-                res = _analyze_bytes(content, mime_type or "application/octet-stream", model=model, api_version=ver)
-                txt = _extract_text_from_result(res)
-                if not txt:
-                    raise RuntimeError("Empty text extracted")
-                return txt
-            except requests.HTTPError as he:
-                # 404면 다음 조합으로 시도
-                if he.response is not None and he.response.status_code == 404:
-                    # 상세 메시지 화면 표시
-                    try:
-                        detail = he.response.json()
-                    except Exception:
-                        detail = he.response.text
-                    st.info(f"DocIntel 404 (ver={ver}, model={model}) → 다음 조합 시도\n{detail}")
-                    last_err = he
-                    continue
-                # 그 외 HTTP 에러는 즉시 표시 후 다음 조합
-                st.warning(f"DocIntel HTTPError (ver={ver}, model={model}): {he}")
+    for ver, model in _docintel_attempts():
+        try:
+            res = _analyze_bytes(content, mime_type or "application/octet-stream", model=model, api_version=ver)
+            _remember_capability(ver, model, True)
+            txt = _extract_text_from_result(res)
+            if not txt:
+                raise RuntimeError("Empty text extracted")
+            return txt
+        except requests.HTTPError as he:
+            # 404면 다음 조합으로 시도
+            if he.response is not None and he.response.status_code == 404:
+                _remember_capability(ver, model, False)
+                # 상세 메시지 화면 표시
+                try:
+                    detail = he.response.json()
+                except Exception:
+                    detail = he.response.text
+                st.info(f"DocIntel 404 (ver={ver}, model={model}) → 다음 조합 시도\n{detail}")
                 last_err = he
                 continue
-            except Exception as e:
-                # 네트워크/타임아웃 등
-                st.warning(f"DocIntel Exception (ver={ver}, model={model}): {e}")
-                last_err = e
-                continue
+            # 그 외(401/403/429·타임아웃·네트워크)는 다른 조합으로 바꿔도 같은 결과 → 재업로드/재과금 없이 바로 전달
+            st.warning(f"DocIntel HTTPError (ver={ver}, model={model}): {he}")
+            raise
+        except Exception as e:
+            st.warning(f"DocIntel Exception (ver={ver}, model={model}): {e}")
+            raise
 
     # 모든 조합 실패
     if last_err:
         raise last_err
     raise RuntimeError("DocIntel analyze failed with no additional details")
 
-
-# 선택 의존성: 없는 경우에도 graceful fallback
-try:
-    import PyPDF2
-except Exception:
-    PyPDF2 = None
-
-try:
-    import docx  # python-docx
-except Exception:
-    docx = None
-
-try:
-    from pptx import Presentation  # python-pptx
-except Exception:
-    Presentation = None
-
-try:
-    import openpyxl
-except Exception:
-    openpyxl = None
-
-try:
-    import chardet
-except Exception:
-    chardet = None
-
-
-def _guess_ext(filename: str) -> str:
-    return os.path.splitext(filename or "")[-1].lower()
-
-
-def _detect_text_encoding(data: bytes) -> str:
-    if not data:
-        return "utf-8"
-    if chardet:
-        try:
-            enc = chardet.detect(data).get("encoding") or "utf-8"
-            return enc
-        except Exception:
-            pass
-    # 안전 기본값
-    return "utf-8"
-
-
-def _extract_txt_like(filename: str, data: bytes) -> str:
-    enc = _detect_text_encoding(data)
-    try:
-        return data.decode(enc, errors="replace")
-    except Exception:
-        # 최후의 보루
-        return data.decode("utf-8", errors="replace")
-
-
-def _extract_pdf(data: bytes) -> str:
-    if not PyPDF2:
-        return "[PDF parser(PyPDF2) 미설치] requirements.txt에 PyPDF2 추가하세요."
-    try:
-        buf = io.BytesIO(data)
-        reader = PyPDF2.PdfReader(buf)
-        texts = []
-        for page in reader.pages:
-            try:
-                t = page.extract_text() or ""
-            except Exception:
-                t = ""
-            if t:
-                texts.append(t)
-        return "\n\n".join(texts).strip() or "[빈 PDF이거나 텍스트 추출 실패]"
-    except Exception as e:
-        return f"[PDF 추출 오류] {e}"
-
-
-def _extract_docx(data: bytes) -> str:
-    if not docx:
-        return "[DOCX parser(python-docx) 미설치] requirements.txt에 python-docx 추가하세요."
-    try:
-        buf = io.BytesIO(data)
-        d = docx.Document(buf)
-        paras = [p.text for p in d.paragraphs if p.text]
-        return "\n".join(paras).strip() or "[DOCX 본문이 비어있음]"
-    except Exception as e:
-        return f"[DOCX 추출 오류] {e}"
-
-
-def _extract_pptx(data: bytes) -> str:
-    if not Presentation:
-        return "[PPTX parser(python-pptx) 미설치] requirements.txt에 python-pptx 추가하세요."
-    try:
-        buf = io.BytesIO(data)
-        prs = Presentation(buf)
-        lines = []
-        for i, slide in enumerate(prs.slides, start=1):
-            lines.append(f"[Slide {i}]")
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text:
-                    lines.append(shape.text)
-        return "\n".join(lines).strip() or "[PPTX 텍스트가 없습니다]"
-    except Exception as e:
-        return f"[PPTX 추출 오류] {e}"
-
-
-def _extract_xlsx(data: bytes) -> str:
-    if not openpyxl:
-        return "[XLSX parser(openpyxl) 미설치] requirements.txt에 openpyxl 추가하세요."
-    try:
-        buf = io.BytesIO(data)
-        wb = openpyxl.load_workbook(buf, data_only=True)
-        lines = []
-        for ws in wb.worksheets:
-            lines.append(f"[Sheet] {ws.title}")
-            for row in ws.iter_rows(values_only=True):
-                row_vals = ["" if v is None else str(v) for v in row]
-                lines.append("\t".join(row_vals))
-        return "\n".join(lines).strip() or "[XLSX 내용이 없습니다]"
-    except Exception as e:
-        return f"[XLSX 추출 오류] {e}"
-
-
-def extract_text_naive(filename: str, content: bytes) -> str:
+async def aextract_text_docintel(content: bytes, mime_type: Optional[str] = None) -> str:
     """
-    간단 텍스트 추출기 (로컬 파싱)
-    - PDF: PyPDF2
-    - DOCX: python-docx
-    - PPTX: python-pptx
-    - XLSX: openpyxl (탭으로 셀 연결)
-    - TXT/MD/기타 텍스트: chardet로 인코딩 추정 후 디코드
-    - 그 외: MIME/확장자에 따라 best-effort
+    extract_text_docintel의 비동기 버전. 여러 문서를 asyncio.gather로 동시에 분석할 때 사용.
+    공용 루프 스레드에서 돌기 때문에 Streamlit 메시지는 띄우지 않고 마지막 오류만 전달.
     """
-    ext = _guess_ext(filename)
-
-    # 확장자 우선 분기
-    if ext == ".pdf":
-        return _extract_pdf(content)
-    if ext == ".docx":
-        return _extract_docx(content)
-    if ext == ".pptx":
-        return _extract_pptx(content)
-    if ext in (".xlsx", ".xlsm"):
-        return _extract_xlsx(content)
-    if ext in (".txt", ".md", ".csv", ".log"):
-        return _extract_txt_like(filename, content)
+    last_err = None
+    for ver, model in _docintel_attempts():
+        try:
+            res = await _aanalyze_bytes(content, mime_type or "application/octet-stream", model=model, api_version=ver)
+            _remember_capability(ver, model, True)
+            txt = _extract_text_from_result(res)
+            if not txt:
+                raise RuntimeError("Empty text extracted")
+            return txt
+        except requests.HTTPError as e:
+            # 404(모델/버전 미지원)만 다음 조합으로 — 그 외 오류는 바로 전달
+            if e.response is None or e.response.status_code != 404:
+                raise
+            _remember_capability(ver, model, False)
+            last_err = e
+    if last_err:
+        raise last_err
+    raise RuntimeError("DocIntel analyze failed with no additional details")
 
-    # 확장자가 애매할 때 MIME 힌트 시도
-    mt, _ = mimetypes.guess_type(filename or "")
-    if mt:
-        if mt == "application/pdf":
-            return _extract_pdf(content)
-        if mt in ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",):
-            return _extract_docx(content)
-        if mt in ("application/vnd.openxmlformats-officedocument.presentationml.presentation",):
-            return _extract_pptx(content)
-        if mt in ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",):
-            return _extract_xlsx(content)
-        if mt.startswith("text/"):
-            return _extract_txt_like(filename, content)
 
-    # 마지막 fallback: 텍스트 시도
-    return _extract_txt_like(filename, content)
+# 로컬 추출기는 local_extract로 분리 (프로세스 풀 워커가 Streamlit 없이 import) — 기존 import 경로 유지
+from local_extract import extract_text_naive  # noqa: E402,F401
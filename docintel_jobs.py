@@ -0,0 +1,44 @@
+# docintel_jobs.py – Document Intelligence 분석 작업 관리자 (일괄 제출 · 공용 이벤트 루프에서 동시 폴링)
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from config import CONFIG
+from aio_http import get_loop
+from docintel import aextract_text_docintel
+
+
+class DocIntelJobs:
+    """
+    analyze 요청을 제출 즉시 Future로 돌려주고, 대기 중인 operation-location 폴링은
+    공용 이벤트 루프 한 스레드에서 모두 동시에 진행한다 (문서당 스레드/슬립 없음).
+    동시에 진행 중인 분석 수는 max_inflight로 제한 (초과분은 루프 안에서 대기).
+    """
+
+    def __init__(self, max_inflight: Optional[int] = None):
+        self.max_inflight = int(max_inflight or CONFIG.get("DOCINTEL_MAX_INFLIGHT", 16))
+        self._sem: Optional[asyncio.Semaphore] = None  # 루프 스레드에서 생성
+
+    async def _run(self, content: bytes, mime_type: Optional[str]) -> str:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_inflight)
+        async with self._sem:
+            return await aextract_text_docintel(content, mime_type)
+
+    def submit(self, content: bytes, mime_type: Optional[str] = None) -> Future:
+        """분석 제출 → concurrent.futures.Future[str] (추출 텍스트)"""
+        return asyncio.run_coroutine_threadsafe(self._run(content, mime_type), get_loop())
+
+
+_JOBS: Optional[DocIntelJobs] = None
+_JOBS_LOCK = threading.Lock()
+
+
+def get_docintel_jobs() -> DocIntelJobs:
+    """프로세스 공용 인스턴스 (같은 DocIntel 리소스 할당량을 공유)"""
+    global _JOBS
+    with _JOBS_LOCK:
+        if _JOBS is None:
+            _JOBS = DocIntelJobs()
+        return _JOBS
@@ -0,0 +1,169 @@
+# embed_batcher.py – 임베딩 요청 패킹/분할/동시 실행 (TPM·RPM 예산 내)
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+import requests
+
+from config import CONFIG
+from chunker import count_tokens
+
+
+class RateBudget:
+    """
+    최근 60초 슬라이딩 윈도우 기준 TPM/RPM 예산. 0이면 무제한.
+    acquire()는 예산이 생길 때까지 대기.
+    """
+
+    def __init__(self, tpm: int = 0, rpm: int = 0, window_sec: float = 60.0):
+        self.tpm = int(tpm or 0)
+        self.rpm = int(rpm or 0)
+        self.window = window_sec
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._events and now - self._events[0][0] >= self.window:
+            _, t = self._events.popleft()
+            self._tokens -= t
+
+    def acquire(self, tokens: int):
+        if not self.tpm and not self.rpm:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                tok_ok = not self.tpm or not self._events or self._tokens + tokens <= self.tpm
+                req_ok = not self.rpm or len(self._events) < self.rpm
+                if tok_ok and req_ok:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                wait = self.window - (now - self._events[0][0])
+            time.sleep(max(0.05, min(wait, 5.0)))
+
+
+_BUDGET: Optional[RateBudget] = None
+_BUDGET_LOCK = threading.Lock()
+
+
+def _budget() -> RateBudget:
+    """프로세스 전체가 같은 Azure OpenAI 할당량을 공유하므로 단일 인스턴스"""
+    global _BUDGET
+    with _BUDGET_LOCK:
+        if _BUDGET is None:
+            _BUDGET = RateBudget(tpm=int(CONFIG.get("EMBED_TPM", 0)), rpm=int(CONFIG.get("EMBED_RPM", 0)))
+        return _BUDGET
+
+
+def pack_batches(token_counts: Sequence[int], max_items: int, max_tokens: int) -> List[List[int]]:
+    """입력 순서를 유지하며 (항목 수 ≤ max_items, 토큰 합 ≤ max_tokens) 묶음의 인덱스 목록 생성"""
+    batches, cur, cur_tok = [], [], 0
+    for i, t in enumerate(token_counts):
+        if cur and (len(cur) >= max_items or cur_tok + t > max_tokens):
+            batches.append(cur)
+            cur, cur_tok = [], 0
+        cur.append(i)
+        cur_tok += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+# 400 중 배치 크기 때문인 것만 (배포 이름/api-version/콘텐츠 필터 400은 나눠 보내도 같으므로 바로 예외)
+_OVERSIZE_RE = re.compile(r"context_length_exceeded|maximum context length|too many (?:inputs|tokens)|token limit", re.I)
+
+
+def _is_oversize_error(e: Exception) -> bool:
+    resp = getattr(e, "response", None)
+    if not isinstance(e, requests.HTTPError) or resp is None:
+        return False
+    if resp.status_code == 413:
+        return True
+    if resp.status_code != 400:
+        return False
+    try:
+        body = resp.text or ""
+    except Exception:
+        body = ""
+    return bool(_OVERSIZE_RE.search(body))
+
+
+def embed_in_batches(texts: Sequence[str], request_fn: Callable[[List[str]], List[List[float]]],
+                     max_items: Optional[int] = None, max_tokens: Optional[int] = None,
+                     concurrency: Optional[int] = None) -> List[List[float]]:
+    """
+    texts를 토큰 예산/항목 수 한도로 묶어 request_fn(batch)을 동시에 호출하고 입력 순서대로 벡터 반환.
+    413 또는 컨텍스트/토큰 한도 초과 400이면 배치를 반으로 나눠 재시도 (1건짜리면 그대로 예외).
+    """
+    max_items = int(max_items or CONFIG.get("EMBED_BATCH_MAX_ITEMS", 64))
+    max_tokens = int(max_tokens or CONFIG.get("EMBED_BATCH_MAX_TOKENS", 32000))
+    concurrency = int(concurrency or CONFIG.get("EMBED_CONCURRENCY", 4))
+    if not texts:
+        return []
+
+    counts = [count_tokens(t) for t in texts]
+    budget = _budget()
+
+    def _run(idxs: List[int]) -> List[List[float]]:
+        budget.acquire(sum(counts[i] for i in idxs))
+        try:
+            return request_fn([texts[i] for i in idxs])
+        except Exception as e:
+            if len(idxs) > 1 and _is_oversize_error(e):
+                mid = len(idxs) // 2
+                return _run(idxs[:mid]) + _run(idxs[mid:])
+            raise
+
+    batches = pack_batches(counts, max_items, max_tokens)
+    out: List[Optional[List[float]]] = [None] * len(texts)
+    if len(batches) == 1 or concurrency <= 1:
+        results = [_run(b) for b in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches)), thread_name_prefix="embed") as pool:
+            results = list(pool.map(_run, batches))
+    for b, vecs in zip(batches, results):
+        for i, v in zip(b, vecs):
+            out[i] = v
+    return out
+
+
+async def aembed_in_batches(texts: Sequence[str], request_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+                            max_items: Optional[int] = None, max_tokens: Optional[int] = None,
+                            concurrency: Optional[int] = None) -> List[List[float]]:
+    """embed_in_batches의 비동기 버전 (request_fn은 코루틴 함수, 동시 실행은 세마포어로 제한)"""
+    max_items = int(max_items or CONFIG.get("EMBED_BATCH_MAX_ITEMS", 64))
+    max_tokens = int(max_tokens or CONFIG.get("EMBED_BATCH_MAX_TOKENS", 32000))
+    concurrency = int(concurrency or CONFIG.get("EMBED_CONCURRENCY", 4))
+    if not texts:
+        return []
+
+    counts = [count_tokens(t) for t in texts]
+    budget = _budget()
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(idxs: List[int]) -> List[List[float]]:
+        async with sem:
+            await asyncio.to_thread(budget.acquire, sum(counts[i] for i in idxs))
+            try:
+                return await request_fn([texts[i] for i in idxs])
+            except Exception as e:
+                if len(idxs) <= 1 or not _is_oversize_error(e):
+                    raise
+        mid = len(idxs) // 2  # 세마포어를 놓은 뒤 분할 재시도 (교착 방지)
+        left, right = await asyncio.gather(_run(idxs[:mid]), _run(idxs[mid:]))
+        return left + right
+
+    batches = pack_batches(counts, max_items, max_tokens)
+    results = await asyncio.gather(*(_run(b) for b in batches))
+    out: List[Optional[List[float]]] = [None] * len(texts)
+    for b, vecs in zip(batches, results):
+        for i, v in zip(b, vecs):
+            out[i] = v
+    return out
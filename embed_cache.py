@@ -0,0 +1,118 @@
+# embed_cache.py – 임베딩 영구 캐시 (SQLite · LRU 제거 · hit/miss 카운터)
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from config import CONFIG
+from utils import local_state_path
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """캐시 키용 정규화: NFC + 공백 압축 + 양끝 공백 제거"""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def cache_key(deployment: str, dim, text: str) -> str:
+    h = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{deployment}|{dim}|{h}"
+
+
+class EmbeddingCache:
+    """
+    key = (deployment, dimension, sha256(normalized text)) → float32 벡터
+    - max_entries 초과 시 last_used가 오래된 항목부터 제거(LRU)
+    - Streamlit 재시작 후에도 유지 (로컬 SQLite 파일)
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 50000):
+        self.path = path or local_state_path("embed_cache.sqlite")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        uniq = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(uniq), 500):  # SQLite 변수 개수 제한
+                part = uniq[i:i + 500]
+                q = f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})"
+                for k, blob in self._conn.execute(q, part):
+                    found[k] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used=? WHERE key=?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(k, array("f", v).tobytes(), now) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, vec, last_used) VALUES (?,?,?)", rows
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        over = count - self.max_entries
+        if over > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (over,)
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        total = self.hits + self.misses
+        return {
+            "entries": count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_CACHE: Optional[EmbeddingCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """프로세스 단일 캐시. EMBED_CACHE_ENABLED=false면 None"""
+    global _CACHE
+    if str(CONFIG.get("EMBED_CACHE_ENABLED", "true")).lower() in ("0", "false", "no"):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = EmbeddingCache(
+                path=CONFIG.get("EMBED_CACHE_PATH") or None,
+                max_entries=int(CONFIG.get("EMBED_CACHE_MAX_ENTRIES", 50000)),
+            )
+        return _CACHE
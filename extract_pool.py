@@ -0,0 +1,194 @@
+# extract_pool.py – 로컬 추출(PDF/DOCX/PPTX/XLSX) 프로세스 풀 (작업별 타임아웃 · 워커 메모리 상한)
+import io
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, wait as futures_wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from config import CONFIG
+from local_extract import extract_sections_naive, extract_text_naive, worker_extract, worker_init, worker_sections
+
+
+def _size_of(content) -> int:
+    if hasattr(content, "read"):
+        pos = content.seek(0, os.SEEK_END)
+        content.seek(0)
+        return pos
+    return len(content or b"")
+
+
+def _file_path(content) -> Optional[str]:
+    """디스크에 있는 파일 객체(NamedTemporaryFile 등)면 그 경로 — 워커가 직접 열어 읽음"""
+    name = getattr(content, "name", None)
+    if isinstance(name, str) and os.path.isabs(name) and os.path.isfile(name):   # 업로드 파일의 .name은 파일명뿐
+        if hasattr(content, "flush"):
+            content.flush()
+        return name
+    return None
+
+
+def _spool_to_path(content) -> str:
+    """경로 없는 파일 객체만 이름 있는 임시 파일로 복사해 경로 반환 (호출자가 삭제)"""
+    content.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="docspace_extract_", delete=False) as f:
+        shutil.copyfileobj(content, f, 1 << 20)
+    content.seek(0)
+    return f.name
+
+
+class ExtractionPool:
+    """
+    PyPDF2/python-docx/python-pptx/openpyxl 파싱을 별도 프로세스에서 실행해
+    Streamlit 스크립트 스레드(GIL)를 막지 않고, 여러 파일을 코어 수만큼 병렬 처리.
+    - 작업별 timeout_sec는 워커에서 실행 시간만 재어 적용 (풀·다른 작업은 그대로).
+      워커 타이머로도 멈추지 않는 작업만 풀의 워커를 강제 종료하고 새 풀로 교체
+    - 워커별 주소공간 상한 mem_limit_mb (POSIX)
+    - min_bytes 미만의 작은 파일은 프로세스 왕복 비용이 더 커서 현재 스레드에서 처리
+    """
+
+    HARD_GRACE_SEC = 10.0
+
+    def __init__(self, workers: Optional[int] = None, timeout_sec: Optional[float] = None,
+                 mem_limit_mb: Optional[int] = None, min_bytes: Optional[int] = None):
+        self.workers = int(workers or CONFIG.get("EXTRACT_POOL_WORKERS", 0) or max(1, min(4, os.cpu_count() or 1)))
+        self.timeout_sec = float(timeout_sec or CONFIG.get("EXTRACT_TIMEOUT_SEC", 120))
+        self.mem_limit_mb = int(mem_limit_mb if mem_limit_mb is not None else CONFIG.get("EXTRACT_MEM_LIMIT_MB", 1024))
+        self.min_bytes = int(min_bytes if min_bytes is not None else CONFIG.get("EXTRACT_POOL_MIN_BYTES", 256 * 1024))
+        self.enabled = True
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._pool is None and self.enabled:
+                # fork는 Streamlit 스레드/소켓 상태까지 복제하므로 spawn 사용
+                kwargs = dict(max_workers=self.workers, mp_context=mp.get_context("spawn"),
+                              initializer=worker_init, initargs=(self.mem_limit_mb,))
+                try:
+                    try:
+                        self._pool = ProcessPoolExecutor(max_tasks_per_child=50, **kwargs)  # 3.11+
+                    except TypeError:
+                        self._pool = ProcessPoolExecutor(**kwargs)
+                except (OSError, NotImplementedError):
+                    self.enabled = False  # 프로세스 생성 불가 환경 → 인라인 처리
+            return self._pool
+
+    def _reset(self, pool: ProcessPoolExecutor):
+        """멈춘 작업이 있는 풀을 버리고 워커를 강제 종료 (다음 요청에서 새 풀 생성)"""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        procs = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for p in procs:
+            try:
+                p.kill()
+            except Exception:
+                pass
+
+    def _wait(self, fut, timeout: float):
+        """
+        시간 제한은 워커가 실행 시작부터 직접 적용(SIGALRM). 여기서는 큐 대기 시간을 빼고
+        작업이 워커 쪽으로 넘어간 뒤부터만 재는 안전장치 — 호출 큐에 미리 올라가 앞 작업을
+        기다리는 1건분과 유예 시간을 더해 둔다.
+        """
+        while not fut.running() and not fut.done():
+            futures_wait([fut], timeout=0.2)
+        return fut.result(timeout=timeout * 2 + self.HARD_GRACE_SEC)
+
+    def _run(self, fn, inline, content, args: tuple, timeout: Optional[float]):
+        if _size_of(content) < self.min_bytes:
+            return inline(*args)
+        timeout = float(timeout or self.timeout_sec)
+        path = None
+        try:
+            job_args = args
+            if hasattr(content, "read"):
+                # 디스크 파일은 경로만 넘겨 워커가 직접 열게 함 (부모에서 bytes로 읽거나 다시 복사하지 않음).
+                # 이미 메모리에 있는 작은 스풀(BytesIO)은 그 버퍼를 그대로 넘김
+                src = _file_path(content)
+                if src is None and isinstance(content, io.BytesIO):
+                    job_args = (args[0], content.getvalue()) + args[2:]
+                else:
+                    if src is None:
+                        src = path = _spool_to_path(content)
+                    job_args = (args[0], src) + args[2:]
+            for attempt in range(2):
+                pool = self._get_pool()
+                if pool is None:
+                    break
+                try:
+                    fut = pool.submit(fn, *job_args, timeout_sec=timeout)
+                except RuntimeError:  # 다른 스레드가 방금 풀을 교체함
+                    continue
+                try:
+                    return self._wait(fut, timeout)
+                except (FutureTimeout, TimeoutError):
+                    if fut.done():
+                        raise  # 워커가 스스로 시간 초과를 알림 → 풀과 다른 작업은 그대로
+                    # 워커 타이머로도 못 멈춘 경우(C 확장 내부 등)에만 풀 교체
+                    self._reset(pool)
+                    raise TimeoutError(f"추출 시간 초과({timeout:.0f}s): {args[0]}")
+                except BrokenProcessPool:
+                    # 다른 작업의 타임아웃/크래시로 풀이 깨진 경우 새 풀에서 1회 재시도
+                    self._reset(pool)
+                    if attempt:
+                        raise
+            return inline(*args)
+        finally:
+            if path:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def extract(self, filename: str, content: bytes, timeout: Optional[float] = None,
+                max_chars: Optional[int] = None) -> str:
+        """extract_text_naive와 같은 결과. 시간 초과면 TimeoutError"""
+        return self._run(worker_extract, extract_text_naive, content, (filename, content, max_chars), timeout)
+
+    def sections(self, filename: str, content: bytes, timeout: Optional[float] = None) -> List[str]:
+        """extract_sections_naive와 같은 결과 (청크 분할 입력용 섹션 목록)"""
+        return self._run(worker_sections, extract_sections_naive, content, (filename, content), timeout)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_POOL: Optional[ExtractionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_extract_pool() -> Optional[ExtractionPool]:
+    """EXTRACT_POOL_ENABLED가 false면 None"""
+    global _POOL
+    if str(CONFIG.get("EXTRACT_POOL_ENABLED", "true")).lower() in ("0", "false", "no"):
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ExtractionPool()
+        return _POOL
+
+
+def extract_text_pooled(filename: str, content: bytes, max_chars: Optional[int] = None) -> str:
+    """프로세스 풀에서 로컬 추출 (풀 비활성화 시 현재 스레드에서)"""
+    pool = get_extract_pool()
+    if pool is None:
+        return extract_text_naive(filename, content, max_chars)
+    return pool.extract(filename, content, max_chars=max_chars)
+
+
+def extract_sections_pooled(filename: str, content: bytes) -> List[str]:
+    """프로세스 풀에서 섹션 단위 추출 (풀 비활성화 시 현재 스레드에서)"""
+    pool = get_extract_pool()
+    if pool is None:
+        return extract_sections_naive(filename, content)
+    return pool.sections(filename, content)
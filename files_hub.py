@@ -3,18 +3,32 @@ import math
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
 
 from config import CONFIG
 from utils import safe_text, safe_excerpt
-from storage_blob import list_blobs_detailed, download_blob
-from graph import list_onedrive_root, list_onedrive_children, download_onedrive_file
-from docintel import extract_text_naive, extract_text_docintel
+from storage_blob import iter_blobs, list_blobs_page, download_blob, open_blob_stream
+from graph import (
+    list_onedrive_root, list_onedrive_children, download_onedrive_file,
+    onedrive_delta, save_onedrive_delta_link
+)
+from docintel import extract_text_docintel
+from docintel_jobs import get_docintel_jobs
+from extract_pool import extract_text_pooled, extract_sections_pooled
 from storage_logs import log_activity
-from search import ensure_search_ready, make_safe_key, upsert_documents_with_embeddings
-from pii import scan_pii
+from search import (
+    ensure_search_ready, make_safe_key, upsert_embedded_documents, upsert_documents_with_embeddings,
+    embed_documents, delete_documents, get_indexed_last_modified
+)
+from index_pipeline import run_index_pipeline
+from index_manifest import IndexManifest, original_id_of, signature
+from index_jobs import get_index_jobs, JobContext
+from embed_cache import get_embedding_cache
+from doc_cache import get_doc_cache, doc_cache_key
+from pii import scan_pii_batch
 from purview import apply_label_stub
 from owners_registry import set_owner, get_owner
+from merge_rag import BASE_TEXT_MAX_CHARS
 
 # ----------------------------
 # 내부 유틸
@@ -25,14 +39,17 @@ def go(page_name: str):
     st.session_state.pop("_nav_to", None)
     st.rerun()
 
+DOC_EXTS = (".pdf", ".txt", ".md", ".docx", ".pptx", ".xlsx")
+
 def _is_doc(name: str) -> bool:
     name = (name or "").lower()
-    return name.endswith((".pdf", ".txt", ".md", ".docx", ".pptx", ".xlsx"))
+    return name.endswith(DOC_EXTS)
 
-def _extract_text(name: str, content: bytes, use_docintel: bool) -> str:
+def _extract_text(name: str, content: bytes, use_docintel: bool, max_chars: int = None) -> str:
+    """max_chars: 미리보기처럼 앞부분만 필요할 때 로컬 추출을 그만큼에서 중단 (DocIntel은 전체)"""
     if use_docintel:
         return extract_text_docintel(content, mime_type="application/octet-stream")
-    return extract_text_naive(name, content)
+    return extract_text_pooled(name, content, max_chars=max_chars)
 
 def _paginate(items: List[Dict], page: int, page_size: int) -> Tuple[List[Dict], int]:
     total = len(items)
@@ -51,104 +68,348 @@ def _search_id_of_row(r: Dict) -> str:
 # ----------------------------
 # 데이터 소스별 목록 수집 (캐시)
 # ----------------------------
+def _as_blob_row(r: Dict) -> Dict:
+    r["source"] = "blob"
+    r["id"] = r["name"]        # 원본ID = 파일 경로/이름
+    r["is_folder"] = False
+    return r
+
 @st.cache_data(ttl=60)
-def _fetch_blob_listing(prefix: str = "") -> List[Dict]:
-    rows = list_blobs_detailed(prefix=prefix)
-    for r in rows:
-        r["source"] = "blob"
-        r["id"] = r["name"]        # 원본ID = 파일 경로/이름
-        r["is_folder"] = False
-    return rows
+def _fetch_blob_page(prefix: str, token: Optional[str], page_size: int,
+                     docs_only: bool) -> Tuple[List[Dict], List[str], Optional[str]]:
+    """현재 폴더(prefix)의 한 페이지만 조회 → (행, 하위 폴더, 다음 페이지 토큰)"""
+    rows, folders, next_token = list_blobs_page(
+        prefix=prefix, continuation_token=token, page_size=page_size,
+        extensions=DOC_EXTS if docs_only else None,
+    )
+    return [_as_blob_row(r) for r in rows], folders, next_token
+
+def _iter_blob_metas(prefix: str = "", docs_only: bool = False) -> Iterable[Dict]:
+    """prefix 이하 전체를 페이지 단위로 지연 조회 (일괄 인덱싱용)"""
+    for r in iter_blobs(prefix or None, extensions=DOC_EXTS if docs_only else None):
+        yield _as_blob_row(r)
+
+def _onedrive_row(it: Dict) -> Dict:
+    return {
+        "id": it.get("id"),     # 원본ID = drive item id
+        "name": it.get("name"),
+        "size": it.get("size"),
+        "content_type": "folder" if "folder" in it else it.get("file", {}).get("mimeType"),
+        "last_modified": it.get("lastModifiedDateTime"),
+        "etag": it.get("eTag"),
+        "ctag": it.get("cTag"),
+        "parent_id": (it.get("parentReference") or {}).get("id"),
+        "source": "onedrive",
+        "is_folder": "folder" in it
+    }
 
 @st.cache_data(ttl=60)
 def _fetch_onedrive_listing(folder_id: str = None) -> List[Dict]:
     items = list_onedrive_children(folder_id) if folder_id else list_onedrive_root()
-    rows = []
-    for it in items:
-        rows.append({
-            "id": it.get("id"),     # 원본ID = drive item id
-            "name": it.get("name"),
-            "size": it.get("size"),
-            "content_type": "folder" if "folder" in it else it.get("file", {}).get("mimeType"),
-            "last_modified": it.get("lastModifiedDateTime"),
-            "source": "onedrive",
-            "is_folder": "folder" in it
-        })
-    return rows
+    return [_onedrive_row(it) for it in items]
 
 # ----------------------------
 # 일괄 인덱싱/업서트
 # ----------------------------
-def _bulk_index(docs_meta: List[Dict], source: str, use_docintel: bool, batch: int = 10):
-    ok_cnt, fail_cnt = 0, 0
-    payload_batch = []
-    for meta in docs_meta:
-        # 폴더는 건너뜀
-        if meta.get("is_folder"):
-            continue
-
-        try:
-            if source == "blob":
-                data = download_blob(meta["name"])
-                name = meta["name"]; original_id = meta["name"]
-                path = meta["name"]
-            else:
-                data = download_onedrive_file(meta["id"])
-                name = meta["name"]; original_id = meta["id"]
-                path = meta["id"]   # OneDrive는 id를 path 대용으로 보존
-
-            text = _extract_text(name, data, use_docintel=use_docintel)
-
-            payload_batch.append({
-                # id는 원본ID를 집어넣고, upsert_documents 내부에서 안전키로 변환됨
-                "id": original_id,
-                "originalId": original_id,
-                "name": name,
-                "source": source,
-                "path": path,
-                "content": text,
-                "lastModified": meta.get("last_modified") or datetime.utcnow().isoformat(),
-                "views": 0,
-            })
-
-            if len(payload_batch) >= batch:
-                pii = scan_pii(text)
-                if pii and sum(len(v) for v in pii.values()) > 0:
-                    # 임시: PII 발견 시 Confidential 라벨 스텁
-                    try:
-                        apply_label_stub(original_id, "Confidential")
-                    except Exception:
-                        pass
-                upsert_documents_with_embeddings(payload_batch)
-                ok_cnt += len(payload_batch)
-                payload_batch.clear()
-        except Exception as e:
-            fail_cnt += 1
-            log_activity(
-                st.session_state.get("graph_user_mail","default"),
-                "Index",
-                "ERROR",
-                f"bulk index fail: {meta.get('name')} · {e}"
-            )
-
-    if payload_batch:
-        pii = scan_pii(text)
-        if pii and sum(len(v) for v in pii.values()) > 0:
+def _index_settings() -> Dict:
+    """일괄 인덱싱 단계별 동시성/배치 설정 (CONFIG로 조정)"""
+    return {
+        "batch_size": int(CONFIG.get("INDEX_BATCH_SIZE", 10)),
+        "fetch_workers": int(CONFIG.get("INDEX_FETCH_WORKERS", 4)),
+        "embed_workers": int(CONFIG.get("INDEX_EMBED_WORKERS", 2)),
+        "upsert_workers": int(CONFIG.get("INDEX_UPSERT_WORKERS", 2)),
+        "queue_size": int(CONFIG.get("INDEX_QUEUE_SIZE", 32)),
+    }
+
+def _graph_token_from_session() -> Optional[str]:
+    tok = st.session_state.get("graph_access_token")
+    if isinstance(tok, dict):
+        tok = tok.get("access_token")
+    return tok
+
+def _bulk_index(docs_meta: Iterable[Dict], source: str, use_docintel: bool, batch: int = None,
+                incremental: bool = False, present: List[Dict] = None, scope_prefix: str = None,
+                scope_parent: str = None, deleted_ids: List[str] = None, user_id: str = None, graph_token: str = None,
+                checkpoint: JobContext = None):
+    """
+    다운로드/추출 → 배치 임베딩 → 업서트를 단계별 스레드로 병렬 처리.
+    docs_meta는 지연 iterator여도 됨 (비증분 모드는 목록을 다 받기 전에 처리 시작).
+    incremental=True면 매니페스트(없으면 인덱스 lastModified)와 비교해 신규/변경분만 처리하고,
+    원본에서 사라진 문서(present 기준, scope_prefix 이하)는 인덱스에서 삭제.
+    OneDrive 폴더 목록은 직계 자식뿐이라 scope_parent(목록을 받은 폴더 id)의 자식만 삭제 판정하고,
+    scope_parent를 모르면 삭제는 delta 동기화에 맡긴다.
+    deleted_ids가 주어지면(OneDrive delta) present 비교 대신 그 목록을 삭제.
+    백그라운드 작업에서 부를 때는 세션에 접근할 수 없으므로 user_id/graph_token을 직접 넘기고,
+    checkpoint가 있으면 이미 끝난 원본ID는 건너뛰고 문서별 결과를 기록.
+    반환: (ok_cnt, fail_cnt, stats)  · stats는 단계별 처리량 + skipped/deleted
+    """
+    if user_id is None:
+        user_id = st.session_state.get("graph_user_mail","default")
+    if graph_token is None and source == "onedrive" and checkpoint is None:
+        graph_token = _graph_token_from_session()
+    settings = _index_settings()
+    if batch:
+        settings["batch_size"] = batch
+    if use_docintel:
+        # OCR 대기는 공용 폴러가 맡고 fetch 스레드는 Future만 기다리므로 더 많이 동시에 제출
+        settings["fetch_workers"] = max(settings["fetch_workers"], int(CONFIG.get("INDEX_DOCINTEL_FETCH_WORKERS", 16)))
+
+    manifest = IndexManifest()
+    skipped, deleted = 0, 0
+    if incremental:
+        indexed_lm = None
+        if not manifest.has_source(source):
+            # 매니페스트가 없는 첫 증분 실행: 인덱스의 lastModified로 대체 비교
+            try:
+                indexed_lm = get_indexed_last_modified(source)
+            except Exception:
+                indexed_lm = None
+        docs_meta = list(docs_meta)
+        docs_meta, unchanged, gone = manifest.plan(source, docs_meta, present or docs_meta, indexed_lm,
+                                                   scope_prefix=scope_prefix, scope_parent=scope_parent)
+        if deleted_ids is not None:
+            gone = list(deleted_ids)
+        elif source == "onedrive" and scope_parent is None:
+            gone = []
+        skipped = len(unchanged)
+        # 기존 인덱스 기준으로 동일했던 항목도 매니페스트에 기록해 다음 실행부터 바로 비교
+        for m in unchanged:
+            manifest.mark_indexed(source, original_id_of(m, source), signature(m), m.get("parent_id"))
+        if gone:
+            try:
+                delete_documents(gone)
+                manifest.forget(source, gone)
+                deleted = len(gone)
+            except Exception as e:
+                log_activity(user_id, "Index", "ERROR", f"incremental delete fail: {len(gone)}건 · {e}")
+    if checkpoint is not None:
+        docs_meta = checkpoint.pending(docs_meta, lambda m: original_id_of(m, source))
+    sigs: Dict[str, Dict] = {}   # 목록이 지연 조회라 로드 시점에 채움
+    parents: Dict[str, str] = {}
+
+    def _load(meta: Dict) -> Dict:
+        if source == "blob":
+            name = meta["name"]; original_id = meta["name"]
+            path = meta["name"]
+        else:
+            name = meta["name"]; original_id = meta["id"]
+            path = meta["id"]   # OneDrive는 id를 path 대용으로 보존
+        sigs[original_id] = signature(meta)
+        if meta.get("parent_id"):
+            parents[original_id] = meta["parent_id"]
+
+        sections, breaks = None, None
+        if use_docintel:
+            data = download_blob(name) if source == "blob" else download_onedrive_file(meta["id"], token=graph_token)
+            text = get_docintel_jobs().submit(data, "application/octet-stream").result()
+        elif source == "blob":
+            # Blob은 병렬 범위 다운로드 → 스풀 파일 → 추출기로 바로 (bytes 통째 복사 없음)
+            with open_blob_stream(name) as f:
+                sections = extract_sections_pooled(name, f)
+        else:
+            data = download_onedrive_file(meta["id"], token=graph_token)
+            sections = extract_sections_pooled(name, data)
+        if sections is not None:
+            # 본문은 이전처럼 빈 줄로 연결하고, 페이지/슬라이드/시트 행 묶음 경계는 오프셋으로만 남겨
+            # 청크 분할이 그 경계에서 나누도록 (섹션 목록 자체는 싣지 않음 → 본문 사본을 두 벌 들고 가지 않음)
+            text = "\n\n".join(sections)
+            breaks, pos = [], 0
+            for sec in sections[:-1]:
+                pos += len(sec) + 2
+                breaks.append(pos)
+        return {
+            # id는 원본ID를 집어넣고, upsert_documents 내부에서 안전키로 변환됨
+            "id": original_id,
+            "originalId": original_id,
+            "name": name,
+            "source": source,
+            "path": path,
+            "content": text,
+            "lastModified": meta.get("last_modified") or datetime.utcnow().isoformat(),
+            "views": 0,
+            "sectionBreaks": breaks,   # 인덱스 스키마에 없는 필드라 업서트 시 제외됨
+        }
+
+    def _on_batch_done(docs: List[Dict]):
+        for d in docs:
+            manifest.mark_indexed(source, d["originalId"], sigs.get(d["originalId"], {}), parents.get(d["originalId"]))
+        if checkpoint is not None:
+            checkpoint.ok([d["originalId"] for d in docs])
+            manifest.save()   # 중간에 끊겨도 증분 비교 기준이 남도록
+        # 배치의 모든 문서를 스캔 (패턴 통합 정규식 1회 통과)
+        flagged, truncated = [], []
+        for oid, res in scan_pii_batch(docs).items():
+            if res["truncated"]:
+                truncated.append(oid)   # 문서당 시간 예산 초과 → 앞부분만 스캔됨
+            if not res["counts"]:
+                continue
             # 임시: PII 발견 시 Confidential 라벨 스텁
             try:
-                apply_label_stub(original_id, "Confidential")
+                apply_label_stub(oid, "Confidential")
             except Exception:
                 pass
-        upsert_documents_with_embeddings(payload_batch)
-        ok_cnt += len(payload_batch)
+            flagged.append(f"{oid}({sum(res['counts'].values())})")
+        if flagged:
+            log_activity(user_id, "PII", "INFO", f"pii found in {len(flagged)}/{len(docs)} docs: {', '.join(flagged[:20])}")
+        if truncated:
+            log_activity(user_id, "PII", "WARN", f"pii scan truncated (time budget): {', '.join(truncated[:20])}")
+
+    def _on_error(meta: Dict, e: Exception):
+        log_activity(user_id, "Index", "ERROR", f"bulk index fail: {meta.get('name')} · {e}")
+        if checkpoint is not None:
+            checkpoint.fail(original_id_of(meta, source), str(e))
+
+    def _on_batch_error(docs: List[Dict], e: Exception):
+        # 임베딩/업서트 배치 실패 → 배치의 문서마다 실패로 기록 (재개 시 다시 처리, 진행률 합계도 맞음)
+        log_activity(user_id, "Index", "ERROR",
+                     f"bulk index batch fail: {len(docs)} docs ({', '.join(d['name'] for d in docs[:5])}) · {e}")
+        if checkpoint is not None:
+            for d in docs:
+                checkpoint.fail(d["originalId"], str(e))
+
+    stats = run_index_pipeline(
+        docs_meta,
+        load_fn=_load,
+        embed_fn=embed_documents,
+        upsert_fn=upsert_embedded_documents,
+        on_error=_on_error,
+        on_batch_done=_on_batch_done,
+        on_batch_error=_on_batch_error,
+        **settings,
+    )
+    manifest.save()
+    ok_cnt, fail_cnt = stats["ok"], stats["fail"]
+    stats["skipped"], stats["deleted"] = skipped, deleted
 
+    rates = ", ".join(f"{s['stage']}={s['items_per_sec']}/s" for s in stats["stages"])
     log_activity(
-        st.session_state.get("graph_user_mail","default"),
+        user_id,
         "Index",
         "INFO",
-        f"bulk index done: ok={ok_cnt}, fail={fail_cnt}"
+        f"bulk index done: ok={ok_cnt}, fail={fail_cnt}, skipped={skipped}, deleted={deleted}, "
+        f"elapsed={stats['elapsed_sec']}s ({rates})"
     )
-    return ok_cnt, fail_cnt
+    return ok_cnt, fail_cnt, stats
+
+def _sync_onedrive_delta(ctx: JobContext) -> Dict:
+    """
+    (작업 스레드) /drive/root/delta로 지난 동기화 이후 바뀐 파일만 인덱싱하고 삭제된 항목은 인덱스에서 제거.
+    처리에 실패한 문서가 있거나 중지되면 deltaLink를 저장하지 않아 다음 실행에서 다시 받음
+    (이미 처리된 항목은 매니페스트 비교/체크포인트로 건너뜀).
+    """
+    p = ctx.params
+    token = ctx.secrets.get("graph_token")
+    if not token:
+        raise RuntimeError("Graph access token이 없습니다. 로그인 후 재개하세요.")
+    delta = onedrive_delta(p["user_id"], token=token)
+    metas = [_onedrive_row(it) for it in delta["items"] if "folder" not in it]
+    if p["docs_only"]:
+        metas = [m for m in metas if _is_doc(m.get("name",""))]
+    ok, fail, stats = _bulk_index(metas, source="onedrive", use_docintel=p["use_docintel"],
+                                  incremental=True, present=metas, deleted_ids=delta["deleted"],
+                                  user_id=p["user_id"], graph_token=token, checkpoint=ctx)
+    if fail == 0 and not ctx.cancelled.is_set() and delta["delta_link"]:
+        save_onedrive_delta_link(p["user_id"], delta["delta_link"])
+    stats["full"] = delta["full"]
+    return stats
+
+# ----------------------------
+# 백그라운드 일괄 인덱싱 작업 (체크포인트 · 재개)
+# ----------------------------
+def _run_index_job(ctx: JobContext) -> Dict:
+    """작업 스레드 본체: 저장된 파라미터로 목록을 다시 만들고 체크포인트 이후만 인덱싱"""
+    p = ctx.params
+    if p.get("mode") == "delta":
+        return _sync_onedrive_delta(ctx)
+    source = p["source"]
+    token = ctx.secrets.get("graph_token")
+    present, scope_prefix, scope_parent = None, None, None
+    if source == "blob":
+        prefix = p.get("prefix") or ""
+        scope_prefix = prefix or None
+        if p["incremental"]:
+            present = list(_iter_blob_metas(prefix))
+            metas = [r for r in present if not p["docs_only"] or _is_doc(r["name"])]
+        else:
+            metas = _iter_blob_metas(prefix, docs_only=p["docs_only"])
+    else:
+        if not token:
+            raise RuntimeError("Graph access token이 없습니다. 로그인 후 재개하세요.")
+        folder_id = p.get("folder_id")
+        items = list_onedrive_children(folder_id, token=token) if folder_id else list_onedrive_root(token=token)
+        present = [_onedrive_row(it) for it in items]
+        # 루트 목록은 folder_id가 없으므로 자식들의 parentReference로 루트 id를 얻음
+        scope_parent = folder_id or next((r["parent_id"] for r in present if r.get("parent_id")), None)
+        metas = [r for r in present if not r["is_folder"] and (not p["docs_only"] or _is_doc(r["name"]))]
+    _, _, stats = _bulk_index(metas, source=source, use_docintel=p["use_docintel"],
+                              incremental=p["incremental"], present=present, scope_prefix=scope_prefix,
+                              scope_parent=scope_parent, user_id=p["user_id"], graph_token=token, checkpoint=ctx)
+    return stats
+
+_JOB_STATUS = {"queued": "대기", "running": "진행 중", "done": "완료", "failed": "실패",
+               "interrupted": "중단됨", "cancelled": "중지됨"}
+
+def _index_jobs_panel():
+    """최근 작업 진행률 (진행 중이면 fragment가 주기적으로 다시 그림)"""
+    jobs = get_index_jobs()
+    user_id = st.session_state.get("graph_user_mail","default")
+    recent = jobs.recent(user_id, limit=5)
+    if not recent:
+        return
+    any_alive = False
+    st.markdown("**일괄 인덱싱 작업**")
+    for j in recent:
+        p = j["params"]
+        any_alive = any_alive or j["alive"]
+        where = f"/{p.get('prefix') or ''}" if j["source"] == "blob" else (
+            "OneDrive 변경분(delta)" if p.get("mode") == "delta" else "OneDrive")
+        label = (f"{_JOB_STATUS.get(j['status'], j['status'])} · {where} · 성공 {j['ok']} · 실패 {j['fail']}"
+                 f" · 목록 {j['listed']}건")
+        if j["alive"] and j["listed"]:
+            st.progress(min(1.0, (j["ok"] + j["fail"]) / j["listed"]), text=label)
+        else:
+            st.caption(label)
+        if j["error"]:
+            st.caption(f"⚠️ {j['error']}")
+        if j["status"] == "done" and j["stats"]:
+            stats = j["stats"]
+            rates = ", ".join(f"{s['stage']}={s['items_per_sec']}/s" for s in stats.get("stages", []))
+            st.caption(f"변경없음 {stats.get('skipped', 0)} · 삭제 {stats.get('deleted', 0)} · "
+                       f"{stats.get('elapsed_sec')}초 ({rates})"
+                       + (" · 최초 전체 동기화" if stats.get("full") else ""))
+            if p.get("mode") == "delta" and j["fail"]:
+                st.caption("실패 항목이 있어 동기화 시점을 저장하지 않았습니다. 다시 실행하면 이어서 처리합니다.")
+        cols = st.columns([1, 1, 4])
+        if j["alive"]:
+            if cols[0].button("⏹ 중지", key=f"_job_stop_{j['job_id']}"):
+                jobs.cancel(j["job_id"])
+        elif j["status"] != "done":
+            if cols[0].button("▶️ 재개", key=f"_job_resume_{j['job_id']}"):
+                try:
+                    jobs.resume(j["job_id"], _run_index_job, secrets={"graph_token": _graph_token_from_session()})
+                except RuntimeError as e:
+                    st.warning(str(e))
+                else:
+                    st.rerun()
+        if j["fail"]:
+            with cols[1].popover("실패 목록"):
+                for f in jobs.store.failures(j["job_id"], limit=20):
+                    st.caption(f"{f['original_id']} · {f['error']}")
+    if any_alive:
+        st.session_state["_index_jobs_polling"] = True
+        cache = get_embedding_cache()
+        if cache is not None:
+            cs = cache.stats()
+            st.caption(f"임베딩 캐시 · hit {cs['hits']} · miss {cs['misses']} · 적중률 {cs['hit_rate']:.0%} · 저장 {cs['entries']}건")
+    elif st.session_state.pop("_index_jobs_polling", False):
+        st.rerun()   # 방금 끝났으면 전체 화면 갱신 (폴링 중단)
+
+def _render_index_jobs():
+    alive = any(j["alive"] for j in get_index_jobs().recent(st.session_state.get("graph_user_mail","default"), limit=5))
+    if alive:
+        st.fragment(run_every=float(CONFIG.get("INDEX_JOB_POLL_SEC", 2)))(_index_jobs_panel)()
+    else:
+        _index_jobs_panel()
 
 # ----------------------------
 # 행 내 액션 메뉴(햄버거) 처리
@@ -161,10 +422,34 @@ def _row_actions(row: Dict, use_docintel: bool, page_tag: str):
     source = row.get("source")
     rid = row.get("id")  # 원본ID
 
-    def _download_and_extract():
-        data = download_blob(name) if source == "blob" else download_onedrive_file(rid)
+    def _download_and_extract(max_chars: int = None):
+        # 원본 버전(cTag/ETag/lastModified)이 같으면 재다운로드·재추출 없이 캐시 사용
+        cache = get_doc_cache()
+        version = row.get("ctag") or row.get("etag") or row.get("last_modified")
+        if cache is None or not version:
+            if source == "blob" and not use_docintel:
+                # 원본 캐시가 없으면 bytes로 모을 이유가 없음 → 스풀 스트림을 추출기로 바로
+                with open_blob_stream(name) as f:
+                    return _extract_text(name, f, use_docintel=False, max_chars=max_chars)
+            data = download_blob(name) if source == "blob" else download_onedrive_file(rid)
+            return _extract_text(name, data, use_docintel=use_docintel, max_chars=max_chars)
+
+        mode = "docintel" if use_docintel else "naive"
+        raw_key = doc_cache_key("raw", source, rid, version)
+        text_key = doc_cache_key("text", source, rid, version, mode)
+        text = cache.get_text(text_key)
+        if text is not None:
+            return text   # 텍스트 적중이면 원본 bytes는 읽지 않음 (메모리 LRU/통계 오염 방지)
+        data = cache.get(raw_key)
+        if data is None:
+            data = download_blob(name) if source == "blob" else download_onedrive_file(rid)
+            cache.put(raw_key, data)
+        if max_chars and not use_docintel:
+            # 부분 추출본은 전체 텍스트 캐시에 넣지 않음
+            return _extract_text(name, data, use_docintel=False, max_chars=max_chars)
         text = _extract_text(name, data, use_docintel=use_docintel)
-        return data, text
+        cache.put_text(text_key, text)
+        return text
 
     # ID 가시화 (디버깅/확인용)
     original_id = _raw_id_of_row(row)
@@ -187,7 +472,7 @@ def _row_actions(row: Dict, use_docintel: bool, page_tag: str):
     # 미리보기
     if st.button("👁 미리보기", key=f"pv_{page_tag}_{index_id}"):
         try:
-            _, text = _download_and_extract()
+            text = _download_and_extract(max_chars=1000)
             st.code(safe_excerpt(text, 1000))
             log_activity(st.session_state.get("graph_user_mail","default"), "FilesHub", "INFO", f"preview: {name}")
         except Exception as e:
@@ -196,7 +481,7 @@ def _row_actions(row: Dict, use_docintel: bool, page_tag: str):
     # 문서 감사
     if st.button("🧾 문서 감사로 이동", key=f"audit_{page_tag}_{index_id}"):
         try:
-            _, text = _download_and_extract()
+            text = _download_and_extract()
             st.session_state["current_doc"] = {"name": name, "id": rid, "text": text}
             log_activity(st.session_state.get("graph_user_mail","default"), "FilesHub", "INFO", f"to Audit: {name}")
             go("🧾 문서 감사")   # ← 여기!
@@ -206,7 +491,8 @@ def _row_actions(row: Dict, use_docintel: bool, page_tag: str):
     # 유사 검색/병합
     if st.button("🗂 유사 검색/병합 가이드", key=f"cur_{page_tag}_{index_id}"):
         try:
-            _, text = _download_and_extract()
+            # 질의·비교·병합 프롬프트 모두 앞부분만 쓰므로 그 분량에서 추출 중단
+            text = _download_and_extract(max_chars=BASE_TEXT_MAX_CHARS)
             st.session_state["current_doc"] = {"name": name, "id": rid, "text": text}
             log_activity(st.session_state.get("graph_user_mail","default"), "FilesHub", "INFO", f"to Curation: {name}")
             go("🗂️ 유사 검색 / 병합 가이드")  # ← 여기!
@@ -216,7 +502,7 @@ def _row_actions(row: Dict, use_docintel: bool, page_tag: str):
     # 업서트
     if st.button("⬆ 인덱스 업서트", key=f"up_{page_tag}_{index_id}"):
         try:
-            _, text = _download_and_extract()
+            text = _download_and_extract()
             payload = [{
                 "id": original_id,            # 원본ID → upsert 내에서 안전키로 변환
                 "originalId": original_id,
@@ -234,6 +520,25 @@ def _row_actions(row: Dict, use_docintel: bool, page_tag: str):
             st.error(f"업서트 실패: {e}")
             log_activity(st.session_state.get("graph_user_mail","default"), "Search", "ERROR", f"upsert fail: {name} · {e}")
 
+def _page_controls(source: str, page: int, page_total: int, next_token: Optional[str], rows: List[Dict]):
+    """이전/다음 페이지 버튼 (Blob은 연속 토큰 기준, OneDrive는 화면 분할 기준)"""
+    pc1, pc2, pc3 = st.columns([1,2,1])
+    with pc1:
+        if st.button("◀️ 이전"):
+            if page > 1:
+                st.session_state["_files_page"] = page - 1
+                st.rerun()
+    with pc2:
+        if source == "blob":
+            st.caption(f"페이지 {page}{' · 다음 페이지 있음' if next_token else ''} · 이 페이지 {len(rows)}건")
+        else:
+            st.caption(f"페이지 {page} / {page_total} · 총 {len(rows)}건")
+    with pc3:
+        if st.button("다음 ▶️"):
+            if page < page_total:
+                st.session_state["_files_page"] = page + 1
+                st.rerun()
+
 # ----------------------------
 # 메인 렌더
 # ----------------------------
@@ -258,38 +563,100 @@ def render_files_hub():
     #     q_low = q.lower()
     #     rows = [r for r in rows if q_low in (r.get("name","").lower())]
 
-    # 2) 목록 자동 로딩
-    with st.spinner("파일 목록 불러오는 중…"):
-        if source == "blob":
-            rows = _fetch_blob_listing()
-        else:
+    # 2) 목록 로딩
+    #    Blob: 현재 폴더의 현재 페이지만 조회 (연속 토큰은 세션에 보관)
+    #    OneDrive: 현재 폴더 목록을 받아 화면에서 페이지 분할
+    docs_only = st.checkbox("문서 확장자만 보기 (.pdf/.txt/.md/.docx/.pptx/.xlsx)", value=True)
+    page_size = st.selectbox("페이지 크기", [10, 20, 50, 100], index=1)
+
+    folders: List[str] = []
+    next_token = None
+    blob_prefix = ""
+    if source == "blob":
+        blob_prefix = st.session_state.get("_blob_prefix", "")
+        list_key = (blob_prefix, page_size, docs_only)
+        if st.session_state.get("_blob_list_key") != list_key:
+            # 폴더/페이지 크기/필터가 바뀌면 토큰 목록을 처음부터 다시
+            st.session_state["_blob_list_key"] = list_key
+            st.session_state["_blob_tokens"] = [None]   # tokens[i] = (i+1)페이지 시작 토큰
+            st.session_state["_files_page"] = 1
+        tokens = st.session_state["_blob_tokens"]
+        page = max(1, min(st.session_state.get("_files_page", 1), len(tokens)))
+        with st.spinner("파일 목록 불러오는 중…"):
+            rows, folders, next_token = _fetch_blob_page(blob_prefix, tokens[page - 1], page_size, docs_only)
+        if next_token and len(tokens) == page:
+            tokens.append(next_token)
+
+        # 폴더 이동
+        nav1, nav2 = st.columns([4, 1])
+        with nav1:
+            st.caption(f"📂 /{blob_prefix}")
+        with nav2:
+            if blob_prefix and st.button("⬆️ 상위 폴더"):
+                parent = blob_prefix.rstrip("/").rpartition("/")[0]
+                st.session_state["_blob_prefix"] = f"{parent}/" if parent else ""
+                st.rerun()
+        if folders:
+            fcols = st.columns(min(4, len(folders)))
+            for i, f in enumerate(folders):
+                label = f[len(blob_prefix):].rstrip("/") or f
+                if fcols[i % len(fcols)].button(f"📁 {label}", key=f"_blob_folder_{f}"):
+                    st.session_state["_blob_prefix"] = f
+                    st.rerun()
+    else:
+        with st.spinner("파일 목록 불러오는 중…"):
             rows = _fetch_onedrive_listing()
+        page = st.session_state.get("_files_page", 1)
 
     # 폴더 제외(표에서 노출 막기)
     rows = [r for r in rows if not r.get("is_folder")]
 
-    # 문서형만 보기
-    if st.checkbox("문서 확장자만 보기 (.pdf/.txt/.md/.docx/.pptx/.xlsx)", value=True):
+    # 문서형만 보기 (Blob은 조회 단계에서 이미 적용)
+    if docs_only and source != "blob":
         rows = [r for r in rows if _is_doc(r.get("name",""))]
 
     # 3) 최초 일괄 인덱싱
     if not st.session_state.get("_indexed_once"):
-        st.info("아직 전체 파일 인덱싱을 수행하지 않았습니다. 아래 버튼으로 현재 목록(필터 결과)을 일괄 업서트할 수 있습니다.")
+        scope = f"'/{blob_prefix}' 폴더 이하 전체" if source == "blob" else "현재 목록(필터 결과)"
+        st.info(f"아직 전체 파일 인덱싱을 수행하지 않았습니다. 아래 버튼으로 {scope}를 일괄 업서트할 수 있습니다.")
     c1, c2 = st.columns([1,3])
+    with c2:
+        incremental = st.checkbox("증분 모드 (신규/변경 문서만 재인덱싱, 원본에서 삭제된 문서는 인덱스에서 제거)", value=True)
     with c1:
         if st.button("🚀 현재 목록 일괄 인덱싱/업서트"):
-            metas = rows
-            ok, fail = _bulk_index(metas, source=source, use_docintel=use_docintel)
-            st.session_state["_indexed_once"] = True
-            st.success(f"일괄 인덱싱 완료 · 성공 {ok} · 실패 {fail}")
+            # 화면 재실행/새로고침과 무관하게 백그라운드 작업으로 실행 (Blob은 현재 폴더 이하 전체)
+            params = {
+                "source": source, "use_docintel": use_docintel, "incremental": incremental,
+                "docs_only": docs_only, "prefix": blob_prefix, "folder_id": None,
+                "user_id": st.session_state.get("graph_user_mail","default"),
+            }
+            try:
+                get_index_jobs().start(params, _run_index_job, secrets={"graph_token": _graph_token_from_session()})
+                st.session_state["_indexed_once"] = True
+                st.toast("일괄 인덱싱 작업을 시작했습니다. 아래에서 진행률을 확인하세요.")
+            except RuntimeError as e:
+                st.warning(str(e))
+        if source == "onedrive" and st.button("🔄 변경분만 동기화 (delta)"):
+            # 최초 delta는 드라이브 전체를 훑으므로 일괄 인덱싱과 같은 백그라운드 작업으로
+            params = {
+                "source": "onedrive", "mode": "delta", "use_docintel": use_docintel, "incremental": True,
+                "docs_only": docs_only, "user_id": st.session_state.get("graph_user_mail","default"),
+            }
+            try:
+                get_index_jobs().start(params, _run_index_job, secrets={"graph_token": _graph_token_from_session()})
+                st.session_state["_indexed_once"] = True
+                st.toast("OneDrive 변경분 동기화 작업을 시작했습니다. 아래에서 진행률을 확인하세요.")
+            except RuntimeError as e:
+                st.warning(str(e))
 
-    # 검색/필터
-    page_size = st.selectbox("페이지 크기", [10, 20, 50, 100], index=1)
-    page = st.session_state.get("_files_page", 1)
+    _render_index_jobs()
 
     # 페이지네이션
     page_total = 1
-    if rows:
+    if source == "blob":
+        subset = rows   # 이미 한 페이지분
+        page_total = page + (1 if next_token else 0)
+    elif rows:
         if page < 1: page = 1
         subset, page_total = _paginate(rows, page, page_size)
     else:
@@ -298,6 +665,9 @@ def render_files_hub():
     # ====== 테이블(가상) 렌더: 햄버거 메뉴 포함 ======
     if not subset:
         st.warning("표시할 항목이 없습니다.")
+        # Blob 페이지는 확장자 필터/폴더 항목 때문에 비어도 다음 토큰이 있을 수 있음 → 이동 버튼은 남김
+        if page > 1 or next_token:
+            _page_controls(source, page, page_total, next_token, rows)
         return
 
     # 헤더
@@ -329,18 +699,4 @@ def render_files_hub():
                 _row_actions(r, use_docintel=use_docintel, page_tag=page_tag)
 
 
-    # 페이지 컨트롤
-    pc1, pc2, pc3 = st.columns([1,2,1])
-    with pc1:
-        if st.button("◀️ 이전"):
-            if page > 1:
-                st.session_state["_files_page"] = page - 1
-                st.rerun()
-    with pc2:
-        st.caption(f"페이지 {page} / {page_total} · 총 {len(rows)}건")
-    with pc3:
-        if st.button("다음 ▶️"):
-            if page < page_total:
-                st.session_state["_files_page"] = page + 1
-                st.rerun()
-
+    _page_controls(source, page, page_total, next_token, rows)
@@ -1,17 +1,27 @@
 # graph.py
+import json, os, threading
 import requests, streamlit as st
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlencode
+import http_client
+from config import CONFIG
+from utils import local_state_path
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
 
-def _token() -> str:
-    tok = st.session_state.get("graph_access_token")
+# 목록 응답에서 실제로 쓰는 필드만 요청 (files_hub 행 변환 + 변경 감지용)
+ITEM_SELECT = "id,name,size,file,folder,lastModifiedDateTime,eTag,cTag,parentReference"
+
+def _token(token: str = None) -> str:
+    # 작업 스레드(일괄 인덱싱 등)에서는 세션 접근이 안 되므로 호출자가 토큰을 직접 넘김
+    tok = token or st.session_state.get("graph_access_token")
     if isinstance(tok, dict):
         tok = tok.get("access_token")
     if not tok:
         raise RuntimeError("Graph access token not found. 로그인 먼저 진행하세요.")
     return tok
 
-def _headers():
-    return {"Authorization": f"Bearer {_token()}", "Accept": "application/json"}
+def _headers(token: str = None):
+    return {"Authorization": f"Bearer {_token(token)}", "Accept": "application/json"}
 
 def _raise_with_detail(r: requests.Response, context: str):
     try:
@@ -27,20 +37,103 @@ def _raise_with_detail(r: requests.Response, context: str):
         st.warning(f"[Graph {context}] {r.status_code} {r.reason}\n\n{detail}")
     r.raise_for_status()
 
-def list_onedrive_root():
-    r = requests.get(f"{GRAPH_BASE}/me/drive", headers=_headers(), timeout=30)
+def _page_size(page_size: int = None) -> int:
+    # Graph children/delta는 $top 최대 999
+    return max(1, min(int(page_size or CONFIG.get("GRAPH_PAGE_SIZE", 200)), 999))
+
+def _iter_pages(url: str, context: str, token: str = None, last: dict = None) -> Iterator[Dict]:
+    """
+    @odata.nextLink를 따라가며 value 항목을 한 건씩 반환.
+    last가 주어지면 마지막 페이지 응답(@odata.deltaLink 등)을 담아 둠.
+    """
+    while url:
+        r = http_client.get(url, headers=_headers(token), timeout=30)
+        if r.status_code >= 400: _raise_with_detail(r, context)
+        body = r.json()
+        yield from body.get("value", [])
+        url = body.get("@odata.nextLink")
+        if not url and last is not None:
+            last.update(body)
+
+def _list_url(path: str, page_size: int = None) -> str:
+    return f"{GRAPH_BASE}{path}?" + urlencode({"$top": _page_size(page_size), "$select": ITEM_SELECT})
+
+def list_onedrive_root(page_size: int = None, token: str = None):
+    r = http_client.get(f"{GRAPH_BASE}/me/drive", headers=_headers(token), timeout=30)
     if r.status_code >= 400: _raise_with_detail(r, "GET /me/drive")
-    r2 = requests.get(f"{GRAPH_BASE}/me/drive/root/children", headers=_headers(), timeout=30)
-    if r2.status_code >= 400: _raise_with_detail(r2, "GET /me/drive/root/children")
-    return r2.json().get("value", [])
+    return list(_iter_pages(_list_url("/me/drive/root/children", page_size), "GET /me/drive/root/children",
+                            token=token))
+
+def list_onedrive_children(item_id: str, page_size: int = None, token: str = None):
+    return list(_iter_pages(_list_url(f"/me/drive/items/{item_id}/children", page_size),
+                            f"GET /me/drive/items/{item_id}/children", token=token))
+
+# ----------------------------
+# delta 동기화 (/drive/root/delta)
+# ----------------------------
+_DELTA_LOCK = threading.Lock()
+
+def _delta_path() -> str:
+    return local_state_path("graph_delta.json")
+
+def _load_delta_links() -> Dict[str, str]:
+    try:
+        with open(_delta_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_onedrive_delta_link(user_key: str) -> Optional[str]:
+    with _DELTA_LOCK:
+        return _load_delta_links().get(user_key)
+
+def save_onedrive_delta_link(user_key: str, delta_link: Optional[str]):
+    """
+    다음 동기화 시작점 저장 (None이면 삭제 → 다음 실행은 전체 열거).
+    변경분 처리가 끝난 뒤에 호출해야 실패 시 같은 변경분을 다시 받을 수 있음.
+    """
+    with _DELTA_LOCK:
+        links = _load_delta_links()
+        if delta_link:
+            links[user_key] = delta_link
+        else:
+            links.pop(user_key, None)
+        path = _delta_path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(links, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+def onedrive_delta(user_key: str, token: str = None, page_size: int = None) -> Dict:
+    """
+    저장된 deltaLink 이후 바뀐 항목만 조회 (없으면 드라이브 전체 열거 = 최초 동기화).
+    반환: {"items": 변경/추가된 파일·폴더, "deleted": 삭제된 item id, "delta_link": 다음 시작점, "full": 전체 열거 여부}
+    deltaLink가 만료(410 Gone)되면 전체 열거로 다시 시작.
+    """
+    link = get_onedrive_delta_link(user_key)
+    full = not link
+    url = link or (f"{GRAPH_BASE}/me/drive/root/delta?"
+                   + urlencode({"$top": _page_size(page_size), "$select": ITEM_SELECT + ",deleted,root"}))
+    last: dict = {}
+    try:
+        values = list(_iter_pages(url, "GET /me/drive/root/delta", token=token, last=last))
+    except requests.HTTPError as e:
+        if full or getattr(e.response, "status_code", None) != 410:
+            raise
+        save_onedrive_delta_link(user_key, None)
+        return onedrive_delta(user_key, token=token, page_size=page_size)
 
-def list_onedrive_children(item_id: str):
-    r = requests.get(f"{GRAPH_BASE}/me/drive/items/{item_id}/children", headers=_headers(), timeout=30)
-    if r.status_code >= 400: _raise_with_detail(r, f"GET /me/drive/items/{item_id}/children")
-    return r.json().get("value", [])
+    # 같은 항목이 여러 페이지에 나오면 마지막 상태가 유효
+    latest: Dict[str, Dict] = {}
+    for it in values:
+        if it.get("id"):
+            latest[it["id"]] = it
+    items = [it for it in latest.values() if "deleted" not in it and "root" not in it]
+    deleted = [i for i, it in latest.items() if "deleted" in it]
+    return {"items": items, "deleted": deleted, "delta_link": last.get("@odata.deltaLink"), "full": full}
 
-def download_onedrive_file(item_id: str) -> bytes:
-    r = requests.get(f"{GRAPH_BASE}/me/drive/items/{item_id}/content", headers=_headers(), timeout=60)
+def download_onedrive_file(item_id: str, token: str = None) -> bytes:
+    r = http_client.get(f"{GRAPH_BASE}/me/drive/items/{item_id}/content", headers=_headers(token), timeout=60)
     if r.status_code >= 400: _raise_with_detail(r, f"GET /me/drive/items/{item_id}/content")
     return r.content
 
@@ -66,7 +159,7 @@ def upload_onedrive_file(path: str, data: bytes, mime: str = "text/markdown"):
     path 예: DocSpaceAI/Merged/2025-10-31-merged.md
     """
     url = f"{GRAPH_BASE}/me/drive/root:/{path}:/content"
-    r = requests.put(
+    r = http_client.put(
         url,
         headers={"Authorization": f"Bearer {_token()}", "Content-Type": mime},
         data=data,
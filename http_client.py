@@ -0,0 +1,285 @@
+# http_client.py – Azure REST 공용 HTTP 계층 (keep-alive 세션 풀 · 재시도 · Retry-After · 엔드포인트별 서킷 브레이커 · 메트릭)
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+import requests.adapters
+
+from config import CONFIG
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+THROTTLE_STATUSES = {429, 503}
+
+
+class CircuitOpenError(RuntimeError):
+    """엔드포인트 서킷이 열려 있어 요청을 보내지 않음"""
+
+
+def _cfg_int(name: str, default: int) -> int:
+    try:
+        return int(CONFIG.get(name, default))
+    except Exception:
+        return default
+
+
+def _cfg_float(name: str, default: float) -> float:
+    try:
+        return float(CONFIG.get(name, default))
+    except Exception:
+        return default
+
+
+# ─────────────────────────────────────────────────────────
+# 메트릭
+# ─────────────────────────────────────────────────────────
+_METRICS: Dict[str, Dict] = {}
+_METRICS_LOCK = threading.Lock()
+
+
+def _metric(host: str, **inc):
+    with _METRICS_LOCK:
+        m = _METRICS.setdefault(host, {
+            "requests": 0, "retries": 0, "throttled": 0, "throttled_sec": 0.0,
+            "errors": 0, "circuit_open": 0,
+        })
+        for k, v in inc.items():
+            m[k] += v
+
+
+def get_http_metrics() -> Dict[str, Dict]:
+    """호스트별 {requests, retries, throttled, throttled_sec, errors, circuit_open} 스냅샷"""
+    with _METRICS_LOCK:
+        return {h: {**m, "throttled_sec": round(m["throttled_sec"], 2)} for h, m in _METRICS.items()}
+
+
+# ─────────────────────────────────────────────────────────
+# 서킷 브레이커 (호스트 단위)
+# ─────────────────────────────────────────────────────────
+class _Breaker:
+    """
+    연속 실패(5xx/연결 오류)가 threshold에 닿으면 cooldown 동안 open.
+    cooldown이 지나면 half-open으로 1건만 통과시켜 성공 시 close.
+    429는 서버가 살아 있다는 신호라 실패로 세지 않음.
+    """
+
+    def __init__(self, threshold: int, cooldown: float, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.clock = clock
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.cooldown:
+                return False
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def abandon(self):
+        """결과 없이 끝난 요청(취소 등): 실패로 세지 않고 half-open 시험 슬롯만 반납"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def failure(self) -> bool:
+        """실패 기록. 이번 실패로 open 되었으면 True"""
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                was_closed = self.opened_at is None
+                self.opened_at = self.clock()
+                return was_closed
+            return False
+
+
+_BREAKERS: Dict[str, _Breaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def _breaker(host: str) -> _Breaker:
+    with _BREAKERS_LOCK:
+        b = _BREAKERS.get(host)
+        if b is None:
+            b = _Breaker(_cfg_int("HTTP_BREAKER_THRESHOLD", 5), _cfg_float("HTTP_BREAKER_COOLDOWN_SEC", 30.0))
+            _BREAKERS[host] = b
+        return b
+
+
+# ─────────────────────────────────────────────────────────
+# 재시도
+# ─────────────────────────────────────────────────────────
+def _retry_hint(r: requests.Response) -> Optional[float]:
+    """retry-after-ms / x-ms-retry-after-ms / Retry-After(초 또는 HTTP-date) → 초"""
+    h = r.headers
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        v = h.get(name)
+        if v:
+            try:
+                return max(0.0, float(v) / 1000.0)
+            except ValueError:
+                pass
+    v = h.get("Retry-After")
+    if v:
+        try:
+            return max(0.0, float(v))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+            except Exception:
+                pass
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    """full jitter 지수 백오프"""
+    base = _cfg_float("HTTP_BACKOFF_BASE_SEC", 0.5)
+    cap = _cfg_float("HTTP_BACKOFF_MAX_SEC", 30.0)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ─────────────────────────────────────────────────────────
+# 호스트별 keep-alive 세션 풀
+# ─────────────────────────────────────────────────────────
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def session_for(url: str) -> requests.Session:
+    """
+    scheme+host 단위로 재사용하는 requests.Session (TCP/TLS 연결 재사용).
+    풀 크기는 HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE (동시 스레드 수 이상 권장).
+    재시도는 이 모듈이 담당하므로 어댑터 재시도는 끔.
+    """
+    parts = urlsplit(url)
+    base = f"{parts.scheme}://{parts.netloc}"
+    with _SESSIONS_LOCK:
+        s = _SESSIONS.get(base)
+        if s is None:
+            s = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=_cfg_int("HTTP_POOL_CONNECTIONS", 4),
+                pool_maxsize=_cfg_int("HTTP_POOL_MAXSIZE", 32),
+                max_retries=0,
+            )
+            s.mount(f"{parts.scheme}://", adapter)
+            _SESSIONS[base] = s
+        return s
+
+
+def close_sessions():
+    with _SESSIONS_LOCK:
+        for s in _SESSIONS.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        _SESSIONS.clear()
+
+
+def _send(method: str, url: str, **kwargs) -> requests.Response:
+    return session_for(url).request(method, url, **kwargs)
+
+
+def is_idempotent(method: str, idempotent: Optional[bool] = None) -> bool:
+    return method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+
+def may_retry_status(status: int, hinted: bool, idempotent: bool) -> bool:
+    """
+    비멱등 요청(POST 등)은 서버가 처리하지 않았다고 알려 주는 응답만 재시도:
+    429, Retry-After가 붙은 503. 408/5xx는 이미 처리됐을 수 있어(LRO 중복 시작·이중 과금) 그대로 반환.
+    """
+    if status not in RETRY_STATUSES:
+        return False
+    return idempotent or status == 429 or (status == 503 and hinted)
+
+
+def request(method: str, url: str, retries: Optional[int] = None, idempotent: Optional[bool] = None,
+            **kwargs) -> requests.Response:
+    """
+    requests.request 대체. 재시도 대상(408/429/5xx, 연결 오류/타임아웃)이면 백오프 후 재시도하고,
+    서버 힌트(Retry-After 계열)가 있으면 그 시간을 우선한다.
+    idempotent: 기본은 메서드로 판단(GET/PUT/DELETE…). POST 조회처럼 다시 보내도 되는 요청은 True로.
+    비멱등 요청은 연결 단계 오류(요청 전송 전)와 429/503+Retry-After만 재시도 — 읽기 타임아웃은 재시도하지 않음.
+    재시도 소진 시 마지막 응답을 그대로 반환(상태 코드 처리는 호출자 몫)하거나 마지막 예외를 던짐.
+    """
+    host = urlsplit(url).netloc
+    retries = _cfg_int("HTTP_MAX_RETRIES", 5) if retries is None else retries
+    max_hint = _cfg_float("HTTP_MAX_RETRY_AFTER_SEC", 120.0)
+    br = _breaker(host)
+    idempotent = is_idempotent(method, idempotent)
+
+    attempt = 0
+    while True:
+        if not br.allow():
+            _metric(host, circuit_open=1)
+            raise CircuitOpenError(f"circuit open for {host} (잠시 후 다시 시도하세요)")
+        _metric(host, requests=1)
+        try:
+            r = _send(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _metric(host, errors=1)
+            br.failure()
+            sent = not isinstance(e, requests.ConnectionError)   # ReadTimeout: 서버가 이미 받았을 수 있음
+            if attempt >= retries or (sent and not idempotent):
+                raise
+            time.sleep(_backoff(attempt))
+            attempt += 1
+            _metric(host, retries=1)
+            continue
+        except BaseException:
+            # 그 외 예외(ChunkedEncodingError/InvalidURL 등)도 half-open 시험 요청을 반드시 정리
+            _metric(host, errors=1)
+            br.failure()
+            raise
+
+        if r.status_code not in RETRY_STATUSES:
+            br.success()
+            return r
+
+        if r.status_code == 429:
+            br.success()  # 스로틀은 장애가 아님
+        else:
+            _metric(host, errors=1)
+            br.failure()
+        hint = _retry_hint(r)
+        if attempt >= retries or not may_retry_status(r.status_code, hint is not None, idempotent):
+            return r
+
+        delay = min(hint, max_hint) if hint is not None else _backoff(attempt)
+        if r.status_code in THROTTLE_STATUSES:
+            _metric(host, throttled=1, throttled_sec=delay)
+        r.close()
+        time.sleep(delay)
+        attempt += 1
+        _metric(host, retries=1)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    return request("PUT", url, **kwargs)
@@ -0,0 +1,252 @@
+# index_jobs.py – 일괄 인덱싱 백그라운드 작업 (SQLite 체크포인트 · 재개 · 진행률 조회)
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from utils import local_state_path
+
+ACTIVE = ("queued", "running")
+
+
+class IndexJobStore:
+    """
+    작업 상태를 로컬 SQLite에 기록 (Streamlit 재실행/새로고침/프로세스 재시작 후에도 유지).
+    - jobs : 작업 파라미터, 상태, 집계, 커서(마지막으로 파이프라인에 넘긴 원본ID)
+    - items: 원본ID별 처리 결과 (ok | fail) — 재개 시 ok 항목은 건너뜀
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or local_state_path("index_jobs.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, user_id TEXT, source TEXT, params TEXT NOT NULL,"
+            " status TEXT NOT NULL, listed INTEGER DEFAULT 0, cursor TEXT,"
+            " stats TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job_id TEXT NOT NULL, original_id TEXT NOT NULL, status TEXT NOT NULL, error TEXT,"
+            " updated REAL NOT NULL, PRIMARY KEY (job_id, original_id))"
+        )
+        self._conn.commit()
+
+    def create(self, params: Dict) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs(job_id, user_id, source, params, status, created, updated)"
+                " VALUES (?,?,?,?,?,?,?)",
+                (job_id, params.get("user_id"), params.get("source"),
+                 json.dumps(params, ensure_ascii=False), "queued", now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if "stats" in fields and not isinstance(fields["stats"], str):
+            fields["stats"] = json.dumps(fields["stats"], ensure_ascii=False, default=str)
+        fields["updated"] = time.time()
+        cols = ", ".join(f"{k}=?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE job_id=?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def record(self, job_id: str, original_ids: Iterable[str], ok: bool, error: str = None):
+        now = time.time()
+        rows = [(job_id, oid, "ok" if ok else "fail", error, now) for oid in original_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items(job_id, original_id, status, error, updated) VALUES (?,?,?,?,?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def done_ids(self, job_id: str) -> Set[str]:
+        with self._lock:
+            return {r[0] for r in self._conn.execute(
+                "SELECT original_id FROM items WHERE job_id=? AND status='ok'", (job_id,))}
+
+    def failures(self, job_id: str, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return [{"original_id": oid, "error": err} for oid, err in self._conn.execute(
+                "SELECT original_id, error FROM items WHERE job_id=? AND status='fail'"
+                " ORDER BY updated DESC LIMIT ?", (job_id, limit))]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, user_id, source, params, status, listed, cursor, stats, error, created, updated"
+                " FROM jobs WHERE job_id=?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM items WHERE job_id=? GROUP BY status", (job_id,)))
+        keys = ("job_id", "user_id", "source", "params", "status", "listed", "cursor", "stats", "error",
+                "created", "updated")
+        job = dict(zip(keys, row))
+        job["params"] = json.loads(job["params"])
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        job["ok"], job["fail"] = counts.get("ok", 0), counts.get("fail", 0)
+        return job
+
+    def recent(self, user_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        q, args = "SELECT job_id FROM jobs", []
+        if user_id:
+            q, args = q + " WHERE user_id=?", [user_id]
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute(q + " ORDER BY created DESC LIMIT ?", (*args, limit))]
+        return [j for j in (self.get(i) for i in ids) if j]
+
+
+class JobContext:
+    """실행 함수에 넘기는 체크포인트 핸들 (워커 스레드에서 사용)"""
+
+    def __init__(self, store: IndexJobStore, job_id: str, params: Dict, secrets: Dict):
+        self.store = store
+        self.job_id = job_id
+        self.params = params
+        self.secrets = secrets      # Graph 토큰 등 — DB에 저장하지 않음
+        self.done = store.done_ids(job_id)
+        self.cancelled = threading.Event()
+        self._listed = 0
+
+    def pending(self, metas: Iterable[Dict], id_of: Callable[[Dict], str]) -> Iterator[Dict]:
+        """이미 끝난 항목은 건너뛰며 넘기고, 넘긴 위치를 커서로 기록 (중지 요청 시 더 넘기지 않음)"""
+        for m in metas:
+            if self.cancelled.is_set():
+                return
+            oid = id_of(m)
+            self._listed += 1
+            if self._listed % 50 == 0:
+                self.store.update(self.job_id, listed=self._listed, cursor=oid)
+            if oid in self.done:
+                continue
+            yield m
+        self.store.update(self.job_id, listed=self._listed)
+
+    def ok(self, original_ids: Iterable[str]):
+        self.store.record(self.job_id, original_ids, ok=True)
+
+    def fail(self, original_id: str, error: str):
+        self.store.record(self.job_id, [original_id], ok=False, error=error[:500])
+
+
+class IndexJobs:
+    """
+    프로세스 공용 작업 실행기. 작업은 데몬 스레드에서 돌고 상태는 IndexJobStore에 남는다.
+    run_fn(ctx) → stats(dict) 를 호출하며, 프로세스가 죽어 끊긴 작업은 interrupted로 표시되어 재개 가능.
+    같은 source(blob/onedrive)의 작업은 한 번에 하나만 실행 (start/resume이 RuntimeError).
+    """
+
+    def __init__(self, store: Optional[IndexJobStore] = None):
+        self.store = store or IndexJobStore()
+        self._threads: Dict[str, threading.Thread] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._lock = threading.RLock()
+        self._mark_orphans()
+
+    def _mark_orphans(self):
+        # 이 프로세스가 막 떴는데 running인 작업 = 이전 프로세스에서 끊긴 작업
+        for job in self.store.recent(limit=1000):
+            if job["status"] in ACTIVE:
+                self.store.update(job["job_id"], status="interrupted")
+
+    def _launch(self, job_id: str, params: Dict, run_fn: Callable[[JobContext], Dict], secrets: Dict):
+        ctx = JobContext(self.store, job_id, params, secrets or {})
+
+        def _body():
+            self.store.update(job_id, status="running", error=None)
+            try:
+                stats = run_fn(ctx)
+                status = "cancelled" if ctx.cancelled.is_set() else "done"
+                self.store.update(job_id, status=status, stats=stats or {})
+            except Exception as e:
+                self.store.update(job_id, status="failed", error=str(e)[:800])
+            finally:
+                with self._lock:
+                    self._threads.pop(job_id, None)
+                    self._contexts.pop(job_id, None)
+
+        t = threading.Thread(target=_body, name=f"index-job-{job_id}", daemon=True)
+        with self._lock:
+            self._threads[job_id] = t
+            self._contexts[job_id] = ctx
+        t.start()
+
+    def running_for(self, source: str) -> Optional[str]:
+        """같은 source로 실행 중인 작업 id (없으면 None)"""
+        with self._lock:
+            for job_id, ctx in self._contexts.items():
+                t = self._threads.get(job_id)
+                if ctx.params.get("source") == source and t is not None and t.is_alive():
+                    return job_id
+        return None
+
+    def _check_single_flight(self, source: str):
+        busy = self.running_for(source)
+        if busy:
+            raise RuntimeError(f"{source} 인덱싱 작업({busy})이 이미 실행 중입니다. 끝난 뒤 다시 시도하세요.")
+
+    def start(self, params: Dict, run_fn: Callable[[JobContext], Dict], secrets: Dict = None) -> str:
+        with self._lock:   # 확인과 등록 사이에 다른 세션이 끼어들지 않도록
+            self._check_single_flight(params.get("source"))
+            job_id = self.store.create(params)
+            self._launch(job_id, params, run_fn, secrets)
+        return job_id
+
+    def resume(self, job_id: str, run_fn: Callable[[JobContext], Dict], secrets: Dict = None) -> bool:
+        """끝나지 않은 작업을 체크포인트부터 다시 실행 (이미 실행 중이면 False)"""
+        job = self.store.get(job_id)
+        if job is None or job["status"] == "done" or self.is_alive(job_id):
+            return False
+        with self._lock:
+            self._check_single_flight(job["source"])
+            self._launch(job_id, job["params"], run_fn, secrets)
+        return True
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            ctx = self._contexts.get(job_id)
+        if ctx is not None:
+            ctx.cancelled.set()
+
+    def is_alive(self, job_id: str) -> bool:
+        with self._lock:
+            t = self._threads.get(job_id)
+        return t is not None and t.is_alive()
+
+    def progress(self, job_id: str) -> Optional[Dict]:
+        """UI 폴링용: 상태 + 처리/실패/목록화 건수 + 커서 + 최근 실패"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job["alive"] = self.is_alive(job_id)
+        job["failures"] = self.store.failures(job_id, limit=20) if job["fail"] else []
+        return job
+
+    def recent(self, user_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        jobs = self.store.recent(user_id, limit)
+        for j in jobs:
+            j["alive"] = self.is_alive(j["job_id"])
+        return jobs
+
+
+_JOBS: Optional[IndexJobs] = None
+_JOBS_LOCK = threading.Lock()
+
+
+def get_index_jobs() -> IndexJobs:
+    global _JOBS
+    with _JOBS_LOCK:
+        if _JOBS is None:
+            _JOBS = IndexJobs()
+        return _JOBS
@@ -0,0 +1,128 @@
+# index_manifest.py – 증분 인덱싱용 로컬 매니페스트 (원본 메타데이터 스냅샷)
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils import local_state_path
+
+_LOCK = threading.Lock()
+_SIG_FIELDS = ("last_modified", "size", "etag", "ctag")
+
+
+def _path() -> str:
+    return local_state_path("index_manifest.json")
+
+
+def _key(source: str, original_id: str) -> str:
+    return f"{source}:{original_id}"
+
+
+def original_id_of(meta: Dict, source: str) -> str:
+    """files_hub와 동일 규칙: Blob이면 이름(경로), OneDrive면 drive item id"""
+    return meta["id"] if source == "onedrive" else meta["name"]
+
+
+def signature(meta: Dict) -> Dict:
+    """변경 감지에 쓰는 메타데이터 (lastModified/size/ETag/cTag 중 있는 것만)"""
+    return {f: meta.get(f) for f in _SIG_FIELDS if meta.get(f) not in (None, "")}
+
+
+def _changed(old: Dict, new: Dict) -> bool:
+    # 양쪽에 모두 있는 필드만 비교 (ETag 없던 과거 항목도 lastModified로 판정)
+    common = [f for f in _SIG_FIELDS if f in old and f in new]
+    if not common:
+        return True
+    return any(str(old[f]) != str(new[f]) for f in common)
+
+
+class IndexManifest:
+    """
+    {"blob:path/a.pdf": {"sig": {...}, "indexedAt": "..."}} 형태의 JSON 파일.
+    업서트 스레드에서 동시에 갱신되므로 잠금 후 변경.
+    여러 작업(Blob/OneDrive/delta)이 각자 인스턴스를 들고 있으므로 save()는 파일을 다시 읽어
+    이 인스턴스가 바꾼 항목만 덮어씀 → 다른 작업이 저장한 항목을 지우지 않음.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or _path()
+        self.entries: Dict[str, Dict] = self._read()
+        self._dirty: Dict[str, Optional[Dict]] = {}   # key → 새 항목 (None이면 삭제)
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f) or {}
+        except Exception:
+            # 손상된 매니페스트 → 전체 재인덱싱으로 복구
+            return {}
+
+    def has_source(self, source: str) -> bool:
+        prefix = f"{source}:"
+        return any(k.startswith(prefix) for k in self.entries)
+
+    def mark_indexed(self, source: str, original_id: str, sig: Dict, parent: Optional[str] = None):
+        """parent: OneDrive 상위 폴더 item id (폴더 목록 기준 삭제 판정에 사용)"""
+        with _LOCK:
+            ent = {"sig": sig, "indexedAt": datetime.utcnow().isoformat()}
+            if parent:
+                ent["parent"] = parent
+            self.entries[_key(source, original_id)] = self._dirty[_key(source, original_id)] = ent
+
+    def forget(self, source: str, original_ids: Iterable[str]):
+        with _LOCK:
+            for oid in original_ids:
+                self.entries.pop(_key(source, oid), None)
+                self._dirty[_key(source, oid)] = None
+
+    def save(self):
+        with _LOCK:
+            merged = self._read()
+            for k, ent in self._dirty.items():
+                if ent is None:
+                    merged.pop(k, None)
+                else:
+                    merged[k] = ent
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self.entries, self._dirty = merged, {}
+
+    def plan(self, source: str, candidates: List[Dict], present: List[Dict],
+             indexed_last_modified: Optional[Dict[str, str]] = None,
+             scope_prefix: Optional[str] = None,
+             scope_parent: Optional[str] = None) -> Tuple[List[Dict], List[Dict], List[str]]:
+        """
+        candidates: 인덱싱 대상 메타(필터 적용 후)
+        present   : 원본에 현재 존재하는 전체 메타(필터 전) — 삭제 판정용
+        indexed_last_modified: 매니페스트가 비어 있을 때 쓰는 인덱스의 {originalId: lastModified}
+        scope_prefix: present가 일부 폴더만 담고 있을 때, 원본ID가 이 prefix로 시작하는 항목만 삭제 판정
+        scope_parent: present가 한 폴더의 직계 자식뿐일 때(OneDrive), parent가 이 폴더인 항목만 삭제 판정
+        반환: (changed, unchanged, deleted_original_ids)
+        """
+        changed, unchanged = [], []
+        for m in candidates:
+            if m.get("is_folder"):
+                continue
+            oid = original_id_of(m, source)
+            new_sig = signature(m)
+            ent = self.entries.get(_key(source, oid))
+            if ent is None and indexed_last_modified is not None:
+                lm = indexed_last_modified.get(oid)
+                ent = {"sig": {"last_modified": lm}} if lm else None
+            if ent is None or _changed(ent.get("sig") or {}, new_sig):
+                changed.append(m)
+            else:
+                unchanged.append(m)
+
+        # 삭제는 매니페스트가 추적 중인 항목만 (다른 경로로 색인된 문서는 건드리지 않음)
+        present_ids = {original_id_of(m, source) for m in present}
+        prefix = f"{source}:{scope_prefix or ''}"
+        deleted = [k[len(source) + 1:] for k, ent in self.entries.items()
+                   if k.startswith(prefix) and k[len(source) + 1:] not in present_ids
+                   and (scope_parent is None or ent.get("parent") == scope_parent)]
+        return changed, unchanged, deleted
@@ -0,0 +1,197 @@
+# index_pipeline.py – 일괄 인덱싱 단계별 파이프라인 (다운로드/추출 → 배치/임베딩 → 업서트)
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+_STOP = object()  # 단계 종료 신호
+
+
+class StageStats:
+    """단계별 처리량 집계 (스레드 안전)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy_sec = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, n: int, elapsed: float, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.items += n
+            else:
+                self.errors += n
+            self.busy_sec += elapsed
+
+    def as_dict(self, wall_sec: float) -> Dict:
+        wall = wall_sec or 1e-9
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_sec": round(self.busy_sec, 2),
+            "items_per_sec": round(self.items / wall, 2),
+        }
+
+
+def run_index_pipeline(
+    metas: Iterable[Dict],
+    load_fn: Callable[[Dict], Optional[Dict]],
+    embed_fn: Callable[[List[Dict]], List[Dict]],
+    upsert_fn: Callable[[List[Dict]], object],
+    batch_size: int = 10,
+    fetch_workers: int = 4,
+    embed_workers: int = 2,
+    upsert_workers: int = 2,
+    queue_size: int = 32,
+    on_error: Optional[Callable[[Dict, Exception], None]] = None,
+    on_batch_done: Optional[Callable[[List[Dict]], None]] = None,
+    on_batch_error: Optional[Callable[[List[Dict], Exception], None]] = None,
+) -> Dict:
+    """
+    3단계 파이프라인으로 일괄 인덱싱 실행.
+    - fetch : load_fn(meta) → 업서트용 doc (None이면 건너뜀) · 스레드풀(fetch_workers)
+    - embed : batch_size 단위로 묶어 embed_fn(batch) → contentVector 포함 레코드 · embed_workers
+    - upsert: upsert_fn(records) · upsert_workers
+    단계 사이 큐는 크기 제한이 있어 하류가 밀리면 상류가 대기(backpressure).
+    on_batch_done은 업서트 성공한 원본 doc 배치로 호출(업서트 스레드에서 실행).
+    임베딩/업서트 단계의 배치 실패는 on_batch_error(배치 doc 목록, 예외)로, 없으면 on_error(요약 meta, 예외)로 알림.
+    반환: {"ok", "fail", "elapsed_sec", "stages": [...]}
+    """
+    batch_size = max(1, int(batch_size))
+    fetch_workers = max(1, int(fetch_workers))
+    embed_workers = max(1, int(embed_workers))
+    upsert_workers = max(1, int(upsert_workers))
+
+    doc_q: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+    embed_q: "queue.Queue" = queue.Queue(maxsize=embed_workers * 2)
+    upsert_q: "queue.Queue" = queue.Queue(maxsize=upsert_workers * 2)
+
+    st_fetch, st_embed, st_upsert = StageStats("fetch"), StageStats("embed"), StageStats("upsert")
+    counts = {"ok": 0, "fail": 0}
+    counts_lock = threading.Lock()
+
+    def _fail(n: int, meta: Dict, err: Exception):
+        with counts_lock:
+            counts["fail"] += n
+        if on_error:
+            try:
+                on_error(meta, err)
+            except Exception:
+                pass
+
+    def _fail_batch(batch: List[Dict], err: Exception):
+        if on_batch_error is None:
+            _fail(len(batch), {"name": f"batch({len(batch)})"}, err)
+            return
+        with counts_lock:
+            counts["fail"] += len(batch)
+        try:
+            on_batch_error(batch, err)
+        except Exception:
+            pass
+
+    # ── 1) fetch/extract ─────────────────────────────
+    def _fetch(meta: Dict):
+        t0 = time.perf_counter()
+        try:
+            doc = load_fn(meta)
+        except Exception as e:
+            st_fetch.record(1, time.perf_counter() - t0, ok=False)
+            _fail(1, meta, e)
+            return
+        st_fetch.record(1, time.perf_counter() - t0)
+        if doc is not None:
+            doc_q.put(doc)  # 가득 차면 대기 → fetch 스레드가 멈추며 backpressure
+
+    # ── 2) batcher ───────────────────────────────────
+    def _batcher():
+        buf: List[Dict] = []
+        while True:
+            item = doc_q.get()
+            if item is _STOP:
+                break
+            buf.append(item)
+            if len(buf) >= batch_size:
+                embed_q.put(buf)
+                buf = []
+        if buf:
+            embed_q.put(buf)
+        for _ in range(embed_workers):
+            embed_q.put(_STOP)
+
+    # ── 3) embed ─────────────────────────────────────
+    def _embedder():
+        while True:
+            batch = embed_q.get()
+            if batch is _STOP:
+                break
+            t0 = time.perf_counter()
+            try:
+                records = embed_fn(batch)
+            except Exception as e:
+                st_embed.record(len(batch), time.perf_counter() - t0, ok=False)
+                _fail_batch(batch, e)
+                continue
+            st_embed.record(len(batch), time.perf_counter() - t0)
+            upsert_q.put((batch, records))
+
+    # ── 4) upsert ────────────────────────────────────
+    def _upserter():
+        while True:
+            item = upsert_q.get()
+            if item is _STOP:
+                break
+            batch, records = item
+            t0 = time.perf_counter()
+            try:
+                upsert_fn(records)
+            except Exception as e:
+                st_upsert.record(len(batch), time.perf_counter() - t0, ok=False)
+                _fail_batch(batch, e)
+                continue
+            st_upsert.record(len(batch), time.perf_counter() - t0)
+            with counts_lock:
+                counts["ok"] += len(batch)
+            if on_batch_done:
+                try:
+                    on_batch_done(batch)
+                except Exception:
+                    pass
+
+    started = time.perf_counter()
+    batcher = threading.Thread(target=_batcher, name="index-batcher", daemon=True)
+    embedders = [threading.Thread(target=_embedder, name=f"index-embed-{i}", daemon=True) for i in range(embed_workers)]
+    upserters = [threading.Thread(target=_upserter, name=f"index-upsert-{i}", daemon=True) for i in range(upsert_workers)]
+    for t in [batcher, *embedders, *upserters]:
+        t.start()
+
+    # 동시에 떠 있는 fetch 작업 수 제한 (메타 목록이 커도 메모리 일정)
+    slots = threading.BoundedSemaphore(fetch_workers * 2)
+    with ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="index-fetch") as pool:
+        for meta in metas:
+            if meta.get("is_folder"):
+                continue
+            slots.acquire()
+            fut = pool.submit(_fetch, meta)
+            fut.add_done_callback(lambda _f: slots.release())
+
+    doc_q.put(_STOP)
+    batcher.join()
+    for t in embedders:
+        t.join()
+    for _ in range(upsert_workers):
+        upsert_q.put(_STOP)
+    for t in upserters:
+        t.join()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "ok": counts["ok"],
+        "fail": counts["fail"],
+        "elapsed_sec": round(elapsed, 2),
+        "stages": [s.as_dict(elapsed) for s in (st_fetch, st_embed, st_upsert)],
+    }
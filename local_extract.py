@@ -0,0 +1,358 @@
+# local_extract.py – 로컬 파싱 텍스트 추출기 (PDF/DOCX/PPTX/XLSX/텍스트)
+# Streamlit/CONFIG에 의존하지 않아 추출 프로세스 풀(extract_pool)의 워커에서 그대로 import 가능
+import io, os, mimetypes, random
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+# 추출기 입력: bytes 또는 되감기 가능한 바이너리 파일 객체 (storage_blob.open_blob_stream 등)
+Content = Union[bytes, bytearray, memoryview, BinaryIO]
+
+# 선택 의존성: 없는 경우에도 graceful fallback
+try:
+    import PyPDF2
+except Exception:
+    PyPDF2 = None
+
+try:
+    import docx  # python-docx
+except Exception:
+    docx = None
+
+try:
+    from pptx import Presentation  # python-pptx
+except Exception:
+    Presentation = None
+
+try:
+    import openpyxl
+except Exception:
+    openpyxl = None
+
+try:
+    import chardet
+except Exception:
+    chardet = None
+
+
+def _as_stream(data: Content) -> BinaryIO:
+    """파서에 넘길 스트림 — 파일 객체는 복사 없이 처음으로 되감아 그대로 사용"""
+    if hasattr(data, "read"):
+        data.seek(0)
+        return data
+    return io.BytesIO(data)
+
+
+def _read_bytes(data: Content, limit: Optional[int] = None) -> bytes:
+    if hasattr(data, "read"):
+        data.seek(0)
+        return data.read(limit) if limit else data.read()
+    return bytes(data[:limit] if limit else data)
+
+
+def _guess_ext(filename: str) -> str:
+    return os.path.splitext(filename or "")[-1].lower()
+
+
+def _detect_text_encoding(data: bytes) -> str:
+    if not data:
+        return "utf-8"
+    if chardet:
+        try:
+            enc = chardet.detect(data).get("encoding") or "utf-8"
+            return enc
+        except Exception:
+            pass
+    # 안전 기본값
+    return "utf-8"
+
+
+def _extract_txt_like(filename: str, data: Content, max_chars: Optional[int] = None) -> str:
+    # UTF-8 한 글자 최대 4바이트 — max_chars면 앞부분만 읽어 디코드
+    data = _read_bytes(data, max_chars * 4 if max_chars else None)
+    enc = _detect_text_encoding(data)
+    try:
+        text = data.decode(enc, errors="replace")
+    except Exception:
+        # 최후의 보루
+        text = data.decode("utf-8", errors="replace")
+    return text[:max_chars] if max_chars else text
+
+
+# ─────────────────────────────────────────────────────────
+# 포맷별 지연 추출 (페이지/문단/슬라이드/행 단위로 yield)
+# ─────────────────────────────────────────────────────────
+def _iter_pdf(data: Content) -> Iterator[str]:
+    reader = PyPDF2.PdfReader(_as_stream(data))
+    for page in reader.pages:  # 페이지 내용은 extract_text 시점에 파싱
+        try:
+            t = page.extract_text() or ""
+        except Exception:
+            t = ""
+        if t:
+            yield t
+
+
+def _iter_docx(data: Content) -> Iterator[str]:
+    d = docx.Document(_as_stream(data))
+    for p in d.paragraphs:
+        if p.text:
+            yield p.text
+
+
+def _iter_pptx(data: Content) -> Iterator[str]:
+    prs = Presentation(_as_stream(data))
+    for i, slide in enumerate(prs.slides, start=1):
+        yield f"[Slide {i}]"
+        for shape in slide.shapes:
+            if hasattr(shape, "text") and shape.text:
+                yield shape.text
+
+
+# XLSX 상한 (워커 프로세스에서도 쓰므로 CONFIG 대신 모듈 상수)
+XLSX_MAX_ROWS = 2000        # 시트당 포함할 최대 행 — 넘으면 앞 절반 + 나머지 균등 샘플
+XLSX_MAX_COLS = 50          # 행당 최대 열
+XLSX_MAX_CELL_CHARS = 300   # 셀당 최대 글자
+XLSX_SECTION_ROWS = 100     # 청크 입력 섹션 하나에 묶을 행 수
+
+
+def _xlsx_rows(ws, max_rows: int = XLSX_MAX_ROWS, max_cols: int = XLSX_MAX_COLS,
+               max_cell_chars: int = XLSX_MAX_CELL_CHARS) -> Iterator[str]:
+    """
+    read-only 시트의 행을 스트리밍으로 읽어 탭 구분 문자열로.
+    빈 행은 건너뛰고, max_rows를 넘는 긴 시트는 앞 절반은 그대로, 나머지는 저수지 샘플링
+    (메모리는 max_rows 행 이내, 시드 고정이라 같은 파일이면 같은 결과).
+    """
+    head_n = max_rows // 2
+    tail_k = max_rows - head_n
+    rng = random.Random(0)
+    reservoir, seen = [], 0
+    for row in ws.iter_rows(values_only=True, max_col=max_cols):
+        cells = ["" if v is None else str(v)[:max_cell_chars] for v in row]
+        if not any(cells):
+            continue
+        line = "\t".join(cells).rstrip("\t")
+        seen += 1
+        if seen <= head_n:
+            yield line
+            continue
+        j = seen - head_n - 1
+        if len(reservoir) < tail_k:
+            reservoir.append((j, line))
+        else:
+            r = rng.randint(0, j)
+            if r < tail_k:
+                reservoir[r] = (j, line)
+    if seen > max_rows:
+        yield f"[… 전체 {seen}행 중 앞 {head_n}행 + 이후 {tail_k}행 샘플]"
+    for _, line in sorted(reservoir):
+        yield line
+
+
+def _iter_xlsx(data: Content) -> Iterator[str]:
+    # read_only: 시트를 XML 스트리밍으로 읽어 통합문서 전체를 메모리에 올리지 않음
+    wb = openpyxl.load_workbook(_as_stream(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield f"[Sheet] {ws.title}"
+            yield from _xlsx_rows(ws)
+    finally:
+        wb.close()
+
+
+def _xlsx_sections(data: Content) -> Iterator[str]:
+    """시트별 XLSX_SECTION_ROWS 행 묶음 → '[Sheet] 이름' 머리의 섹션 (청커 섹션 경계와 일치)"""
+    wb = openpyxl.load_workbook(_as_stream(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            block, part = [], 0
+            for line in _xlsx_rows(ws):
+                block.append(line)
+                if len(block) >= XLSX_SECTION_ROWS:
+                    yield "\n".join([f"[Sheet] {ws.title}" + (f" ({part + 1})" if part else "")] + block)
+                    block, part = [], part + 1
+            if block or not part:
+                yield "\n".join([f"[Sheet] {ws.title}" + (f" ({part + 1})" if part else "")] + block)
+    finally:
+        wb.close()
+
+
+# kind → (파서 모듈, 지연 추출기, 조각 구분자, 표시명, 미설치 메시지, 빈 결과 메시지)
+_FORMATS = {
+    "pdf": (lambda: PyPDF2, _iter_pdf, "\n\n", "PDF",
+            "[PDF parser(PyPDF2) 미설치] requirements.txt에 PyPDF2 추가하세요.", "[빈 PDF이거나 텍스트 추출 실패]"),
+    "docx": (lambda: docx, _iter_docx, "\n", "DOCX",
+             "[DOCX parser(python-docx) 미설치] requirements.txt에 python-docx 추가하세요.", "[DOCX 본문이 비어있음]"),
+    "pptx": (lambda: Presentation, _iter_pptx, "\n", "PPTX",
+             "[PPTX parser(python-pptx) 미설치] requirements.txt에 python-pptx 추가하세요.", "[PPTX 텍스트가 없습니다]"),
+    "xlsx": (lambda: openpyxl, _iter_xlsx, "\n", "XLSX",
+             "[XLSX parser(openpyxl) 미설치] requirements.txt에 openpyxl 추가하세요.", "[XLSX 내용이 없습니다]"),
+}
+
+
+def _collect(kind: str, data: Content, max_chars: Optional[int] = None) -> str:
+    """지연 추출 조각을 이어 붙이되 max_chars에 닿으면 나머지 페이지는 파싱하지 않음"""
+    parser, iter_fn, sep, label, missing_msg, empty_msg = _FORMATS[kind]
+    if not parser():
+        return missing_msg
+    parts, n = [], 0
+    try:
+        for piece in iter_fn(data):
+            parts.append(piece)
+            n += len(piece) + len(sep)
+            if max_chars and n >= max_chars:
+                break
+    except Exception as e:
+        return f"[{label} 추출 오류] {e}"
+    text = sep.join(parts).strip()
+    if max_chars:
+        text = text[:max_chars]
+    return text or empty_msg
+
+
+def _extract_pdf(data: Content, max_chars: Optional[int] = None) -> str:
+    return _collect("pdf", data, max_chars)
+
+
+def _extract_docx(data: Content, max_chars: Optional[int] = None) -> str:
+    return _collect("docx", data, max_chars)
+
+
+def _extract_pptx(data: Content, max_chars: Optional[int] = None) -> str:
+    return _collect("pptx", data, max_chars)
+
+
+def _extract_xlsx(data: Content, max_chars: Optional[int] = None) -> str:
+    return _collect("xlsx", data, max_chars)
+
+
+_MIME_KINDS = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+}
+
+
+def _kind_of(filename: str) -> str:
+    """pdf/docx/pptx/xlsx 또는 text (확장자 우선, 애매하면 MIME 힌트, 마지막은 텍스트 시도)"""
+    ext = _guess_ext(filename)
+    if ext == ".pdf":
+        return "pdf"
+    if ext == ".docx":
+        return "docx"
+    if ext == ".pptx":
+        return "pptx"
+    if ext in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if ext in (".txt", ".md", ".csv", ".log"):
+        return "text"
+    mt, _ = mimetypes.guess_type(filename or "")
+    return _MIME_KINDS.get(mt, "text")
+
+
+def extract_sections_naive(filename: str, content: Content) -> List[str]:
+    """
+    청크 분할 입력용 섹션 목록 (chunker.chunk_sections / build_chunk_records의 sections).
+    PDF는 페이지, PPTX는 슬라이드, XLSX는 시트별 행 묶음, 그 외는 본문 1개.
+    섹션이 하나도 안 나오면(스캔 PDF 등) extract_text_naive의 안내 문구 1개 — 빈 본문은 임베딩 불가.
+    """
+    kind = _kind_of(filename)
+    try:
+        sections = None
+        if kind == "xlsx" and openpyxl:
+            sections = [s for s in _xlsx_sections(content) if s.strip()]
+        elif kind == "pdf" and PyPDF2:
+            sections = [s for s in _iter_pdf(content) if s.strip()]
+        elif kind == "pptx" and Presentation:
+            sections = []
+            for piece in _iter_pptx(content):
+                if piece.startswith("[Slide ") or not sections:
+                    sections.append(piece)
+                else:
+                    sections[-1] += "\n" + piece
+        if sections:
+            return sections
+    except Exception:
+        pass  # 오류 메시지 형식은 extract_text_naive와 동일하게
+    text = extract_text_naive(filename, content)
+    return [text] if text else []
+
+
+def extract_text_naive(filename: str, content: Content, max_chars: Optional[int] = None) -> str:
+    """
+    간단 텍스트 추출기 (로컬 파싱)
+    - PDF: PyPDF2
+    - DOCX: python-docx
+    - PPTX: python-pptx
+    - XLSX: openpyxl read-only 스트리밍 (탭으로 셀 연결, 시트당 행/열/셀 상한 · 긴 시트는 샘플링)
+    - TXT/MD/기타 텍스트: chardet로 인코딩 추정 후 디코드
+    - 그 외: MIME/확장자에 따라 best-effort
+    max_chars: 미리보기 등 앞부분만 필요할 때 — 그만큼 모이면 추출 중단
+    content: bytes 또는 바이너리 파일 객체 (파일 객체는 통째로 bytes로 바꾸지 않고 파서에 직접 전달)
+    """
+    kind = _kind_of(filename)
+    if kind == "text":
+        return _extract_txt_like(filename, content, max_chars)
+    return _collect(kind, content, max_chars)
+
+
+# ─────────────────────────────────────────────────────────
+# 프로세스 풀 워커 진입점 (extract_pool이 spawn 컨텍스트로 호출)
+# ─────────────────────────────────────────────────────────
+try:
+    import resource  # POSIX 전용
+except Exception:
+    resource = None
+
+try:
+    import signal
+except Exception:
+    signal = None
+
+
+class _Deadline(BaseException):
+    """워커 작업 시간 초과 — 파서 쪽 except Exception에 삼켜지지 않도록 BaseException"""
+
+
+def _on_deadline(signum, frame):
+    raise _Deadline()
+
+
+def _worker_call(fn, timeout_sec: Optional[float], filename: str, content: Union[bytes, str], *rest):
+    """
+    워커에서 실제 실행 시간만 재는 타임아웃 (SIGALRM, 큐 대기 시간은 포함되지 않음).
+    content가 str이면 부모가 넘긴 임시 파일 경로 — 워커에서 직접 열어 스트림으로 파싱.
+    """
+    armed = bool(timeout_sec) and signal is not None and hasattr(signal, "setitimer")
+    if armed:
+        signal.signal(signal.SIGALRM, _on_deadline)
+        signal.setitimer(signal.ITIMER_REAL, float(timeout_sec))
+    try:
+        if isinstance(content, str):
+            with open(content, "rb") as f:
+                return fn(filename, f, *rest)
+        return fn(filename, content, *rest)
+    except _Deadline:
+        raise TimeoutError(f"추출 시간 초과({timeout_sec:.0f}s): {filename}") from None
+    finally:
+        if armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def worker_init(mem_limit_mb: int = 0):
+    """워커 주소공간 상한(RLIMIT_AS). 초과 시 파서가 MemoryError → 오류 문자열로 반환"""
+    if resource is None or not mem_limit_mb:
+        return
+    try:
+        limit = int(mem_limit_mb) << 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def worker_extract(filename: str, content: Union[bytes, str], max_chars: Optional[int] = None,
+                   timeout_sec: Optional[float] = None) -> str:
+    return _worker_call(extract_text_naive, timeout_sec, filename, content, max_chars)
+
+
+def worker_sections(filename: str, content: Union[bytes, str], timeout_sec: Optional[float] = None) -> List[str]:
+    return _worker_call(extract_sections_naive, timeout_sec, filename, content)
@@ -0,0 +1,317 @@
+# local_vectors.py – 로컬 벡터 인덱스 (IVF-flat · NumPy memmap + SQLite 메타) · Cognitive Search 미러/캐시
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from config import CONFIG
+from utils import local_state_path
+
+# 선택 의존성: numpy 없으면 로컬 인덱스 비활성 (검색은 항상 Cognitive Search)
+try:
+    import numpy as np
+    from numpy.lib.format import open_memmap
+except Exception:
+    np = None
+    open_memmap = None
+
+META_FIELDS = ("id", "originalId", "name", "source", "path", "lastModified", "chunkIndex")
+
+
+class LocalVectorIndex:
+    """
+    업서트 시점의 contentVector를 그대로 받아 두는 근사 최근접 인덱스.
+    - vectors.npy : 정규화된 float32 행렬 (memmap, 용량 2배씩 증가)
+    - meta.sqlite : slot ↔ 문서 메타 (id/originalId/name/…/chunkIndex/alive)
+    - 벡터가 train_min 이상이면 구면 k-means로 nlist개 중심을 학습하고 검색 시 nprobe개 리스트만 비교(IVF-flat).
+      그 전에는 전체 비교(flat).
+    점수는 Cognitive Search cosine과 같은 1/(1 + (1 - cos)) 로 돌려줌.
+    원본은 Cognitive Search — 이 인덱스는 언제든 지우고 다시 채울 수 있음.
+    업서트 미러만으로는 도입 이전 문서가 빠져 있으므로, 전체 재구축이 끝나야 synced로 표시되고
+    reset/미러 실패 시 해제된다. 검색/일괄 처리는 synced일 때만 이 인덱스를 쓴다.
+    """
+
+    def __init__(self, directory: Optional[str] = None, nlist: Optional[int] = None, nprobe: Optional[int] = None,
+                 train_min: Optional[int] = None):
+        self.dir = directory or local_state_path("vector_index")
+        os.makedirs(self.dir, exist_ok=True)
+        self.nlist = nlist or int(CONFIG.get("LOCAL_VECTOR_NLIST", 0))   # 0이면 sqrt(N)
+        self.nprobe = nprobe or int(CONFIG.get("LOCAL_VECTOR_NPROBE", 8))
+        self.train_min = train_min or int(CONFIG.get("LOCAL_VECTOR_TRAIN_MIN", 4096))
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.dir, "meta.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " slot INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, originalId TEXT, name TEXT, source TEXT,"
+            " path TEXT, lastModified TEXT, chunkIndex INTEGER, alive INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_items_orig ON items(originalId)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        self._load()
+
+    # ----- 저장/로드 -----
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _info(self, key: str, default=None):
+        row = self._db.execute("SELECT value FROM info WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_info(self, **kv):
+        self._db.executemany("INSERT OR REPLACE INTO info(key, value) VALUES (?,?)",
+                             [(k, str(v)) for k, v in kv.items()])
+
+    def _load(self):
+        dim = self._info("dim")
+        self.dim = int(dim) if dim else None
+        self.trained_n = int(self._info("trained_n", 0))
+        row = self._db.execute("SELECT MAX(slot) FROM items").fetchone()
+        self.count = (row[0] + 1) if row and row[0] is not None else 0
+        vec_path = self._path("vectors.npy")
+        self._vecs = open_memmap(vec_path, mode="r+") if os.path.exists(vec_path) and self.dim else None
+        cap = self._vecs.shape[0] if self._vecs is not None else 0
+        if self._vecs is None or cap < self.count:
+            # 벡터 파일이 없거나 메타보다 짧으면(중간에 끊김) 비우고 다시 채워야 함
+            self._vecs, self.count, cap = None, 0, 0
+            self._db.execute("DELETE FROM items")
+            self._db.commit()
+        self._alive = np.zeros(cap, dtype=bool)
+        for (slot,) in self._db.execute("SELECT slot FROM items WHERE alive=1"):
+            self._alive[slot] = True
+        cen_path, asg_path = self._path("centroids.npy"), self._path("assign.npy")
+        self._centroids = np.load(cen_path) if os.path.exists(cen_path) and self.count else None
+        self._assign = np.full(cap, -1, dtype=np.int32)
+        if self._centroids is not None and os.path.exists(asg_path):
+            saved = np.load(asg_path)
+            self._assign[:min(cap, len(saved))] = saved[:cap]
+
+    def _ensure_capacity(self, n: int):
+        cap = self._vecs.shape[0] if self._vecs is not None else 0
+        if n <= cap:
+            return
+        new_cap = max(1024, cap * 2, n)
+        path = self._path("vectors.npy")
+        tmp = f"{path}.tmp.npy"
+        grown = open_memmap(tmp, mode="w+", dtype=np.float32, shape=(new_cap, self.dim))
+        if self._vecs is not None:
+            grown[:cap] = self._vecs[:cap]
+        grown.flush()
+        del grown
+        self._vecs = None
+        os.replace(tmp, path)
+        self._vecs = open_memmap(path, mode="r+")
+        self._alive = np.concatenate([self._alive, np.zeros(new_cap - cap, dtype=bool)])
+        self._assign = np.concatenate([self._assign, np.full(new_cap - cap, -1, dtype=np.int32)])
+
+    def _save_ivf(self):
+        if self._centroids is not None:
+            np.save(self._path("centroids.npy"), self._centroids)
+            np.save(self._path("assign.npy"), self._assign[:self.count])
+
+    # ----- 쓰기 -----
+    @staticmethod
+    def _normalize(m):
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (m / norms).astype(np.float32)
+
+    def upsert(self, records: Iterable[Dict]) -> int:
+        """
+        records: 업서트 레코드 (id는 인덱스 안전키, contentVector 필수).
+        본문/섹션 등 나머지 필드는 보관하지 않음. 반환: 반영 건수
+        """
+        # 같은 묶음에 같은 id가 여러 번 오면 마지막 것만
+        recs = list({r["id"]: r for r in records if r.get("contentVector") and r.get("id")}.values())
+        if not recs:
+            return 0
+        vecs = self._normalize(np.asarray([r["contentVector"] for r in recs], dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                self._set_info(dim=self.dim)
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"로컬 벡터 인덱스 차원 불일치: index={self.dim}, got={vecs.shape[1]}")
+            slots = []
+            for r in recs:
+                row = self._db.execute("SELECT slot FROM items WHERE id=?", (r["id"],)).fetchone()
+                if row:
+                    slots.append(row[0])
+                else:
+                    slots.append(self.count)
+                    self.count += 1
+            self._ensure_capacity(self.count)
+            idx = np.asarray(slots)
+            self._vecs[idx] = vecs
+            self._vecs.flush()
+            self._alive[idx] = True
+            if self._centroids is not None:
+                self._assign[idx] = np.argmax(vecs @ self._centroids.T, axis=1)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO items(slot, id, originalId, name, source, path, lastModified, chunkIndex, alive)"
+                " VALUES (?,?,?,?,?,?,?,?,1)",
+                [(s, r["id"], r.get("originalId") or r["id"], r.get("name"), r.get("source"), r.get("path"),
+                  r.get("lastModified"), r.get("chunkIndex")) for s, r in zip(slots, recs)],
+            )
+            self._db.commit()
+            if self.count >= self.train_min and self.count >= 2 * max(self.trained_n, self.train_min // 2):
+                self._train()
+            else:
+                self._save_ivf()
+        return len(recs)
+
+    def _kill(self, where: str, args: Sequence):
+        slots = [s for (s,) in self._db.execute(f"SELECT slot FROM items WHERE alive=1 AND ({where})", args)]
+        if slots:
+            self._db.execute(f"UPDATE items SET alive=0 WHERE {where}", args)
+            self._alive[np.asarray(slots)] = False
+        return len(slots)
+
+    def delete(self, original_ids: Iterable[str]) -> int:
+        """원본ID(부모+청크) 단위 삭제 — slot은 표시만 지우고 같은 id가 다시 오면 재사용"""
+        ids = [o for o in original_ids if o]
+        n = 0
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                n += self._kill(f"originalId IN ({','.join('?' * len(part))})", part)
+            self._db.commit()
+        return n
+
+    def trim_chunks(self, keep_counts: Dict[str, int]) -> int:
+        """{부모 원본ID: 유지할 청크 수} → 그 이상 번호의 청크 제거 (search._delete_stale_chunks와 동일 규칙)"""
+        n = 0
+        with self._lock:
+            for oid, keep in keep_counts.items():
+                n += self._kill("originalId=? AND chunkIndex IS NOT NULL AND chunkIndex>=?", (oid, int(keep)))
+            self._db.commit()
+        return n
+
+    def reset(self):
+        with self._lock:
+            self._db.execute("DELETE FROM items")
+            self._db.execute("DELETE FROM info")
+            self._db.commit()
+            self._vecs = None
+            for name in ("vectors.npy", "centroids.npy", "assign.npy"):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+            self._load()
+
+    def is_synced(self) -> bool:
+        with self._lock:
+            return self._info("synced") == "1"
+
+    def mark_synced(self, synced: bool):
+        with self._lock:
+            self._set_info(synced=int(bool(synced)))
+            self._db.commit()
+
+    # ----- IVF 학습 -----
+    def _train(self, iters: int = 10, sample: int = 20000):
+        """살아 있는 벡터 표본으로 구면 k-means → 전체 벡터를 가장 가까운 중심에 배정"""
+        live = np.flatnonzero(self._alive[:self.count])
+        if live.size < 2:
+            return
+        rng = np.random.default_rng(0)
+        pick = np.sort(rng.choice(live, size=min(sample, live.size), replace=False))
+        x = np.asarray(self._vecs[pick])
+        nlist = self.nlist or int(np.sqrt(live.size))
+        nlist = max(1, min(nlist, x.shape[0]))
+        cent = x[rng.choice(x.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            lab = np.argmax(x @ cent.T, axis=1)
+            for c in range(nlist):
+                members = x[lab == c]
+                if len(members):
+                    cent[c] = members.mean(axis=0)
+            cent = self._normalize(cent)
+        self._centroids = cent
+        # 배정은 바이트 예산(LOCAL_VECTOR_BLOCK_MB) 단위 블록으로 — 1536차원 기준 약 2700행(16MB)씩
+        step = max(1, int(float(CONFIG.get("LOCAL_VECTOR_BLOCK_MB", 16)) * (1 << 20)) // (4 * self.dim))
+        for i in range(0, self.count, step):
+            block = np.asarray(self._vecs[i:min(i + step, self.count)])
+            self._assign[i:i + len(block)] = np.argmax(block @ cent.T, axis=1)
+        self.trained_n = self.count
+        self._set_info(trained_n=self.trained_n)
+        self._db.commit()
+        self._save_ivf()
+
+    # ----- 검색 -----
+    def ready(self, dim: Optional[int] = None) -> bool:
+        """전체 재구축 후 동기화 상태이고 살아 있는 벡터가 있으면 True"""
+        with self._lock:
+            return (self.is_synced() and self.count > 0 and bool(self._alive[:self.count].any())
+                    and (dim is None or dim == self.dim))
+
+    def search(self, qvec: Sequence[float], k: int, nprobe: Optional[int] = None) -> List[Dict]:
+        """top-k 히트 (Cognitive Search 응답의 value 항목과 같은 모양 · @search.score 포함)"""
+        q = np.asarray(qvec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        with self._lock:
+            n = self.count
+            if not n or q.shape[0] != self.dim:
+                return []
+            alive = self._alive[:n]
+            if self._centroids is not None:
+                probes = np.argsort(-(self._centroids @ q))[:nprobe or self.nprobe]
+                cand = np.flatnonzero(np.isin(self._assign[:n], probes) & alive)
+                sims = np.asarray(self._vecs[cand]) @ q if cand.size else np.empty(0, dtype=np.float32)
+            else:
+                cand = np.flatnonzero(alive)
+                sims = (np.asarray(self._vecs[:n]) @ q)[cand]
+            if not cand.size:
+                return []
+            top = np.argpartition(-sims, min(k, sims.size) - 1)[:k] if sims.size > k else np.arange(sims.size)
+            top = top[np.argsort(-sims[top])]
+            slots = [int(cand[i]) for i in top]
+            q_marks = ",".join("?" * len(slots))
+            meta = {row[0]: row[1:] for row in self._db.execute(
+                f"SELECT slot, {', '.join(META_FIELDS)} FROM items WHERE slot IN ({q_marks})", slots)}
+        hits = []
+        for i, slot in zip(top, slots):
+            if slot not in meta:
+                continue
+            h = dict(zip(META_FIELDS, meta[slot]))
+            h["@search.score"] = float(1.0 / (1.0 + (1.0 - sims[i])))
+            hits.append(h)
+        return hits
+
+    def export(self, parents_only: bool = True):
+        """살아 있는 항목 전체 → (메타 목록, 정규화 float32 행렬) · 중복 탐지 등 일괄 처리용"""
+        with self._lock:
+            q = f"SELECT slot, {', '.join(META_FIELDS)} FROM items WHERE alive=1"
+            if parents_only:
+                q += " AND chunkIndex IS NULL"
+            rows = list(self._db.execute(q + " ORDER BY slot"))
+            if not rows:
+                return [], np.empty((0, self.dim or 0), dtype=np.float32)
+            mat = np.asarray(self._vecs[np.asarray([r[0] for r in rows])])
+        return [dict(zip(META_FIELDS, r[1:])) for r in rows], mat
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "vectors": int(self._alive[:self.count].sum()) if self.count else 0,
+                "slots": self.count, "dim": self.dim, "synced": self.is_synced(),
+                "mode": "ivf" if self._centroids is not None else "flat",
+                "nlist": 0 if self._centroids is None else int(self._centroids.shape[0]),
+            }
+
+
+_INDEX: Optional[LocalVectorIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_local_vector_index() -> Optional[LocalVectorIndex]:
+    """numpy가 없거나 LOCAL_VECTOR_INDEX_ENABLED가 true가 아니면(기본 꺼짐) None"""
+    global _INDEX
+    if np is None or str(CONFIG.get("LOCAL_VECTOR_INDEX_ENABLED", "false")).lower() not in ("1", "true", "yes"):
+        return None
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = LocalVectorIndex(directory=CONFIG.get("LOCAL_VECTOR_INDEX_DIR") or None)
+        return _INDEX
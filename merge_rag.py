@@ -3,36 +3,81 @@
 import json, datetime as dt
 from typing import List, Dict, Tuple
 from config import CONFIG
-from search import vector_search_by_text, vector_search, get_document_by_id
+from search import vector_search_by_text, avector_search, aget_documents_by_ids, get_index_schema_fields
 from storage_blob import upload_blob
 from graph import upload_onedrive_file
-import requests
+import asyncio
+import http_client
+import aio_http
+from openai_client import iter_sse_deltas
+
+# 병합 프롬프트에 싣는 기준 문서 분량 (파일 허브는 추출도 여기서 멈춤)
+BASE_TEXT_MAX_CHARS = 8000
 
 # --- Azure OpenAI Chat 호출 (독립 REST) ---
-def _aoai_chat(messages: List[Dict], max_tokens: int = 2000, temperature: float = 0.2) -> str:
+_API_VERSIONS = [
+    "2025-01-01-preview",  # 최신 우선
+    "2024-12-01-preview",
+    "2024-08-01-preview",
+    "2024-02-15-preview",
+]
+
+def _aoai_chat_request(ver: str, messages: List[Dict], max_tokens: int, temperature: float):
     endpoint = CONFIG["AZURE_OPENAI_ENDPOINT"].rstrip("/")
-    api_key = CONFIG["AZURE_OPENAI_API_KEY"]
     deployment = CONFIG.get("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
-    api_versions = [
-        "2025-01-01-preview",  # 최신 우선
-        "2024-12-01-preview",
-        "2024-08-01-preview",
-        "2024-02-15-preview",
-    ]
+    url = f"{endpoint}/openai/deployments/{deployment}/chat/completions?api-version={ver}"
+    headers = {"Content-Type":"application/json","api-key":CONFIG["AZURE_OPENAI_API_KEY"]}
+    payload = {
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    return url, headers, payload
+
+def _aoai_chat(messages: List[Dict], max_tokens: int = 2000, temperature: float = 0.2) -> str:
+    last_err = None
+    for ver in _API_VERSIONS:
+        url, headers, payload = _aoai_chat_request(ver, messages, max_tokens, temperature)
+        try:
+            r = http_client.post(url, headers=headers, json=payload, timeout=60)
+            if r.status_code == 200:
+                return r.json()["choices"][0]["message"]["content"]
+            last_err = r
+        except Exception as e:
+            last_err = e
+    raise RuntimeError(f"Azure OpenAI Chat 호출 실패: {last_err}")
+
+def _aoai_chat_stream(messages: List[Dict], max_tokens: int = 2000, temperature: float = 0.2):
+    """
+    _aoai_chat 스트리밍 버전 (텍스트 조각 제너레이터).
+    API 버전 폴백은 첫 응답(상태 코드) 기준 — 스트림이 시작된 뒤에는 바꾸지 않음.
+    """
+    last_err = None
+    for ver in _API_VERSIONS:
+        url, headers, payload = _aoai_chat_request(ver, messages, max_tokens, temperature)
+        payload["stream"] = True
+        try:
+            r = http_client.post(url, headers=headers, json=payload, timeout=60, stream=True)
+        except Exception as e:
+            last_err = e
+            continue
+        if r.status_code != 200:
+            last_err = f"{r.status_code} {r.text[:500]}"
+            r.close()
+            continue
+        try:
+            yield from iter_sse_deltas(r)
+        finally:
+            r.close()
+        return
+    raise RuntimeError(f"Azure OpenAI Chat 호출 실패: {last_err}")
+
+async def _aaoai_chat(messages: List[Dict], max_tokens: int = 2000, temperature: float = 0.2) -> str:
     last_err = None
-    for ver in api_versions:
-        url = f"{endpoint}/openai/deployments/{deployment}/chat/completions?api-version={ver}"
+    for ver in _API_VERSIONS:
+        url, headers, payload = _aoai_chat_request(ver, messages, max_tokens, temperature)
         try:
-            r = requests.post(
-                url,
-                headers={"Content-Type":"application/json","api-key":api_key},
-                json={
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens
-                },
-                timeout=60
-            )
+            r = await aio_http.apost(url, headers=headers, json=payload, timeout=60)
             if r.status_code == 200:
                 return r.json()["choices"][0]["message"]["content"]
             last_err = r
@@ -41,28 +86,56 @@ def _aoai_chat(messages: List[Dict], max_tokens: int = 2000, temperature: float
     raise RuntimeError(f"Azure OpenAI Chat 호출 실패: {last_err}")
 
 # --- 유사 문서(또는 청크) 검색 ---
-def retrieve_similar_contexts(base_text: str, k: int = 5, use_vector: bool = True) -> List[Dict]:
+def retrieve_similar_contexts(base_text: str, k: int = 5, use_vector: bool = True,
+                              passages: bool = False, max_passages: int = None) -> List[Dict]:
     """
     base_text와 유사한 문서 상위 k개를 조회하고 content까지 로드.
     index에 content 필드가 있어야 함.
+    passages=True면 문서 전문 대신 점수 상위 청크(단락) max_passages개만 content로 사용.
+    """
+    return aio_http.run_sync(aretrieve_similar_contexts(
+        base_text, k=k, use_vector=use_vector, passages=passages, max_passages=max_passages))
+
+def _passages_text(passages: List[Dict], max_passages: int) -> str:
+    """점수 상위 단락을 골라 문서 내 순서대로 이어 붙임"""
+    top = sorted(passages, key=lambda p: p.get("score") or 0.0, reverse=True)[:max_passages]
+    return "\n\n…\n\n".join(p["content"] for p in sorted(top, key=lambda p: p["chunkIndex"]))
+
+async def aretrieve_similar_contexts(base_text: str, k: int = 5, use_vector: bool = True,
+                                     passages: bool = False, max_passages: int = None) -> List[Dict]:
+    """
+    retrieve_similar_contexts의 비동기 버전.
+    본문은 검색 응답의 content(select)로 받고, 빠진 문서만 search.in 일괄 조회 1회로 채운다.
     """
+    max_passages = int(max_passages or CONFIG.get("MERGE_MAX_PASSAGES", 3))
     if use_vector:
-        hits = vector_search(base_text, k=k).get("value", [])
-        ids = [h["id"] for h in hits]
+        chunked = "chunkIndex" in await asyncio.to_thread(get_index_schema_fields)
+        # 청크 인덱스에서 전문 모드면 부모 전문이 oversample 배수만큼 실려 오므로 본문은 따로 일괄 조회
+        select = "content" if (passages or not chunked) else None
+        hits = (await avector_search(base_text, k=k, aggregate_parents=True, select=select)).get("value", [])
     else:
-        hits = vector_search_by_text(base_text, k=k)
-        ids = [h["id"] for h in hits]
+        hits = await asyncio.to_thread(vector_search_by_text, base_text, k, "id,name,lastModified,views,content")
+
+    contents = {}
+    for h in hits:
+        if passages and h.get("passages"):
+            contents[h["id"]] = _passages_text(h["passages"], max_passages)
+        elif "content" in h:
+            contents[h["id"]] = h["content"]
+    missing = [h["id"] for h in hits if h["id"] not in contents]
+    if missing:
+        for doc in await aget_documents_by_ids(missing, select="id,content"):
+            contents[doc["id"]] = doc.get("content") or ""
 
     contexts = []
-    for _id in ids:
-        doc = get_document_by_id(_id)
-        if not doc:
+    for h in hits:
+        if h["id"] not in contents:
             continue
         contexts.append({
-            "id": doc.get("id"),
-            "name": doc.get("name"),
-            "content": doc.get("content", ""),
-            "lastModified": doc.get("lastModified")
+            "id": h.get("id"),
+            "name": h.get("name"),
+            "content": contents[h["id"]],
+            "lastModified": h.get("lastModified")
         })
     return contexts
 
@@ -86,7 +159,7 @@ def _build_merge_prompt(doc_title: str, base_text: str, contexts: List[Dict]) ->
 {doc_title}
 
 [기준 문서 본문]
-{base_text[:8000]}
+{base_text[:BASE_TEXT_MAX_CHARS]}
 
 [참고 문서/단락 (인용용)]
 {chr(10).join(context_blocks)}
@@ -103,15 +176,30 @@ def _build_merge_prompt(doc_title: str, base_text: str, contexts: List[Dict]) ->
     ]
 
 # --- 병합 문서 생성 (Markdown) ---
-def generate_merged_markdown(doc_title: str, base_text: str, k: int = 5, use_vector: bool = True) -> Tuple[str, List[Dict]]:
+def generate_merged_markdown(doc_title: str, base_text: str, k: int = 5, use_vector: bool = True,
+                             passages: bool = False) -> Tuple[str, List[Dict]]:
     """
     반환: (merged_markdown, used_contexts)
     """
-    contexts = retrieve_similar_contexts(base_text, k=k, use_vector=use_vector)
+    return aio_http.run_sync(agenerate_merged_markdown(doc_title, base_text, k=k, use_vector=use_vector, passages=passages))
+
+async def agenerate_merged_markdown(doc_title: str, base_text: str, k: int = 5, use_vector: bool = True,
+                                    passages: bool = False) -> Tuple[str, List[Dict]]:
+    contexts = await aretrieve_similar_contexts(base_text, k=k, use_vector=use_vector, passages=passages)
     messages = _build_merge_prompt(doc_title, base_text, contexts)
-    merged_md = _aoai_chat(messages, max_tokens=2800, temperature=0.2)
+    merged_md = await _aaoai_chat(messages, max_tokens=2800, temperature=0.2)
     return merged_md, contexts
 
+def generate_merged_markdown_stream(doc_title: str, base_text: str, k: int = 5, use_vector: bool = True,
+                                    passages: bool = False):
+    """
+    반환: (텍스트 조각 제너레이터, used_contexts)
+    컨텍스트 수집은 즉시 끝내고, 병합 본문은 제너레이터를 소비하면서 생성된다.
+    """
+    contexts = retrieve_similar_contexts(base_text, k=k, use_vector=use_vector, passages=passages)
+    messages = _build_merge_prompt(doc_title, base_text, contexts)
+    return _aoai_chat_stream(messages, max_tokens=2800, temperature=0.2), contexts
+
 # --- 저장 유틸 ---
 def save_merged(markdown: str, filename: str, target: str = "local") -> Dict:
     """
@@ -4,6 +4,7 @@ from typing import Sequence, Dict
 from config import CONFIG
 from teams import send_teams_message
 import base64, json, requests
+import http_client
 
 def _decode_jwt(token: str) -> dict:
     try:
@@ -46,7 +47,8 @@ def send_email_graph(access_token: str, to_email: str, subject: str, body_md: st
         },
         "saveToSentItems": "true"
     }
-    r = requests.post(url, headers=headers, json=payload, timeout=30)
+    # 메일 전송은 멱등이 아니므로 재시도 없이 풀링된 세션만 사용
+    r = http_client.post(url, headers=headers, json=payload, timeout=30, retries=0)
     if r.status_code == 401:
         # 토큰 만료/스코프 미부여/다른 계정 문제
         raise requests.HTTPError(f"401 Unauthorized: 토큰 만료 또는 권한(메일 전송) 미동의 가능성. endpoint={url}", response=r)
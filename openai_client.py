@@ -1,11 +1,17 @@
 
 # openai_client.py
-import requests
+import asyncio
+import json
+import http_client
+import aio_http
 from config import CONFIG
+from embed_cache import get_embedding_cache, cache_key
+from embed_batcher import embed_in_batches, aembed_in_batches
 
 API_VERSION = "2024-10-21"
 
-def azure_openai_chat(messages, temperature: float = 0.2, max_tokens: int = 800) -> str:
+def _chat_request(messages, temperature: float, max_tokens: int, stream: bool = False):
+    """azure_openai_chat 동기/비동기 공용 요청 (url, headers, payload)"""
     url = f"{CONFIG['AZURE_OPENAI_ENDPOINT']}/openai/deployments/{CONFIG['AZURE_OPENAI_DEPLOYMENT']}/chat/completions?api-version=2025-01-01-preview"
     headers = {
         "api-key": CONFIG["AZURE_OPENAI_API_KEY"],
@@ -15,18 +21,65 @@ def azure_openai_chat(messages, temperature: float = 0.2, max_tokens: int = 800)
         "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens,
-        "stream": False
+        "stream": stream
     }
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
+    return url, headers, payload
+
+def azure_openai_chat(messages, temperature: float = 0.2, max_tokens: int = 800) -> str:
+    url, headers, payload = _chat_request(messages, temperature, max_tokens)
+    r = http_client.post(url, headers=headers, json=payload, timeout=60)
     r.raise_for_status()
     data = r.json()
     return data["choices"][0]["message"]["content"]
 
+def iter_sse_deltas(r):
+    """
+    chat/completions stream=True 응답(SSE) → 텍스트 조각 제너레이터.
+    'data: {...}' 줄의 choices[0].delta.content만 내보내고 '[DONE]'에서 종료.
+    """
+    # SSE는 charset 없이 오면 requests가 ISO-8859-1로 디코드해 한글이 깨짐 → 줄 단위 bytes를 UTF-8로
+    for raw in r.iter_lines():
+        line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        for choice in chunk.get("choices") or []:
+            piece = (choice.get("delta") or {}).get("content")
+            if piece:
+                yield piece
+
+def _stream_chat(url: str, headers: dict, body: dict, timeout: int = 60):
+    """스트리밍 요청 공용: 재시도는 첫 바이트 전까지만(http_client), 이후 조각을 그대로 전달"""
+    body = dict(body, stream=True)
+    r = http_client.post(url, headers=headers, json=body, timeout=timeout, stream=True)
+    try:
+        r.raise_for_status()
+        yield from iter_sse_deltas(r)
+    finally:
+        r.close()
+
+def azure_openai_chat_stream(messages, temperature: float = 0.2, max_tokens: int = 800):
+    """azure_openai_chat의 스트리밍 버전 (텍스트 조각 제너레이터)"""
+    url, headers, payload = _chat_request(messages, temperature, max_tokens, stream=True)
+    yield from _stream_chat(url, headers, payload, timeout=60)
+
+async def aazure_openai_chat(messages, temperature: float = 0.2, max_tokens: int = 800) -> str:
+    url, headers, payload = _chat_request(messages, temperature, max_tokens)
+    r = await aio_http.apost(url, headers=headers, json=payload, timeout=60)
+    aio_http.raise_for_status(r, "Azure OpenAI chat ")
+    return r.json()["choices"][0]["message"]["content"]
+
 def azure_openai_embed(text: str, embedding_deployment: str = "text-embedding-3-large"):
     url = f"{CONFIG['AZURE_OPENAI_ENDPOINT']}/openai/deployments/{embedding_deployment}/embeddings?api-version=2025-01-01-preview"
     headers = {"api-key": CONFIG["AZURE_OPENAI_API_KEY"], "Content-Type": "application/json"}
     payload = {"input": text}
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
+    r = http_client.post(url, headers=headers, json=payload, timeout=60)
     r.raise_for_status()
     data = r.json()
     return data["data"][0]["embedding"]
@@ -61,23 +114,30 @@ def _aoai_headers():
         "Content-Type": "application/json",
     }
 
-def run_audit_with_azure_openai(text: str, doc_type: str) -> str:
-    """
-    (기존) 감사 리포트 생성 함수가 이미 있다면 유지하세요.
-    이건 예시 시그니처입니다.
-    """
-    url = _aoai_url(CONFIG["AZURE_OPENAI_DEPLOYMENT"])
-    body = {
+def _audit_body(text: str, doc_type: str) -> dict:
+    return {
         "messages": [
             {"role": "system", "content": f"You are an expert reviewer for {doc_type}."},
             {"role": "user", "content": f"다음 문서를 검토하고 모호성/충돌/누락을 조목조목 지적해줘.\n\n{text}"}
         ],
         "temperature": 0.2,
     }
-    r = requests.post(url, headers=_aoai_headers(), json=body, timeout=60)
+
+def run_audit_with_azure_openai(text: str, doc_type: str) -> str:
+    """
+    (기존) 감사 리포트 생성 함수가 이미 있다면 유지하세요.
+    이건 예시 시그니처입니다.
+    """
+    url = _aoai_url(CONFIG["AZURE_OPENAI_DEPLOYMENT"])
+    r = http_client.post(url, headers=_aoai_headers(), json=_audit_body(text, doc_type), timeout=60)
     r.raise_for_status()
     return r.json()["choices"][0]["message"]["content"]
 
+def run_audit_with_azure_openai_stream(text: str, doc_type: str):
+    """감사 리포트 스트리밍 버전 (텍스트 조각 제너레이터)"""
+    url = _aoai_url(CONFIG["AZURE_OPENAI_DEPLOYMENT"])
+    yield from _stream_chat(url, _aoai_headers(), _audit_body(text, doc_type), timeout=60)
+
 def refine_document_with_azure_openai(original_text: str,
                                       audit_report: str,
                                       tone: str = "formal",
@@ -88,6 +148,22 @@ def refine_document_with_azure_openai(original_text: str,
     output_format: markdown | plain | rst 등 (MD 권장)
     """
     url = _aoai_url(CONFIG["AZURE_OPENAI_DEPLOYMENT"])
+    body = _refine_body(original_text, audit_report, tone, length, output_format)
+    r = http_client.post(url, headers=_aoai_headers(), json=body, timeout=120)
+    r.raise_for_status()
+    return r.json()["choices"][0]["message"]["content"]
+
+def refine_document_with_azure_openai_stream(original_text: str,
+                                             audit_report: str,
+                                             tone: str = "formal",
+                                             length: str = "concise",
+                                             output_format: str = "markdown"):
+    """재작성 스트리밍 버전 (텍스트 조각 제너레이터)"""
+    url = _aoai_url(CONFIG["AZURE_OPENAI_DEPLOYMENT"])
+    body = _refine_body(original_text, audit_report, tone, length, output_format)
+    yield from _stream_chat(url, _aoai_headers(), body, timeout=120)
+
+def _refine_body(original_text: str, audit_report: str, tone: str, length: str, output_format: str) -> dict:
     sys = (
         "You are a senior technical editor. "
         "Rewrite the document by FIXING issues referenced in the audit report. "
@@ -99,30 +175,88 @@ def refine_document_with_azure_openai(original_text: str,
         f"- Tone: {tone}\n- Length preference: {length}\n- Output format: {output_format}\n\n"
         f"[Audit Report]\n{audit_report}\n\n[Original Document]\n{original_text}"
     )
-    body = {
+    return {
         "messages": [
             {"role": "system", "content": sys},
             {"role": "user", "content": usr}
         ],
         "temperature": 0.2,
     }
-    r = requests.post(url, headers=_aoai_headers(), json=body, timeout=120)
-    r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"]
 
 
+def _plan_cached(texts):
+    """
+    캐시 조회 → (cache, keys, found, missing{key: text})
+    같은 배치 안의 중복 텍스트도 한 번만 요청하도록 missing은 key 기준으로 합침.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        keys = [str(i) for i in range(len(texts))]
+        return None, keys, {}, dict(zip(keys, texts))
+
+    dep = CONFIG["AZURE_OPENAI_EMBED_DEPLOYMENT"]
+    dim = CONFIG.get("AZURE_OPENAI_EMBED_DIM", "")
+    keys = [cache_key(dep, dim, t) for t in texts]
+    found = cache.get_many(keys)
+    missing = {}
+    for k, t in zip(keys, texts):
+        if k not in found and k not in missing:
+            missing[k] = t
+    return cache, keys, found, missing
+
+def _merge_cached(cache, keys, found, missing, vecs):
+    fresh = dict(zip(missing.keys(), vecs))
+    if cache is not None and fresh:
+        cache.put_many(fresh)
+    found.update(fresh)
+    return [found[k] for k in keys]
+
 def get_embeddings(texts):
     """
     texts: list[str] -> list[float list]
-    Azure OpenAI /embeddings 호출
+    임베딩 캐시(embed_cache)에 없는 텍스트만 Azure OpenAI /embeddings 호출
     """
+    cache, keys, found, missing = _plan_cached(texts)
+    vecs = _request_embeddings(list(missing.values())) if missing else []
+    return _merge_cached(cache, keys, found, missing, vecs)
+
+async def aget_embeddings(texts):
+    """get_embeddings의 비동기 버전 (캐시 I/O는 스레드, 요청은 공용 루프에서 동시 실행)"""
+    cache, keys, found, missing = await asyncio.to_thread(_plan_cached, texts)
+    vecs = await aembed_in_batches(list(missing.values()), _apost_embeddings) if missing else []
+    return await asyncio.to_thread(_merge_cached, cache, keys, found, missing, vecs)
+
+def _request_embeddings(texts):
+    """
+    texts: list[str] -> list[float list]
+    토큰 예산/항목 수 기준으로 요청을 패킹해 동시 호출 (embed_batcher)
+    """
+    return embed_in_batches(list(texts), _post_embeddings)
+
+def _embeddings_request(texts):
     endpoint = CONFIG["AZURE_OPENAI_ENDPOINT"].rstrip("/")
     dep = CONFIG["AZURE_OPENAI_EMBED_DEPLOYMENT"]
     key = CONFIG["AZURE_OPENAI_API_KEY"]
     url = f"{endpoint}/openai/deployments/{dep}/embeddings?api-version=2024-02-15-preview"
     headers = {"api-key": key, "Content-Type": "application/json"}
-    payload = {"input": texts}
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
+    return url, headers, {"input": texts}
+
+def _parse_embeddings(data):
+    # 응답 순서가 입력 순서와 다를 수 있어 index 기준 정렬
+    return [d["embedding"] for d in sorted(data["data"], key=lambda d: d.get("index", 0))]
+
+def _post_embeddings(texts):
+    """
+    texts: list[str] -> list[float list]
+    Azure OpenAI /embeddings 단일 호출
+    """
+    url, headers, payload = _embeddings_request(texts)
+    r = http_client.post(url, headers=headers, json=payload, timeout=60)
     r.raise_for_status()
-    data = r.json()
-    return [d["embedding"] for d in data["data"]]
\ No newline at end of file
+    return _parse_embeddings(r.json())
+
+async def _apost_embeddings(texts):
+    url, headers, payload = _embeddings_request(texts)
+    r = await aio_http.apost(url, headers=headers, json=payload, timeout=60)
+    aio_http.raise_for_status(r, "Azure OpenAI embeddings ")
+    return _parse_embeddings(r.json())
@@ -10,7 +10,7 @@ from owners_registry import get_owner
 from notifier import notify_owner
 
 # Search 보조: 오래된 문서 리포트 (DateTime 문자열 정렬 기반 – PoC)
-import requests
+import http_client
 def _search_hdr():
     return {"Content-Type":"application/json", "api-key": CONFIG["SEARCH_API_KEY"]}
 
@@ -27,7 +27,7 @@ def find_stale_docs_by_order(top: int = 50) -> List[Dict]:
         "queryType": "simple",
         "orderby": "lastModified asc"
     }
-    r = requests.post(url, headers=_search_hdr(), json=body, timeout=30)
+    r = http_client.post(url, headers=_search_hdr(), json=body, timeout=30, idempotent=True)
     r.raise_for_status()
     return r.json().get("value", [])
 
@@ -1,18 +1,196 @@
-
 # pii.py – simple regex PII (PoC). For production, use Microsoft Purview / DLP.
+import math
 import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from config import CONFIG
 
+# 모든 반복에 상한을 두고 시작 위치를 단어 경계로 고정 → 시도 위치마다 비용이 상수라 전체가 선형.
 PII_PATTERNS = {
-    "Email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
-    "Korean SSN-like": r"\b\d{6}-\d{7}\b",
-    "Card Number-like": r"\b(?:\d[ -]*?){13,16}\b",
-    "API Key-like": r"\b[A-Za-z0-9_\-]{24,}\b",
+    "Email": r"(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63}){0,8}\.[A-Za-z]{2,24}\b",
+    "Korean SSN-like": r"\b\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])-[1-8]\d{6}\b",
+    "Card Number-like": r"\b\d(?:[ -]?\d){12,15}\b",
+    "API Key-like": r"\b[A-Za-z0-9_\-]{24,128}\b",
+}
+
+# 패턴 전체를 named group 하나의 정규식으로 미리 컴파일 → 텍스트를 한 번만 훑음.
+# 같은 위치에서 여러 패턴이 맞으면 위에 적힌 패턴이 우선 (Email이 API Key보다 먼저).
+_GROUP_NAMES = {f"p{i}": name for i, name in enumerate(PII_PATTERNS)}
+_COMBINED = re.compile("|".join(f"(?P<p{i}>{pat})" for i, pat in enumerate(PII_PATTERNS.values())))
+
+CHUNK_CHARS = 256 << 10  # 한 번에 훑는 길이 (이 단위로 시간 예산 확인)
+OVERLAP_CHARS = 512      # 청크 경계에 걸친 매치를 놓치지 않도록 다음 청크로 넘기는 꼬리 길이 (최장 패턴보다 길게)
+
+PiiHit = Tuple[str, int, int, str]   # (패턴 이름, 시작 오프셋, 끝 오프셋, 매치 문자열)
+
+
+# ----------------------------
+# 검증기 (정규식 매치 후 오탐 제거)
+# ----------------------------
+def _luhn_ok(value: str) -> bool:
+    digits = [int(c) for c in value if c.isdigit()]
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return len(digits) >= 13 and total % 10 == 0
+
+
+_SSN_WEIGHTS = (2, 3, 4, 5, 6, 7, 8, 9, 2, 3, 4, 5)
+
+
+def _ssn_ok(value: str) -> bool:
+    """
+    날짜/성별 자리는 패턴에서 검증. PII_SSN_CHECKSUM=true면 끝자리 검증번호까지 확인.
+    2020-10 이후 발급 번호는 뒷자리가 무작위라 검증번호가 맞지 않으므로 기본은 끔.
+    """
+    if str(CONFIG.get("PII_SSN_CHECKSUM", "false")).lower() not in ("1", "true", "yes"):
+        return True
+    digits = [int(c) for c in value if c.isdigit()]
+    check = (11 - sum(d * w for d, w in zip(digits, _SSN_WEIGHTS)) % 11) % 10
+    return check == digits[-1]
+
+
+def _entropy(value: str) -> float:
+    n = len(value)
+    return -sum(c / n * math.log2(c / n) for c in Counter(value).values())
+
+
+def _api_key_ok(value: str) -> bool:
+    """긴 식별자/단어 조합 제외: 영문+숫자 혼합 + 문자 엔트로피(bits/char) 기준 이상"""
+    has_digit = any(c.isdigit() for c in value)
+    has_alpha = any(c.isalpha() for c in value)
+    min_bits = float(CONFIG.get("PII_APIKEY_MIN_ENTROPY", 3.5))
+    return has_digit and has_alpha and _entropy(value) >= min_bits
+
+
+_VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    "Korean SSN-like": _ssn_ok,
+    "Card Number-like": _luhn_ok,
+    "API Key-like": _api_key_ok,
 }
 
+
+# ----------------------------
+# 메트릭
+# ----------------------------
+_METRICS = {"docs": 0, "chars": 0, "hits": 0, "rejected": 0, "truncated": 0, "seconds": 0.0}
+_METRICS_LOCK = threading.Lock()
+
+
+def _metric(**inc):
+    with _METRICS_LOCK:
+        for k, v in inc.items():
+            _METRICS[k] += v
+
+
+def get_pii_metrics() -> Dict:
+    """{docs, chars, hits, rejected(검증 탈락), truncated(시간 예산 초과), seconds} 누적 스냅샷"""
+    with _METRICS_LOCK:
+        return {**_METRICS, "seconds": round(_METRICS["seconds"], 3)}
+
+
+# ----------------------------
+# 스캔
+# ----------------------------
+def _pieces(text: Union[str, Iterable[str]], chunk_chars: int) -> Iterable[str]:
+    if isinstance(text, str):
+        return (text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars))
+    return text
+
+
+def _scan_buffer(buf: str, base: int, stop: Optional[int], stats: Dict) -> Tuple[List[PiiHit], int]:
+    """
+    buf에서 stop 이전에 끝나는 매치를 검증해 모음 → (hits, 다음 버퍼 시작 위치).
+    stop에 걸친 매치가 있으면 그 시작 위치부터 다음 버퍼에서 통째로 다시 잡는다.
+    """
+    hits: List[PiiHit] = []
+    for m in _COMBINED.finditer(buf):
+        if stop is not None and m.end() > stop:
+            return hits, min(stop, m.start())
+        name = _GROUP_NAMES[m.lastgroup]
+        check = _VALIDATORS.get(name)
+        if check is not None and not check(m.group()):
+            stats["rejected"] += 1
+            continue
+        hits.append((name, base + m.start(), base + m.end(), m.group()))
+    return hits, len(buf) if stop is None else stop
+
+
+def iter_pii(text: Union[str, Iterable[str]], chunk_chars: int = CHUNK_CHARS,
+             budget_sec: Optional[float] = None, stats: Optional[Dict] = None,
+             clock: Callable[[], float] = time.perf_counter) -> Iterator[PiiHit]:
+    """
+    검증을 통과한 PII 매치를 문서 앞에서부터 순서대로 반환 (오프셋은 전체 텍스트 기준).
+    문자열도 문자열 조각의 iterable(페이지/섹션 생성기 등)도 chunk_chars씩 모아 스캔하고,
+    꼬리(마지막 공백 이후, 최소 OVERLAP_CHARS)는 다음 조각과 이어 붙여 다시 훑는다.
+    budget_sec를 넘기면 청크 경계에서 중단(시간은 clock 기준). stats가 주어지면 scanned_chars/rejected/truncated를 채움.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(scanned_chars=0, rejected=0, truncated=False)
+    deadline = clock() + budget_sec if budget_sec else None
+
+    buf, base = "", 0
+    for piece in _pieces(text, chunk_chars):
+        buf += piece or ""
+        if len(buf) < chunk_chars:
+            continue
+        cut = len(buf) - OVERLAP_CHARS
+        ws = max(buf.rfind(" ", 0, cut), buf.rfind("\n", 0, cut))
+        hits, keep = _scan_buffer(buf, base, ws if ws > 0 else cut, stats)
+        yield from hits
+        buf, base = buf[keep:], base + keep
+        stats["scanned_chars"] = base
+        if deadline is not None and clock() > deadline:
+            stats["truncated"] = True
+            return
+    hits, _ = _scan_buffer(buf, base, None, stats)
+    yield from hits
+    stats["scanned_chars"] = base + len(buf)
+
+
+def scan_pii_detailed(text: Union[str, Iterable[str]], max_values: int = 20, max_offsets: int = 100,
+                      budget_sec: Optional[float] = None, clock: Callable[[], float] = time.perf_counter) -> Dict:
+    """
+    한 번의 스캔으로 패턴별 건수/대표값/오프셋을 모음.
+    budget_sec 기본값은 CONFIG PII_TIME_BUDGET_SEC (문서당 상한, 0이면 무제한).
+    반환: {"counts": {name: n}, "values": {name: [고유값…]}, "offsets": {name: [(start, end)…]},
+           "truncated": bool, "scanned_chars": int, "rejected": int, "elapsed_ms": float}
+    """
+    if budget_sec is None:
+        budget_sec = float(CONFIG.get("PII_TIME_BUDGET_SEC", 2.0))
+    t0 = clock()
+    stats: Dict = {}
+    counts: Dict[str, int] = {}
+    values: Dict[str, List[str]] = {}
+    offsets: Dict[str, List[Tuple[int, int]]] = {}
+    for name, start, end, value in iter_pii(text, budget_sec=budget_sec or None, stats=stats, clock=clock):
+        counts[name] = counts.get(name, 0) + 1
+        vs = values.setdefault(name, [])
+        if len(vs) < max_values and value not in vs:
+            vs.append(value)
+        offs = offsets.setdefault(name, [])
+        if len(offs) < max_offsets:
+            offs.append((start, end))
+    elapsed = clock() - t0
+    _metric(docs=1, chars=stats["scanned_chars"], hits=sum(counts.values()), rejected=stats["rejected"],
+            truncated=int(stats["truncated"]), seconds=elapsed)
+    return {"counts": counts, "values": values, "offsets": offsets,
+            "truncated": stats["truncated"], "scanned_chars": stats["scanned_chars"],
+            "rejected": stats["rejected"], "elapsed_ms": round(elapsed * 1000, 1)}
+
+
 def scan_pii(text: str):
-    out = {}
-    for name, pat in PII_PATTERNS.items():
-        hits = re.findall(pat, text)
-        if hits:
-            out[name] = list(set(hits))[:20]
-    return out
+    """{패턴 이름: 고유 매치 최대 20개} — 매치가 없는 패턴은 키 없음"""
+    return scan_pii_detailed(text or "", max_values=20, max_offsets=0)["values"]
+
+
+def scan_pii_batch(docs: Iterable[Dict], key: str = "content", id_key: str = "originalId") -> Dict[str, Dict]:
+    """문서 묶음 전체를 스캔 → {문서 id: scan_pii_detailed 결과}"""
+    return {d.get(id_key): scan_pii_detailed(d.get(key) or "") for d in docs}
@@ -6,7 +6,13 @@ import json
 import requests
 import streamlit as st
 import base64, re, requests, json
-from openai_client import get_embeddings 
+import asyncio
+import http_client
+import aio_http
+from openai_client import get_embeddings, aget_embeddings
+from chunker import build_chunk_records
+from local_vectors import get_local_vector_index
+from storage_logs import log_activity
 
 API_VERSIONS = [
     "2025-09-01",      # 최신 안정 (지원 시)
@@ -27,11 +33,11 @@ def _get_admin_headers():
     return h
 
 def _try_get(url):
-    r = requests.get(url, headers=_get_admin_headers(), timeout=30)
+    r = http_client.get(url, headers=_get_admin_headers(), timeout=30)
     return r
 
 def _try_put(url, payload):
-    r = requests.put(url, headers=_get_admin_headers(), data=json.dumps(payload), timeout=60)
+    r = http_client.put(url, headers=_get_admin_headers(), data=json.dumps(payload), timeout=60)
     return r
 
 def _raise_with_text(prefix: str, r: requests.Response):
@@ -188,12 +194,21 @@ def _base_url():
     idx = CONFIG["SEARCH_INDEX"]
     return f"{ep}/indexes('{idx}')/docs"
 
+def _parents_only_qs() -> str:
+    """청크 레코드가 있는 스키마면 부모 문서만 보도록 $filter 쿼리스트링 반환"""
+    try:
+        if "chunkIndex" in get_index_schema_fields():
+            return "&$filter=chunkIndex eq null"
+    except Exception:
+        pass
+    return ""
+
 def get_index_doc_count() -> int:
     """
-    인덱스의 전체 문서 수
+    인덱스의 전체 문서 수 (청크 레코드 제외)
     """
-    url = f"{_base_url()}?api-version={API_VERSION}&search=*&$count=true&$top=0"
-    r = requests.get(url, headers=_hdr(), timeout=30)
+    url = f"{_base_url()}?api-version={API_VERSION}&search=*&$count=true&$top=0{_parents_only_qs()}"
+    r = http_client.get(url, headers=_hdr(), timeout=30)
     r.raise_for_status()
     # $count=true일 때, count는 헤더가 아니라 본문 '@odata.count'에 들어옴
     data = r.json()
@@ -204,8 +219,8 @@ def get_recent_documents(top: int = 20) -> List[Dict]:
     최근 수정 문서 상위 N개 (lastModified 필드 기준)
     인덱스에 lastModified(Edm.String or DateTimeOffset) 필드가 있어야 함.
     """
-    url = f"{_base_url()}?api-version={API_VERSION}&search=*&$top={top}&$orderby=lastModified desc"
-    r = requests.get(url, headers=_hdr(), timeout=30)
+    url = f"{_base_url()}?api-version={API_VERSION}&search=*&$top={top}&$orderby=lastModified desc{_parents_only_qs()}"
+    r = http_client.get(url, headers=_hdr(), timeout=30)
     r.raise_for_status()
     hits = r.json().get("value", [])
     # 표준화 컬럼
@@ -225,8 +240,8 @@ def get_timeseries_counts(days: int = 12) -> List[Dict]:
     facet interval이 어려우면 클라이언트에서 상위 문서를 내려받아 day 단위로 그룹핑.
     """
     # 넉넉히 상위 1000건만 끌어와서 집계
-    url = f"{_base_url()}?api-version={API_VERSION}&search=*&$top=1000&$orderby=lastModified desc&$select=id,lastModified"
-    r = requests.get(url, headers=_hdr(), timeout=30)
+    url = f"{_base_url()}?api-version={API_VERSION}&search=*&$top=1000&$orderby=lastModified desc&$select=id,lastModified{_parents_only_qs()}"
+    r = http_client.get(url, headers=_hdr(), timeout=30)
     r.raise_for_status()
     vals = r.json().get("value", [])
     # day bucket
@@ -289,7 +304,10 @@ def create_index_if_missing():
                 "vectorSearchProfile": "vdb-hnsw"
             },
             {"name":"lastModified","type":"Edm.String","filterable":True,"sortable":True},
-            {"name":"views","type":"Edm.Int32","filterable":True,"sortable":True}
+            {"name":"views","type":"Edm.Int32","filterable":True,"sortable":True},
+            # 청크 레코드: 부모는 null, 청크는 0..n-1 (originalId로 부모와 연결)
+            {"name":"chunkIndex","type":"Edm.Int32","filterable":True,"sortable":True},
+            {"name":"chunkCount","type":"Edm.Int32","filterable":True}
         ],
         # ⬇️ 바뀐 포인트: profiles + algorithms 구성
         "vectorSearch": {
@@ -379,7 +397,7 @@ def upsert_documents(docs, allow_unsafe_keys=False):
         filtered["id"] = safe_id
         if "originalId" in fields: filtered.setdefault("originalId", original)
         value.append({"@search.action":"mergeOrUpload", **filtered})
-    r = requests.post(url, headers=_hdr(), json={"value": value}, timeout=60)
+    r = http_client.post(url, headers=_hdr(), json={"value": value}, timeout=60)
     if r.status_code >= 400:
         raise requests.HTTPError(r.text, response=r)
     return r.json()
@@ -424,63 +442,349 @@ def upsert_documents(docs, allow_unsafe_keys=False):
 def upsert_documents_with_embeddings(docs):
     """
     docs: [{id, name, content, ...}]  -> contentVector 채워 업서트
+    긴 문서는 청크 레코드(부모 originalId로 연결)까지 함께 업서트.
+    """
+    return upsert_embedded_documents(embed_documents(docs))
+
+def _normalized_mean(vectors):
+    dim = len(vectors[0])
+    mean = [sum(v[i] for v in vectors) / len(vectors) for i in range(dim)]
+    norm = sum(x * x for x in mean) ** 0.5 or 1.0
+    return [x / norm for x in mean]
+
+def embed_documents(docs, chunking: bool = True):
+    """
+    docs: [{id, name, content, ...}] -> contentVector가 채워진 업서트 레코드 목록 (업서트는 하지 않음)
+    일괄 인덱싱 파이프라인에서 임베딩/업서트 단계를 분리할 때 사용.
+    chunking=True이고 문서가 CHUNK_MAX_TOKENS를 넘으면 청크별로 임베딩해
+    [부모, 청크0, 청크1, ...]을 반환. 부모 벡터는 청크 벡터의 정규화 평균.
+    인덱스에 chunkIndex 필드가 없으면(청크 도입 전 생성된 인덱스) 청크 없이 통째로 임베딩.
     """
-    texts = [d.get("content","") for d in docs]
+    if chunking and "chunkIndex" not in get_index_schema_fields():
+        chunking = False  # 청크 레코드가 필드 없이 최상위 문서로 들어가 정리되지 않음
+    plans = []   # (doc, chunk_records)
+    texts = []
+    for d in docs:
+        chunks = build_chunk_records(d) if chunking else []
+        plans.append((d, chunks))
+        if chunks:
+            texts.extend(c["content"] for c in chunks)
+        else:
+            texts.append(d.get("content",""))
     vectors = get_embeddings(texts)  # 리스트[list[float]] 목록
     # 차원 검증 (로그/예외)
     expected = int(CONFIG["AZURE_OPENAI_EMBED_DIM"])
     for i, vec in enumerate(vectors):
         if len(vec) != expected:
             raise ValueError(
-                f"임베딩 차원 불일치: expected={expected}, got={len(vec)} (doc idx={i}, id={docs[i].get('id')})"
+                f"임베딩 차원 불일치: expected={expected}, got={len(vec)} (text idx={i})"
             )
     enriched = []
-    for d, vec in zip(docs, vectors):
+    pos = 0
+    for d, chunks in plans:
         dd = dict(d)
-        dd["contentVector"] = vec
-        enriched.append(dd)
-    return upsert_documents(enriched)
+        if chunks:
+            chunk_vecs = vectors[pos:pos + len(chunks)]
+            pos += len(chunks)
+            dd["contentVector"] = _normalized_mean(chunk_vecs)
+            dd["chunkCount"] = len(chunks)
+            enriched.append(dd)
+            for c, vec in zip(chunks, chunk_vecs):
+                cc = dict(c)
+                cc["contentVector"] = vec
+                enriched.append(cc)
+        else:
+            dd["contentVector"] = vectors[pos]
+            dd["chunkCount"] = 0
+            pos += 1
+            enriched.append(dd)
+    return enriched
+
+def upsert_embedded_documents(records):
+    """
+    embed_documents 결과 업서트 + 재인덱싱으로 줄어든 문서의 남은 청크 정리
+    (로컬 벡터 인덱스가 켜져 있으면 같은 벡터를 그대로 미러링)
+    """
+    res = upsert_documents(records)
+    keep = {r.get("originalId") or r.get("id"): r.get("chunkCount", 0)
+            for r in records if r.get("chunkIndex") is None}
+    if keep and "chunkIndex" in get_index_schema_fields():
+        _delete_stale_chunks(keep)
+    _mirror_local(records, keep)
+    return res
+
+def _mirror_local(records, keep_counts: Dict[str, int] = None):
+    """
+    업서트와 같은 안전키/originalId로 로컬 인덱스 반영 (실패해도 업서트 결과에는 영향 없음). 동기화된 인덱스만.
+    실패하면 미러가 어긋났으므로 synced를 해제하고 로그를 남김 → 재구축 전까지 Cognitive Search 사용.
+    """
+    local = get_local_vector_index()
+    if local is None or not local.is_synced():
+        return   # 재구축 전에는 아무도 읽지 않음 → 업서트 스레드에서 memmap/SQLite 쓰기·k-means 학습을 하지 않음
+    try:
+        rows = []
+        for r in records:
+            original = r.get("id") or r.get("name")
+            row = {f: r.get(f) for f in ("name", "source", "path", "lastModified", "chunkIndex", "contentVector")}
+            row["id"] = make_safe_key(original)
+            row["originalId"] = r.get("originalId") or original
+            rows.append(row)
+        local.upsert(rows)
+        if keep_counts:
+            local.trim_chunks(keep_counts)
+    except Exception as e:
+        try:
+            local.mark_synced(False)
+            log_activity("default", "LocalIndex", "ERROR", f"local vector mirror fail: {len(records)}건 · {e}")
+        except Exception:
+            pass
 
-# def vector_search(query_text: str, k: int = 5):
-#     """
-#     단순 텍스트 검색 기반 벡터 검색 (Text 기반)
-#     """
-#     ep = CONFIG["SEARCH_ENDPOINT"].rstrip("/")
-#     idx = CONFIG["SEARCH_INDEX"]
-#     key = CONFIG["SEARCH_API_KEY"]
+def _odata_str(v: str) -> str:
+    return "'" + str(v).replace("'", "''") + "'"
 
-#     url = f"{ep}/indexes('{idx}')/docs/search?api-version=2023-11-01"
-#     headers = {"Content-Type": "application/json", "api-key": key}
-#     payload = {
-#         "search": query_text,
-#         "queryType": "simple",
-#         "top": k,
-#         "select": "id,name,lastModified,views",
-#     }
-#     r = requests.post(url, headers=headers, json=payload)
-#     if r.status_code != 200:
-#         st.error(f"벡터 검색 실패: {r.text}")
-#         return []
-#     data = r.json().get("value", [])
-#     return [{"id": d.get("id"), "name": d.get("name"), "score": d.get("@search.score")} for d in data]
-# --- 벡터 검색 ---
-def vector_search(query_text: str, k: int = 5):
-    qvec = get_embeddings([query_text])[0]
+def _search_ids(filter_expr: str, page_size: int = 1000) -> List[str]:
+    """filter에 걸리는 문서 id 전부 (페이지 반복)"""
     ep, idx = _ep(), _idx()
     url = f"{ep}/indexes('{idx}')/docs/search?api-version={API_VERSION}"
+    ids, skip = [], 0
+    while skip <= 100000:
+        body = {"search": "*", "filter": filter_expr, "select": "id", "top": page_size, "skip": skip}
+        r = http_client.post(url, headers=_hdr(), json=body, timeout=60, idempotent=True)
+        r.raise_for_status()
+        vals = r.json().get("value", [])
+        ids.extend(v["id"] for v in vals if v.get("id"))
+        if len(vals) < page_size:
+            break
+        skip += page_size
+    return ids
+
+def _delete_stale_chunks(keep_counts: Dict[str, int]):
+    """{부모 원본ID: 유지할 청크 수} → chunkIndex >= 유지 수인 청크 삭제 (배치당 1회 조회)"""
+    expr = " or ".join(
+        f"(originalId eq {_odata_str(oid)} and chunkIndex ge {int(n)})" for oid, n in keep_counts.items()
+    )
+    stale = _search_ids(expr)
+    if stale:
+        _delete_by_ids(stale)
+
+def _delete_by_ids(ids: List[str]):
+    ep, idx = _ep(), _idx()
+    url = f"{ep}/indexes('{idx}')/docs/index?api-version={API_VERSION}"
+    for i in range(0, len(ids), 1000):
+        value = [{"@search.action": "delete", "id": x} for x in ids[i:i + 1000]]
+        r = http_client.post(url, headers=_hdr(), json={"value": value}, timeout=60, idempotent=True)
+        if r.status_code >= 400:
+            raise requests.HTTPError(r.text, response=r)
+
+# --- 삭제 ---
+def delete_documents(original_ids):
+    """
+    원본ID 목록에 해당하는 문서(및 연결된 청크)를 인덱스에서 삭제
+    (id는 업서트와 동일하게 안전키 변환)
+    """
+    original_ids = [o for o in original_ids if o]
+    ids = [make_safe_key(o) for o in original_ids]
+    if not ids:
+        return {"deleted": 0}
+    if "chunkIndex" in get_index_schema_fields():
+        for i in range(0, len(original_ids), 50):  # filter 길이 제한
+            expr = " or ".join(f"originalId eq {_odata_str(o)}" for o in original_ids[i:i + 50])
+            ids.extend(_search_ids(f"({expr}) and chunkIndex ne null"))
+    _delete_by_ids(ids)
+    local = get_local_vector_index()
+    if local is not None:
+        local.delete(original_ids)
+    return {"deleted": len(ids)}
+
+def get_indexed_last_modified(source: str, page_size: int = 1000) -> Dict[str, str]:
+    """
+    source별 {originalId: lastModified} 스냅샷 (증분 인덱싱의 매니페스트 대체용)
+    $skip 한도(100,000)까지 페이지 단위로 조회.
+    """
+    ep, idx = _ep(), _idx()
+    url = f"{ep}/indexes('{idx}')/docs/search?api-version={API_VERSION}"
+    out: Dict[str, str] = {}
+    skip = 0
+    while skip <= 100000:
+        body = {
+            "search": "*",
+            "filter": f"source eq '{source}'",
+            "select": "id,originalId,lastModified",
+            "top": page_size,
+            "skip": skip,
+        }
+        r = http_client.post(url, headers=_hdr(), json=body, timeout=60, idempotent=True)
+        r.raise_for_status()
+        vals = r.json().get("value", [])
+        for v in vals:
+            oid = v.get("originalId") or v.get("id")
+            if oid:
+                out[oid] = v.get("lastModified")
+        if len(vals) < page_size:
+            break
+        skip += page_size
+    return out
+
+# --- 벡터 검색 ---
+def _vector_search_request(qvec, k: int, aggregate_parents: bool, oversample, extra_select: str = None):
+    """vector_search 동기/비동기 공용 요청 (url, body)"""
+    url = f"{_ep()}/indexes('{_idx()}')/docs/search?api-version={API_VERSION}"
+    select = "id,originalId,name,source,path,lastModified"
+    if extra_select:
+        select += "," + extra_select
+    fetch_k = k
+    if aggregate_parents:
+        oversample = int(oversample or CONFIG.get("CHUNK_SEARCH_OVERSAMPLE", 4))
+        fetch_k = k * max(1, oversample)
+        if "chunkIndex" in get_index_schema_fields():
+            select += ",chunkIndex"
     body = {
       "count": True,
-      "select": "id,originalId,name,source,path,lastModified",
+      "select": select,
+      "top": fetch_k,
       "vectorQueries": [
-        {"kind":"vector", "vector": qvec, "exhaustive": False, "k": k, "fields": "contentVector"}
+        {"kind":"vector", "vector": qvec, "exhaustive": False, "k": fetch_k, "fields": "contentVector"}
       ]
     }
-    r = requests.post(url, headers=_hdr(), json=body, timeout=60)
+    return url, body
+
+def _vector_search_result(r, k: int, aggregate_parents: bool):
     if r.status_code >= 400:
         try: st.error(f"[vector_search] {r.status_code} {r.text}")
         except Exception: pass
-        r.raise_for_status()
-    return r.json()
+        aio_http.raise_for_status(r, "[vector_search] ")
+    data = r.json()
+    if aggregate_parents:
+        data["value"] = aggregate_chunk_hits(data.get("value", []), k)
+    return data
+
+def _use_local(use_local, select) -> bool:
+    # 로컬 인덱스는 메타만 보관 → 본문 등 추가 필드가 필요하면 Cognitive Search로
+    if use_local is None:
+        use_local = str(CONFIG.get("LOCAL_VECTOR_SEARCH", "false")).lower() in ("1", "true", "yes")
+    return bool(use_local) and not select
+
+def _local_vector_search(qvec, k: int, aggregate_parents: bool, oversample):
+    """로컬 인덱스 top-k (재구축 전·미러 실패 후/차원이 다르거나/오류면 None → Cognitive Search로 대체)"""
+    local = get_local_vector_index()
+    if local is None or not local.ready(len(qvec)):
+        return None
+    fetch_k = k * max(1, int(oversample or CONFIG.get("CHUNK_SEARCH_OVERSAMPLE", 4))) if aggregate_parents else k
+    try:
+        hits = local.search(qvec, fetch_k)
+    except Exception:
+        return None
+    if not hits:
+        return None
+    if aggregate_parents:
+        hits = aggregate_chunk_hits(hits, k)
+    return {"@odata.count": len(hits), "value": hits, "@local": True}
+
+def vector_search(query_text: str, k: int = 5, aggregate_parents: bool = False, oversample: int = None,
+                  select: str = None, use_local: bool = None):
+    """
+    contentVector 기반 top-k 검색.
+    aggregate_parents=True면 청크 히트를 부모 문서(originalId) 단위로 모아
+    부모별 최고 점수 순 top-k 반환 (각 항목에 matchedChunks 포함).
+    select: 추가로 받을 필드 (예: "content" — 본문을 별도 조회 없이 한 번에)
+    use_local: 로컬 벡터 인덱스 우선 (None이면 CONFIG LOCAL_VECTOR_SEARCH). 결과에 "@local": True 표시
+    """
+    qvec = get_embeddings([query_text])[0]
+    if _use_local(use_local, select):
+        data = _local_vector_search(qvec, k, aggregate_parents, oversample)
+        if data is not None:
+            return data
+    url, body = _vector_search_request(qvec, k, aggregate_parents, oversample, select)
+    r = http_client.post(url, headers=_hdr(), json=body, timeout=60, idempotent=True)
+    return _vector_search_result(r, k, aggregate_parents)
+
+async def avector_search(query_text: str, k: int = 5, aggregate_parents: bool = False, oversample: int = None,
+                         select: str = None, use_local: bool = None):
+    """vector_search의 비동기 버전 (스키마 조회만 스레드에서)"""
+    qvec = (await aget_embeddings([query_text]))[0]
+    if _use_local(use_local, select):
+        data = _local_vector_search(qvec, k, aggregate_parents, oversample)
+        if data is not None:
+            return data
+    url, body = await asyncio.to_thread(_vector_search_request, qvec, k, aggregate_parents, oversample, select)
+    r = await aio_http.apost(url, headers=_hdr(), json=body, timeout=60, idempotent=True)
+    return _vector_search_result(r, k, aggregate_parents)
+
+def iter_index_records(fields, parents_only: bool = False, page_size: int = 500):
+    """
+    인덱스 레코드를 id 순 keyset 페이지(id gt 마지막 id)로 반환 — $skip 한도(100,000) 없이 전체 순회.
+    fields: 받을 필드 (스키마에 없는 필드는 제외), parents_only: 청크 레코드 제외
+    """
+    url = f"{_ep()}/indexes('{_idx()}')/docs/search?api-version={API_VERSION}"
+    schema = get_index_schema_fields()
+    select = ",".join(f for f in dict.fromkeys(["id", *fields]) if f in schema)
+    base_filter = "chunkIndex eq null" if parents_only and "chunkIndex" in schema else None
+    last = None
+    while True:
+        filters = [f for f in (base_filter, f"id gt {_odata_str(last)}" if last else None) if f]
+        body = {"search": "*", "select": select, "top": page_size, "orderby": "id asc"}
+        if filters:
+            body["filter"] = " and ".join(filters)
+        r = http_client.post(url, headers=_hdr(), json=body, timeout=120, idempotent=True)
+        aio_http.raise_for_status(r, "[iter_index_records] ")
+        vals = r.json().get("value", [])
+        if vals:
+            yield vals
+            last = vals[-1]["id"]
+        if len(vals) < page_size:
+            break
+
+def iter_indexed_vectors(page_size: int = 500, parents_only: bool = False):
+    """인덱스의 (메타 + contentVector) 레코드 페이지"""
+    yield from iter_index_records(
+        ("originalId", "name", "source", "path", "lastModified", "chunkIndex", "contentVector"),
+        parents_only=parents_only, page_size=page_size,
+    )
+
+def rebuild_local_vector_index() -> int:
+    """
+    로컬 벡터 인덱스를 비우고 Cognitive Search의 contentVector로 다시 채움 → 반영 건수
+    끝까지 채운 뒤에만 synced로 표시 (도중 실패 시 미동기 상태로 남아 검색은 Cognitive Search로).
+    """
+    local = get_local_vector_index()
+    if local is None:
+        raise RuntimeError("로컬 벡터 인덱스가 비활성입니다 (numpy 필요 · LOCAL_VECTOR_INDEX_ENABLED).")
+    local.reset()
+    n = 0
+    for page in iter_indexed_vectors():
+        n += local.upsert(page)   # 인덱스 id가 이미 안전키
+    local.mark_synced(True)
+    return n
+
+def aggregate_chunk_hits(hits: List[Dict], k: int) -> List[Dict]:
+    """
+    청크/부모 히트 → 부모 문서 단위 top-k (점수는 부모별 최댓값)
+    히트에 content가 있으면 청크 본문은 passages[{chunkIndex, score, content}]로,
+    부모 히트의 본문만 content로 남긴다.
+    """
+    parents: Dict[str, Dict] = {}
+    for h in hits:
+        pid = h.get("originalId") or h.get("id")
+        score = h.get("@search.score") or 0.0
+        is_chunk = h.get("chunkIndex") is not None
+        p = parents.get(pid)
+        if p is None:
+            p = {f: v for f, v in h.items() if f not in ("chunkIndex", "content")}
+            p["id"] = make_safe_key(pid)
+            p["matchedChunks"] = []
+            parents[pid] = p
+        elif score > (p.get("@search.score") or 0.0):
+            p["@search.score"] = score
+        if is_chunk:
+            p["matchedChunks"].append(h["chunkIndex"])
+            if "content" in h:
+                p.setdefault("passages", []).append(
+                    {"chunkIndex": h["chunkIndex"], "score": score, "content": h.get("content") or ""}
+                )
+        elif "content" in h:
+            p["content"] = h.get("content") or ""
+    ranked = sorted(parents.values(), key=lambda x: x.get("@search.score") or 0.0, reverse=True)
+    return ranked[:k]
 
 def show_search_guidance(st_container=None):
     """
@@ -502,18 +806,60 @@ def show_search_guidance(st_container=None):
     ```
     """)
 
+def _document_by_id_url(doc_id: str) -> str:
+    ep = CONFIG["SEARCH_ENDPOINT"].rstrip("/")
+    idx = CONFIG["SEARCH_INDEX"]
+    return f"{ep}/indexes('{idx}')/docs?api-version={API_VERSION}&$filter=id eq '{doc_id}'&$top=1"
+
 def get_document_by_id(doc_id: str) -> dict:
     """
     인덱스에서 특정 id의 문서 단건 조회 (content 포함)
     """
-    ep = CONFIG["SEARCH_ENDPOINT"].rstrip("/")
-    idx = CONFIG["SEARCH_INDEX"]
-    url = f"{ep}/indexes('{idx}')/docs?api-version={API_VERSION}&$filter=id eq '{doc_id}'&$top=1"
-    r = requests.get(url, headers=_hdr(), timeout=30)
+    r = http_client.get(_document_by_id_url(doc_id), headers=_hdr(), timeout=30)
     r.raise_for_status()
     vals = r.json().get("value", [])
     return vals[0] if vals else {}
 
+async def aget_document_by_id(doc_id: str) -> dict:
+    r = await aio_http.aget(_document_by_id_url(doc_id), headers=_hdr(), timeout=30)
+    aio_http.raise_for_status(r, "[get_document_by_id] ")
+    vals = r.json().get("value", [])
+    return vals[0] if vals else {}
+
+def _documents_by_ids_request(ids: List[str], select: str):
+    url = f"{_ep()}/indexes('{_idx()}')/docs/search?api-version={API_VERSION}"
+    # 안전키는 [A-Za-z0-9_-=]라 ',' 구분자와 충돌 없음
+    body = {
+        "search": "*",
+        "filter": f"search.in(id, {_odata_str(','.join(ids))}, ',')",
+        "select": select,
+        "top": len(ids),
+    }
+    return url, body
+
+def get_documents_by_ids(ids: List[str], select: str = "id,name,content,lastModified") -> List[Dict]:
+    """
+    여러 id 문서를 search.in 필터 한 번으로 일괄 조회 (id 목록 순서 유지, 없는 id는 제외)
+    """
+    ids = [i for i in dict.fromkeys(ids) if i]
+    if not ids:
+        return []
+    url, body = _documents_by_ids_request(ids, select)
+    r = http_client.post(url, headers=_hdr(), json=body, timeout=60, idempotent=True)
+    r.raise_for_status()
+    by_id = {v.get("id"): v for v in r.json().get("value", [])}
+    return [by_id[i] for i in ids if i in by_id]
+
+async def aget_documents_by_ids(ids: List[str], select: str = "id,name,content,lastModified") -> List[Dict]:
+    ids = [i for i in dict.fromkeys(ids) if i]
+    if not ids:
+        return []
+    url, body = _documents_by_ids_request(ids, select)
+    r = await aio_http.apost(url, headers=_hdr(), json=body, timeout=60, idempotent=True)
+    aio_http.raise_for_status(r, "[get_documents_by_ids] ")
+    by_id = {v.get("id"): v for v in r.json().get("value", [])}
+    return [by_id[i] for i in ids if i in by_id]
+
 def vector_search_by_text(text: str, k: int = 5, select: str = "id,name,lastModified,views") -> List[Dict]:
     """
     텍스트를 그대로 쿼리해 상위 k개 유사 문서를 반환
@@ -523,17 +869,22 @@ def vector_search_by_text(text: str, k: int = 5, select: str = "id,name,lastModi
     idx = CONFIG["SEARCH_INDEX"]
     url = f"{ep}/indexes('{idx}')/docs/search?api-version={API_VERSION}"
     payload = {"search": text[:3000], "queryType": "simple", "top": k, "select": select}
-    r = requests.post(url, headers=_hdr(), json=payload, timeout=30)
+    if "chunkIndex" in get_index_schema_fields():
+        payload["filter"] = "chunkIndex eq null"   # 청크 레코드가 같은 문서로 반복되지 않도록 부모만
+    r = http_client.post(url, headers=_hdr(), json=payload, timeout=30, idempotent=True)
     r.raise_for_status()
     vals = r.json().get("value", [])
     # 정규화
     out = []
     for v in vals:
-        out.append({
+        item = {
             "id": v.get("id"),
             "name": v.get("name"),
             "lastModified": v.get("lastModified"),
             "views": v.get("views"),
             "score": v.get("@search.score"),
-        })
+        }
+        if "content" in v:
+            item["content"] = v.get("content") or ""
+        out.append(item)
     return out
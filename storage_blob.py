@@ -1,52 +1,156 @@
 # storage_blob.py (보강)
-from typing import Optional
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobPrefix, BlobServiceClient, ContainerClient, ContentSettings
 from config import CONFIG
 import io
+import tempfile
+import threading
 
-def _svc():
+# 계정/컨테이너별 클라이언트 재사용 (SDK 클라이언트는 스레드 안전 · 내부 연결 풀 공유)
+_SERVICES: Dict[str, BlobServiceClient] = {}
+_CONTAINERS: Dict[Tuple[str, str], ContainerClient] = {}
+_KNOWN_CONTAINERS: Set[Tuple[str, str]] = set()   # 이 프로세스에서 존재 확인/생성 완료
+_CLIENTS_LOCK = threading.Lock()
+
+def _service() -> BlobServiceClient:
     account = CONFIG["AZURE_STORAGE_ACCOUNT"]
-    key = CONFIG["AZURE_STORAGE_KEY"]
-    container = CONFIG.get("AZURE_STORAGE_CONTAINER", "docspace")
-    conn = f"DefaultEndpointsProtocol=https;AccountName={account};AccountKey={key};EndpointSuffix=core.windows.net"
-    svc = BlobServiceClient.from_connection_string(conn)
-    return svc, svc.get_container_client(container)
+    with _CLIENTS_LOCK:
+        svc = _SERVICES.get(account)
+        if svc is None:
+            key = CONFIG["AZURE_STORAGE_KEY"]
+            conn = f"DefaultEndpointsProtocol=https;AccountName={account};AccountKey={key};EndpointSuffix=core.windows.net"
+            svc = BlobServiceClient.from_connection_string(conn)
+            _SERVICES[account] = svc
+        return svc
+
+def _container(name: Optional[str] = None, ensure: bool = False) -> ContainerClient:
+    """
+    컨테이너 클라이언트 (캐시). ensure=True면 프로세스당 한 번만 create_container 시도.
+    """
+    svc = _service()
+    name = name or CONFIG.get("AZURE_STORAGE_CONTAINER") or "docspace"
+    key = (svc.account_name, name)
+    with _CLIENTS_LOCK:
+        cc = _CONTAINERS.get(key)
+        if cc is None:
+            cc = svc.get_container_client(name)
+            _CONTAINERS[key] = cc
+        known = key in _KNOWN_CONTAINERS
+    if ensure and not known:
+        try:
+            cc.create_container()
+        except ResourceExistsError:
+            pass
+        except Exception:
+            return cc  # 권한 부족 등 — 다음 호출에서 다시 확인, 실제 오류는 업로드가 알려줌
+        with _CLIENTS_LOCK:
+            _KNOWN_CONTAINERS.add(key)
+    return cc
+
+def _svc():
+    return _service(), _container()
+
+def _blob_row(b) -> Dict:
+    return {
+        "name": b.name,
+        "size": getattr(b, "size", None),
+        "content_type": getattr(b, "content_settings", ContentSettings()).content_type if getattr(b, "content_settings", None) else None,
+        "last_modified": getattr(b, "last_modified", None).isoformat() if getattr(b, "last_modified", None) else None,
+        "etag": getattr(b, "etag", None),
+    }
+
+def _ext_ok(name: str, extensions: Optional[Sequence[str]]) -> bool:
+    return not extensions or (name or "").lower().endswith(tuple(e.lower() for e in extensions))
+
+def iter_blobs(prefix: str = None, extensions: Optional[Sequence[str]] = None,
+               page_size: Optional[int] = None) -> Iterator[Dict]:
+    """
+    컨테이너(prefix 이하 전체)를 페이지 단위로 받아 한 건씩 지연 반환.
+    extensions: ('.pdf', '.docx', …) 중 하나로 끝나는 blob만 (Blob API에 접미사 필터가 없어 받은 페이지에서 거름)
+    """
+    cc = _container()
+    page_size = int(page_size or CONFIG.get("BLOB_LIST_PAGE_SIZE", 1000))
+    for page in cc.list_blobs(name_starts_with=prefix or None, results_per_page=page_size).by_page():
+        for b in page:
+            if _ext_ok(b.name, extensions):
+                yield _blob_row(b)
 
 def list_blobs_detailed(prefix: str = None):
-    _, cc = _svc()
-    out = []
-    for b in cc.list_blobs(name_starts_with=prefix):
-        out.append({
-            "name": b.name,
-            "size": getattr(b, "size", None),
-            "content_type": getattr(b, "content_settings", ContentSettings()).content_type if getattr(b, "content_settings", None) else None,
-            "last_modified": getattr(b, "last_modified", None).isoformat() if getattr(b, "last_modified", None) else None,
-        })
-    return out
-
-def upload_blob(blob_name, data: bytes, overwrite: bool = True,
-                content_type: Optional[str] = None, container: Optional[str] = None) -> str:
-    account = CONFIG["AZURE_STORAGE_ACCOUNT"]
-    key     = CONFIG["AZURE_STORAGE_KEY"]
-    svc = BlobServiceClient(account_url=f"https://{account}.blob.core.windows.net", credential=key)
+    return list(iter_blobs(prefix))
 
-    cont_name = container or CONFIG.get("AZURE_STORAGE_CONTAINER") or "docspace"
-    container_client = svc.get_container_client(cont_name)
+def list_blobs_page(prefix: str = "", continuation_token: Optional[str] = None, page_size: int = 100,
+                    extensions: Optional[Sequence[str]] = None,
+                    delimiter: Optional[str] = "/") -> Tuple[List[Dict], List[str], Optional[str]]:
+    """
+    목록 한 페이지만 조회 (by_page 연속 토큰).
+    delimiter가 있으면 prefix 바로 아래 '가상 폴더'를 folders로 분리해 돌려줌.
+    반환: (blob 행 목록, 하위 폴더 prefix 목록, 다음 페이지 토큰 또는 None)
+    extensions 필터는 받은 페이지 안에서 적용되므로 한 페이지가 page_size보다 적을 수 있음.
+    """
+    cc = _container()
+    if delimiter:
+        pages = cc.walk_blobs(name_starts_with=prefix or None, delimiter=delimiter,
+                              results_per_page=page_size).by_page(continuation_token=continuation_token)
+    else:
+        pages = cc.list_blobs(name_starts_with=prefix or None,
+                              results_per_page=page_size).by_page(continuation_token=continuation_token)
+    rows, folders = [], []
     try:
-        container_client.create_container()
-    except Exception:
-        pass
+        page = next(pages)
+    except StopIteration:
+        return rows, folders, None
+    for item in page:
+        if isinstance(item, BlobPrefix):
+            folders.append(item.name)
+        elif _ext_ok(item.name, extensions):
+            rows.append(_blob_row(item))
+    return rows, folders, pages.continuation_token or None
+
+def _max_concurrency() -> int:
+    return int(CONFIG.get("BLOB_MAX_CONCURRENCY", 4))
+
+def upload_blob(blob_name, data: Union[bytes, BinaryIO], overwrite: bool = True,
+                content_type: Optional[str] = None, container: Optional[str] = None,
+                length: Optional[int] = None) -> str:
+    """
+    data: bytes 또는 읽기 가능한 바이너리 파일 객체 (업로드 파일/임시 파일 등).
+    파일 객체는 복사 없이 블록 단위로 읽어 스테이징(max_concurrency 병렬) 후 커밋.
+    """
+    cont_name = container or CONFIG.get("AZURE_STORAGE_CONTAINER") or "docspace"
+    container_client = _container(cont_name, ensure=True)
 
     blob_client = container_client.get_blob_client(blob_name)
     cs = ContentSettings(content_type=content_type) if content_type else None
-    blob_client.upload_blob(io.BytesIO(data), overwrite=overwrite,
-                            content_settings=cs)
+    blob_client.upload_blob(data, length=length, overwrite=overwrite,
+                            content_settings=cs, max_concurrency=_max_concurrency())
     return f"{cont_name}/{blob_name}"
 
 def download_blob(blob_name: str) -> bytes:
     _, cc = _svc()
     bc = cc.get_blob_client(blob_name)
-    return bc.download_blob().readall()
+    return bc.download_blob(max_concurrency=_max_concurrency()).readall()
+
+def open_blob_stream(blob_name: str) -> BinaryIO:
+    """
+    Blob을 범위 GET(max_concurrency 병렬)으로 받아 바로 기록하고 처음 위치로 되감아 반환.
+    BLOB_SPOOL_MAX_MB 이하는 메모리(BytesIO), 넘으면 이름 있는 임시 파일(NamedTemporaryFile)에 직접 기록해
+    큰 파일도 bytes 한 덩어리로 들고 있지 않고, 추출 워커에는 파일 경로(.name)만 넘길 수 있다.
+    사용 후 close() (with 문 권장, 임시 파일은 닫을 때 삭제).
+    """
+    _, cc = _svc()
+    bc = cc.get_blob_client(blob_name)
+    downloader = bc.download_blob(max_concurrency=_max_concurrency())
+    spool_max = int(float(CONFIG.get("BLOB_SPOOL_MAX_MB", 16)) * (1 << 20))
+    f = io.BytesIO() if downloader.size <= spool_max else tempfile.NamedTemporaryFile(prefix="docspace_blob_")
+    try:
+        downloader.readinto(f)
+        f.flush()
+        f.seek(0)
+    except Exception:
+        f.close()
+        raise
+    return f
 
 def delete_blob(blob_name: str):
     _, cc = _svc()
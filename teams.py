@@ -1,6 +1,6 @@
 
 # teams.py – Simple Teams Incoming Webhook notifier
-import requests
+import http_client
 from config import CONFIG
 
 def send_teams_message(title: str, text: str) -> dict:
@@ -15,6 +15,6 @@ def send_teams_message(title: str, text: str) -> dict:
         "title": title,
         "text": text
     }
-    r = requests.post(url, json=payload, timeout=30)
+    r = http_client.post(url, json=payload, timeout=30, retries=0)
     r.raise_for_status()
     return {"status": "ok"}
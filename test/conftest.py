@@ -0,0 +1,11 @@
+# 테스트는 저장소 루트의 모듈을 그대로 import (패키지 구조 없음)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+# 비밀값이 빠진 체크아웃(빈 config.py)에서도 `from config import CONFIG`가 되도록 빈 설정으로
+if not hasattr(config, "CONFIG"):
+    config.CONFIG = {}
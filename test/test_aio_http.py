@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+requests = pytest.importorskip("requests")
+
+import aio_http
+
+
+def _run(monkeypatch, script, method="POST", **kwargs):
+    """script 순서대로 응답/예외를 내는 MockTransport로 arequest 실행 → (결과 또는 예외, 호출 수)"""
+    calls = []
+
+    def _handler(request):
+        calls.append(request.method)
+        item = script[min(len(calls), len(script)) - 1]
+        if isinstance(item, Exception):
+            raise item
+        return httpx.Response(item)
+
+    monkeypatch.setattr(aio_http, "_backoff", lambda attempt: 0.0)
+
+    async def _go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_handler)) as client:
+            monkeypatch.setattr(aio_http, "_client", lambda: client)
+            return await aio_http.arequest(method, f"https://{id(script)}.example/x", retries=3, **kwargs)
+
+    try:
+        return asyncio.run(_go()), len(calls)
+    except Exception as e:
+        return e, len(calls)
+
+
+def test_read_error_is_retried_for_idempotent_requests(monkeypatch):
+    res, n = _run(monkeypatch, [httpx.ReadError("reset"), 200], method="GET")
+    assert res.status_code == 200 and n == 2
+
+
+def test_post_is_not_resent_after_transport_error(monkeypatch):
+    res, n = _run(monkeypatch, [httpx.ReadError("reset"), 200])
+    assert isinstance(res, requests.ConnectionError) and n == 1
+    res, n = _run(monkeypatch, [httpx.ReadTimeout("slow"), 200])
+    assert isinstance(res, requests.ReadTimeout) and n == 1
+
+
+def test_post_retries_connect_errors(monkeypatch):
+    res, n = _run(monkeypatch, [httpx.ConnectError("refused"), 200])
+    assert res.status_code == 200 and n == 2
@@ -0,0 +1,72 @@
+from chunker import _split_at_breaks, _split_sections, build_chunk_records, chunk_sections, count_tokens
+
+
+def _words(prefix, n):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_split_sections_on_headings_and_form_feed():
+    text = "intro line\n# First\nbody one\n\f[Slide 2]\nslide body"
+    assert _split_sections(text) == ["intro line", "# First\nbody one", "[Slide 2]\nslide body"]
+
+
+def test_chunks_respect_max_tokens():
+    section = ". ".join(_words("w", 8) for _ in range(20)) + "."
+    chunks = chunk_sections([section], max_tokens=30, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(count_tokens(c) <= 30 for c in chunks)
+
+
+def test_overlap_carries_tail_units_into_next_chunk():
+    sentences = [f"Sentence {i} has some words." for i in range(9)]
+    t = count_tokens(sentences[0])
+    chunks = chunk_sections([" ".join(sentences)], max_tokens=3 * t, overlap_tokens=t)
+    assert len(chunks) > 1
+    for prev, nxt in zip(chunks, chunks[1:]):
+        last_sentence = prev.rsplit(". ", 1)[-1]
+        assert nxt.startswith(last_sentence)
+
+
+def test_section_boundary_starts_new_chunk_without_overlap():
+    a, b = "# A\n" + _words("a", 5), "# B\n" + _words("b", 5)
+    limit = max(count_tokens(a), count_tokens(b)) + 2
+    chunks = chunk_sections([a, b], max_tokens=limit, overlap_tokens=limit)
+    assert chunks == [a, b]
+
+
+def test_small_sections_are_merged():
+    chunks = chunk_sections(["one two", "three four"], max_tokens=50, overlap_tokens=0)
+    assert chunks == ["one two\n\nthree four"]
+
+
+def test_build_chunk_records_short_doc_has_no_chunks():
+    assert build_chunk_records({"id": "a.txt", "content": "short"}, max_tokens=50) == []
+
+
+def test_build_chunk_records_ids_and_dropped_fields():
+    content = "# One\n" + _words("p", 20) + "\n# Two\n" + _words("q", 20)
+    doc = {"id": "dir/a.pdf", "originalId": "dir/a.pdf", "name": "a.pdf", "content": content,
+           "contentVector": [0.1]}
+    recs = build_chunk_records(doc, max_tokens=30, overlap_tokens=0)
+    assert len(recs) > 1
+    assert [r["id"] for r in recs] == [f"dir/a.pdf#chunk-{i}" for i in range(len(recs))]
+    assert [r["chunkIndex"] for r in recs] == list(range(len(recs)))
+    assert all(r["originalId"] == "dir/a.pdf" and r["name"] == "a.pdf" for r in recs)
+    assert all("contentVector" not in r for r in recs)
+    assert any(r["content"].startswith("# Two") for r in recs)   # 헤딩 경계에서 새 청크
+
+
+def test_split_at_breaks_uses_offsets_without_form_feeds():
+    sections = ["page one text", "page two text", "page three"]
+    text = "\n\n".join(sections)
+    breaks = [len(sections[0]) + 2, len(sections[0]) + len(sections[1]) + 4]
+    assert _split_at_breaks(text, breaks) == sections
+    assert "\f" not in text
+
+
+def test_build_chunk_records_splits_on_section_breaks():
+    content = "\n\n".join(["page one " + _words("p", 20), "page two " + _words("q", 20)])
+    doc = {"id": "a.pdf", "content": content, "sectionBreaks": [content.index("page two")]}
+    recs = build_chunk_records(doc, max_tokens=30, overlap_tokens=0)
+    assert any(r["content"].startswith("page two") for r in recs)
+    assert all("sectionBreaks" not in r for r in recs)
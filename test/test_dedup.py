@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from dedup import UnionFind, exact_key, minhash_pairs, minhash_signature
+
+
+def test_union_find_groups_transitively():
+    uf = UnionFind(6)
+    uf.union(0, 1)
+    uf.union(1, 2)
+    uf.union(4, 3)
+    groups = {}
+    for i in range(6):
+        groups.setdefault(uf.find(i), []).append(i)
+    assert sorted(groups.values()) == [[0, 1, 2], [3, 4], [5]]
+    assert uf.find(2) == 0   # 루트는 가장 작은 인덱스
+
+
+def test_union_find_add_starts_singleton():
+    uf = UnionFind()
+    a, b = uf.add(), uf.add()
+    assert (a, b) == (0, 1) and uf.find(b) == 1
+    uf.union(a, b)
+    assert uf.find(b) == uf.find(a)
+
+
+def test_exact_key_ignores_case_and_whitespace():
+    assert exact_key("Hello   World\n") == exact_key("hello world")
+    assert exact_key("hello world") != exact_key("hello there")
+
+
+def test_minhash_pairs_finds_near_duplicates_only():
+    base = " ".join(f"word{i}" for i in range(300))
+    near = base + " extra tail"
+    other = " ".join(f"other{i}" for i in range(300))
+    sigs = {0: minhash_signature(base), 1: minhash_signature(near), 2: minhash_signature(other)}
+    pairs = list(minhash_pairs(sigs, threshold=0.8))
+    assert [(i, j) for i, j, _ in pairs] == [(0, 1)]
+    assert pairs[0][2] >= 0.8
+
+
+def test_minhash_signature_empty_text():
+    assert minhash_signature("   ") is None
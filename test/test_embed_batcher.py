@@ -0,0 +1,57 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from embed_batcher import _is_oversize_error, embed_in_batches, pack_batches
+
+
+def test_pack_batches_respects_item_and_token_limits():
+    assert pack_batches([1, 1, 1, 1, 1], max_items=2, max_tokens=100) == [[0, 1], [2, 3], [4]]
+    assert pack_batches([60, 30, 20, 90, 5], max_items=10, max_tokens=100) == [[0, 1], [2], [3, 4]]
+
+
+def test_pack_batches_keeps_oversize_item_alone():
+    assert pack_batches([10, 500, 10], max_items=10, max_tokens=100) == [[0], [1], [2]]
+
+
+def test_pack_batches_empty():
+    assert pack_batches([], max_items=4, max_tokens=100) == []
+
+
+def _http_error(status, body):
+    r = requests.Response()
+    r.status_code = status
+    r._content = body.encode("utf-8")
+    return requests.HTTPError(f"{status}", response=r)
+
+
+def test_oversize_error_detection():
+    assert _is_oversize_error(_http_error(413, ""))
+    assert _is_oversize_error(_http_error(400, '{"error": {"code": "context_length_exceeded"}}'))
+    assert not _is_oversize_error(_http_error(400, '{"error": {"code": "DeploymentNotFound"}}'))
+    assert not _is_oversize_error(_http_error(429, "too many tokens"))
+    assert not _is_oversize_error(ValueError("413"))
+
+
+def test_bisects_only_on_oversize_errors():
+    calls = []
+
+    def _req(batch):
+        calls.append(len(batch))
+        if len(batch) > 2:
+            raise _http_error(400, "This model's maximum context length is 8192 tokens")
+        return [[float(len(t))] for t in batch]
+
+    assert embed_in_batches(["a", "bb", "ccc", "dddd"], _req, max_items=10, max_tokens=10**6,
+                            concurrency=1) == [[1.0], [2.0], [3.0], [4.0]]
+    assert calls == [4, 2, 2]
+
+    calls.clear()
+
+    def _bad(batch):
+        calls.append(len(batch))
+        raise _http_error(400, '{"error": {"code": "DeploymentNotFound"}}')
+
+    with pytest.raises(requests.HTTPError):
+        embed_in_batches(["a", "b", "c", "d"], _bad, max_items=10, max_tokens=10**6, concurrency=1)
+    assert calls == [4]
@@ -0,0 +1,28 @@
+import io
+import tempfile
+
+import extract_pool
+from extract_pool import ExtractionPool, _file_path
+
+
+def test_file_path_only_for_files_on_disk():
+    with tempfile.NamedTemporaryFile() as f:
+        assert _file_path(f) == f.name
+    upload = io.BytesIO(b"x")
+    upload.name = "report.pdf"   # Streamlit 업로드 파일처럼 파일명만 있는 메모리 버퍼
+    assert _file_path(upload) is None
+
+
+def test_named_temp_file_is_passed_by_path_without_copy(monkeypatch):
+    copies = []
+    monkeypatch.setattr(extract_pool, "_spool_to_path", lambda c: copies.append(c) or "")
+    pool = ExtractionPool(workers=1, timeout_sec=30, min_bytes=1)
+    try:
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("안녕하세요 hello\n".encode("utf-8") * 100)
+            f.flush()
+            assert pool.extract("a.txt", f, max_chars=11) == "안녕하세요 hello"
+        assert pool.extract("b.txt", io.BytesIO(b"in memory"), max_chars=20) == "in memory"
+    finally:
+        pool.shutdown()
+    assert copies == []
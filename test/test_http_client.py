@@ -0,0 +1,106 @@
+import io
+import time
+from email.utils import formatdate
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+import http_client
+from http_client import _Breaker, _retry_hint
+
+
+def _resp(**headers):
+    r = requests.Response()
+    r.headers.update(headers)
+    return r
+
+
+def test_retry_hint_prefers_millisecond_headers():
+    assert _retry_hint(_resp(**{"retry-after-ms": "1500", "Retry-After": "10"})) == 1.5
+    assert _retry_hint(_resp(**{"x-ms-retry-after-ms": "250"})) == 0.25
+
+
+def test_retry_hint_parses_seconds_and_http_date():
+    assert _retry_hint(_resp(**{"Retry-After": "7"})) == 7.0
+    hint = _retry_hint(_resp(**{"Retry-After": formatdate(time.time() + 30, usegmt=True)}))
+    assert 25 <= hint <= 31
+    assert _retry_hint(_resp(**{"Retry-After": formatdate(time.time() - 30, usegmt=True)})) == 0.0
+
+
+def test_retry_hint_missing_or_invalid():
+    assert _retry_hint(_resp()) is None
+    assert _retry_hint(_resp(**{"Retry-After": "soon"})) is None
+
+
+def test_breaker_opens_after_threshold_and_half_opens():
+    now = [100.0]
+    b = _Breaker(threshold=2, cooldown=30, clock=lambda: now[0])
+    assert not b.failure()
+    assert b.failure()            # 두 번째 실패에서 open
+    assert not b.allow()
+    now[0] += 31
+    assert b.allow()              # half-open: 1건만 통과
+    assert not b.allow()
+    assert b.failure() is False   # 시험 요청 실패 → 다시 open (이미 열려 있던 상태)
+    assert not b.allow()
+    now[0] += 31
+    assert b.allow()
+    b.success()
+    assert b.allow() and b.failures == 0
+
+
+def _scripted_send(monkeypatch, script):
+    """_send를 script 순서대로 응답/예외를 내는 가짜로 교체하고 호출 횟수 목록을 반환"""
+    calls = []
+
+    def _send(method, url, **kwargs):
+        calls.append(method)
+        item = script[min(len(calls), len(script)) - 1]
+        if isinstance(item, BaseException):
+            raise item
+        r = requests.Response()
+        r.status_code, hdrs = item
+        r.headers.update(hdrs)
+        r.raw = io.BytesIO(b"")
+        return r
+
+    monkeypatch.setattr(http_client, "_send", _send)
+    monkeypatch.setattr(http_client, "_backoff", lambda attempt: 0.0)
+    return calls
+
+
+def test_post_is_not_resent_after_read_timeout(monkeypatch):
+    calls = _scripted_send(monkeypatch, [requests.ReadTimeout("slow"), (200, {})])
+    with pytest.raises(requests.ReadTimeout):
+        http_client.request("POST", "https://post-timeout.example/x", retries=3)
+    assert len(calls) == 1
+
+
+def test_post_retries_connect_errors_and_throttling(monkeypatch):
+    calls = _scripted_send(monkeypatch, [requests.ConnectionError("refused"), (429, {"Retry-After": "0"}), (200, {})])
+    r = http_client.request("POST", "https://post-retry.example/x", retries=3)
+    assert r.status_code == 200 and len(calls) == 3
+
+
+def test_post_returns_5xx_without_retry_unless_opted_in(monkeypatch):
+    calls = _scripted_send(monkeypatch, [(500, {}), (200, {})])
+    assert http_client.request("POST", "https://post-5xx.example/x", retries=3).status_code == 500
+    assert len(calls) == 1
+    calls = _scripted_send(monkeypatch, [(500, {}), (200, {})])
+    assert http_client.request("POST", "https://post-5xx-idem.example/x", retries=3, idempotent=True).status_code == 200
+    assert len(calls) == 2
+
+
+def test_unexpected_send_error_releases_half_open_trial(monkeypatch):
+    host = "half-open.example"
+    now = [0.0]
+    monkeypatch.setitem(http_client._BREAKERS, host, _Breaker(threshold=1, cooldown=10, clock=lambda: now[0]))
+    _scripted_send(monkeypatch, [requests.exceptions.ChunkedEncodingError("cut"), (200, {})])
+    http_client._BREAKERS[host].failure()   # open
+    now[0] = 11.0
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        http_client.request("GET", f"https://{host}/x", retries=0)
+    assert not http_client._BREAKERS[host].trial_in_flight
+    now[0] = 22.0
+    assert http_client.request("GET", f"https://{host}/x", retries=0).status_code == 200
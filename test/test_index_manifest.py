@@ -0,0 +1,78 @@
+import json
+import os
+
+import utils
+from index_manifest import IndexManifest, signature
+
+
+def _blob(name, lm="2024-01-01T00:00:00", etag="e1", size=10):
+    return {"name": name, "last_modified": lm, "etag": etag, "size": size}
+
+
+def test_signature_keeps_only_present_fields():
+    assert signature({"name": "a", "last_modified": "t", "etag": "", "size": 3}) == {"last_modified": "t", "size": 3}
+
+
+def test_plan_detects_new_changed_and_unchanged(tmp_path):
+    m = IndexManifest(str(tmp_path / "m.json"))
+    m.mark_indexed("blob", "a.pdf", signature(_blob("a.pdf")))
+    m.mark_indexed("blob", "b.pdf", signature(_blob("b.pdf")))
+    metas = [_blob("a.pdf"), _blob("b.pdf", etag="e2"), _blob("c.pdf")]
+    changed, unchanged, deleted = m.plan("blob", metas, metas)
+    assert [x["name"] for x in changed] == ["b.pdf", "c.pdf"]
+    assert [x["name"] for x in unchanged] == ["a.pdf"]
+    assert deleted == []
+
+
+def test_plan_compares_only_common_fields(tmp_path):
+    m = IndexManifest(str(tmp_path / "m.json"))
+    m.mark_indexed("blob", "a.pdf", {"last_modified": "2024-01-01T00:00:00"})   # ETag 없던 과거 항목
+    changed, unchanged, _ = m.plan("blob", [_blob("a.pdf")], [_blob("a.pdf")])
+    assert not changed and len(unchanged) == 1
+
+
+def test_plan_falls_back_to_index_last_modified(tmp_path):
+    m = IndexManifest(str(tmp_path / "m.json"))
+    metas = [_blob("a.pdf"), _blob("b.pdf")]
+    changed, unchanged, _ = m.plan("blob", metas, metas,
+                                   indexed_last_modified={"a.pdf": "2024-01-01T00:00:00", "b.pdf": "2023-01-01"})
+    assert [x["name"] for x in changed] == ["b.pdf"]
+    assert [x["name"] for x in unchanged] == ["a.pdf"]
+
+
+def test_plan_deletions_are_scoped(tmp_path):
+    m = IndexManifest(str(tmp_path / "m.json"))
+    for name in ("docs/a.pdf", "docs/b.pdf", "other/c.pdf"):
+        m.mark_indexed("blob", name, signature(_blob(name)))
+    present = [_blob("docs/a.pdf")]
+    _, _, deleted = m.plan("blob", present, present, scope_prefix="docs/")
+    assert deleted == ["docs/b.pdf"]
+
+    m.mark_indexed("onedrive", "i1", {"etag": "x"}, parent="folderA")
+    m.mark_indexed("onedrive", "i2", {"etag": "x"}, parent="folderB")
+    _, _, deleted = m.plan("onedrive", [], [], scope_parent="folderA")
+    assert deleted == ["i1"]
+
+
+def test_save_merges_with_entries_written_by_other_instances(tmp_path):
+    path = str(tmp_path / "m.json")
+    a, b = IndexManifest(path), IndexManifest(path)
+    a.mark_indexed("blob", "a.pdf", {"etag": "1"})
+    b.mark_indexed("onedrive", "i1", {"etag": "2"})
+    a.save()
+    b.save()
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"blob:a.pdf", "onedrive:i1"}
+    b.forget("onedrive", ["i1"])
+    b.save()
+    assert set(IndexManifest(path).entries) == {"blob:a.pdf"}
+
+
+def test_local_state_path_is_anchored_to_app_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(utils.CONFIG, "DOCSPACE_STATE_DIR", "state_rel")
+    path = utils.local_state_path("x.json")
+    assert path == os.path.join(utils._REPO_DIR, "state_rel", "x.json")
+    os.rmdir(os.path.dirname(path))
+    monkeypatch.setitem(utils.CONFIG, "DOCSPACE_STATE_DIR", str(tmp_path / "abs"))
+    assert utils.local_state_path("x.json") == str(tmp_path / "abs" / "x.json")
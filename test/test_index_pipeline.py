@@ -0,0 +1,66 @@
+import threading
+
+from index_pipeline import run_index_pipeline
+
+
+def _metas(n):
+    return [{"name": f"f{i}.txt"} for i in range(n)]
+
+
+def test_all_items_flow_through_stages():
+    upserted, done = [], []
+    lock = threading.Lock()
+
+    def _upsert(records):
+        with lock:
+            upserted.extend(records)
+
+    stats = run_index_pipeline(
+        _metas(23) + [{"name": "dir", "is_folder": True}],
+        load_fn=lambda m: {"id": m["name"], "content": m["name"]},
+        embed_fn=lambda batch: [dict(d, contentVector=[1.0]) for d in batch],
+        upsert_fn=_upsert,
+        batch_size=5,
+        on_batch_done=lambda docs: done.extend(d["id"] for d in docs),
+    )
+    assert stats["ok"] == 23 and stats["fail"] == 0
+    assert sorted(r["id"] for r in upserted) == sorted(m["name"] for m in _metas(23))
+    assert sorted(done) == sorted(r["id"] for r in upserted)
+    assert [s["stage"] for s in stats["stages"]] == ["fetch", "embed", "upsert"]
+
+
+def test_load_errors_and_skips_are_counted_per_item():
+    errors = []
+
+    def _load(m):
+        if m["name"] == "f1.txt":
+            raise ValueError("broken")
+        if m["name"] == "f2.txt":
+            return None   # 건너뜀 (ok/fail 어느 쪽도 아님)
+        return {"id": m["name"]}
+
+    stats = run_index_pipeline(
+        _metas(4), load_fn=_load, embed_fn=lambda b: b, upsert_fn=lambda r: None,
+        batch_size=2, on_error=lambda meta, e: errors.append(meta["name"]),
+    )
+    assert (stats["ok"], stats["fail"]) == (2, 1)
+    assert errors == ["f1.txt"]
+
+
+def test_batch_failures_report_every_member():
+    failed, summaries = [], []
+
+    def _embed(batch):
+        if any(d["id"] == "f3.txt" for d in batch):
+            raise RuntimeError("embed down")
+        return batch
+
+    stats = run_index_pipeline(
+        _metas(6), load_fn=lambda m: {"id": m["name"]}, embed_fn=_embed, upsert_fn=lambda r: None,
+        batch_size=2, fetch_workers=1,
+        on_error=lambda meta, e: summaries.append(meta),
+        on_batch_error=lambda docs, e: failed.extend(d["id"] for d in docs),
+    )
+    assert (stats["ok"], stats["fail"]) == (4, 2)
+    assert "f3.txt" in failed and len(failed) == 2
+    assert summaries == []
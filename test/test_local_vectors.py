@@ -0,0 +1,27 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import local_vectors  # noqa: E402
+from config import CONFIG  # noqa: E402
+
+
+def _records(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{"id": f"d{i}", "contentVector": rng.standard_normal(dim).tolist()} for i in range(n)]
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delitem(CONFIG, "LOCAL_VECTOR_INDEX_ENABLED", raising=False)
+    monkeypatch.setattr(local_vectors, "_INDEX", None)
+    assert local_vectors.get_local_vector_index() is None
+
+
+def test_train_assigns_in_small_blocks(tmp_path, monkeypatch):
+    # 블록 예산을 아주 작게(행 몇 개) 잡아도 배정 결과는 전체 한 번에 계산한 것과 같아야 함
+    monkeypatch.setitem(CONFIG, "LOCAL_VECTOR_BLOCK_MB", 100 / (1 << 20))
+    idx = local_vectors.LocalVectorIndex(str(tmp_path), nlist=4, train_min=64)
+    idx.upsert(_records(64))
+    assert idx._centroids is not None
+    vecs = np.asarray(idx._vecs[:idx.count])
+    assert (idx._assign[:idx.count] == np.argmax(vecs @ idx._centroids.T, axis=1)).all()
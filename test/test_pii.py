@@ -0,0 +1,60 @@
+import itertools
+
+import pii
+from pii import _api_key_ok, _luhn_ok, _ssn_ok, iter_pii, scan_pii_detailed
+
+
+def test_scan_counts_validated_hits_only():
+    text = "mail kim@example.com card 4111 1111 1111 1111 fake 4111 1111 1111 1112"
+    res = scan_pii_detailed(text, budget_sec=0)
+    assert res["counts"] == {"Email": 1, "Card Number-like": 1}
+    assert res["rejected"] == 1
+    assert not res["truncated"]
+
+
+def test_offsets_match_across_chunk_boundaries():
+    filler = "word " * 300
+    text = filler + "kim@example.com " + filler + "lee@example.org"
+    hits = list(iter_pii(text, chunk_chars=1024))
+    assert [h[3] for h in hits] == ["kim@example.com", "lee@example.org"]
+    assert all(text[s:e] == v for _, s, e, v in hits)
+
+
+def test_luhn_accepts_valid_card_numbers():
+    assert _luhn_ok("4111 1111 1111 1111")
+    assert _luhn_ok("5500-0000-0000-0004")
+
+
+def test_luhn_rejects_bad_checksum_and_short_input():
+    assert not _luhn_ok("4111 1111 1111 1112")
+    assert not _luhn_ok("000000000000")  # 12자리
+
+
+def test_ssn_checksum_only_when_enabled(monkeypatch):
+    monkeypatch.setitem(pii.CONFIG, "PII_SSN_CHECKSUM", "false")
+    assert _ssn_ok("900101-1234560")
+    monkeypatch.setitem(pii.CONFIG, "PII_SSN_CHECKSUM", "true")
+    # 9,0,0,1,0,1,1,2,3,4,5,6 × 가중치 합 = 140 → (11 - 140 % 11) % 10 = 8
+    assert _ssn_ok("900101-1234568")
+    assert not _ssn_ok("900101-1234560")
+
+
+def test_api_key_requires_mixed_high_entropy_token():
+    assert _api_key_ok("sk9Fq2LmZx7Rt4Vb8Nc1Hd6Jw3Ke5Py0")
+    assert not _api_key_ok("abcdefghijklmnopqrstuvwxyz")        # 숫자 없음
+    assert not _api_key_ok("aaaa1111aaaa1111aaaa1111")          # 엔트로피 낮음
+
+
+def test_time_budget_truncates_scan():
+    ticks = itertools.count()   # 호출마다 1초씩 흐르는 가짜 시계
+    stats = {}
+    list(iter_pii("a " * 10000, chunk_chars=1024, budget_sec=1, stats=stats, clock=lambda: float(next(ticks))))
+    assert stats["truncated"]
+    assert 0 < stats["scanned_chars"] < 20000
+
+
+def test_detailed_scan_reports_truncation_with_injected_clock():
+    ticks = itertools.count()
+    n = pii.CHUNK_CHARS // 8   # 16자 × n = 청크 2개 분량
+    res = scan_pii_detailed("kim@example.com " * n, budget_sec=1, clock=lambda: float(next(ticks)))
+    assert res["truncated"] and 0 < res["counts"]["Email"] < n
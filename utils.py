@@ -1,7 +1,12 @@
 # utils.py
+import os
 import streamlit as st
 import base64
 
+from config import CONFIG
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def config_status(CONFIG):
     st.markdown("### 🔧 설정 상태")
     st.write({
@@ -39,4 +44,13 @@ def safe_excerpt(obj, limit: int = 900, default: str = "") -> str:
 
 def make_key(s: str) -> str:
     # URL-safe Base64 ( -,_ 만 사용 ), 패딩 '=' 제거해도 됨
-    return base64.urlsafe_b64encode(s.encode("utf-8")).decode("ascii").rstrip("=")
\ No newline at end of file
+    return base64.urlsafe_b64encode(s.encode("utf-8")).decode("ascii").rstrip("=")
+
+def local_state_path(filename: str) -> str:
+    """
+    로컬 상태 파일(매니페스트/캐시 등) 경로. 디렉터리는 CONFIG DOCSPACE_STATE_DIR (기본 .docspace).
+    상대 경로는 실행 위치가 아니라 앱 디렉터리 기준 → 어디서 streamlit run 해도 같은 상태 파일 사용.
+    """
+    base = os.path.join(_REPO_DIR, CONFIG.get("DOCSPACE_STATE_DIR") or ".docspace")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, filename)